@@ -0,0 +1,263 @@
+"""Offline benchmarks for ModelInstaller.
+
+Starts a local fake Hub (see fake_hub.py), then drives
+``ModelInstaller.process_model_config`` against synthetic repositories:
+
+  small     many small files spread over a few repos
+  huge      a few large files (segmented range downloads)
+  snapshot  whole-repo entries with nested folders and non-LFS files
+
+Each scenario runs cold (empty model directory) and warm (everything already
+installed, so the run should be a no-op) and reports wall time, MB/s, the
+number of metadata requests and the time spent verifying files.
+
+    python benchmarks/bench_install_models.py --output bench.json
+    python benchmarks/bench_install_models.py --compare bench.json
+
+With ``--compare`` the exit status is 1 if any metric regressed beyond
+``--threshold`` relative to the baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import platform
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_hub import FakeHub, SyntheticFile
+
+MB = 1024 * 1024
+
+
+def build_scenarios(args) -> Dict[str, Dict]:
+    """Return ``{name: {'repos': {repo_id: [SyntheticFile]}, 'config': dict}}``."""
+    scenarios = {}
+
+    # Many small files, listed explicitly across a handful of repos
+    repos, config = {}, {'loras': {}}
+    per_repo = max(1, args.small_count // 4)
+    for r in range(4):
+        repo_id = f"bench/small-{r}"
+        files = [SyntheticFile(f"lora_{r}_{i:04d}.safetensors", args.small_kb * 1024)
+                 for i in range(per_repo)]
+        repos[repo_id] = files
+        config['loras'][f"small-{r}"] = {
+            'repo_url': f"https://huggingface.co/{repo_id}",
+            'include_files': [f.path for f in files]
+        }
+    scenarios['small'] = {'repos': repos, 'config': config}
+
+    # A few huge files, each large enough for segmented downloads
+    repo_id = "bench/huge"
+    files = [SyntheticFile(f"model_{i}.gguf", args.huge_mb * MB) for i in range(args.huge_count)]
+    scenarios['huge'] = {
+        'repos': {repo_id: files},
+        'config': {'unet': {'huge': {
+            'repo_url': f"https://huggingface.co/{repo_id}",
+            'include_files': [f.path for f in files]
+        }}}
+    }
+
+    # Whole-repo snapshots with nested folders and small non-LFS files
+    repos, config = {}, {'checkpoints': {}}
+    for r in range(2):
+        repo_id = f"bench/snapshot-{r}"
+        files = [SyntheticFile("config.json", 2 * 1024, lfs=False),
+                 SyntheticFile("README.md", 4 * 1024, lfs=False)]
+        for i in range(args.snapshot_files):
+            folder = ("unet", "vae", "text_encoder")[i % 3]
+            files.append(SyntheticFile(f"{folder}/part_{i:03d}.safetensors", args.snapshot_mb * MB))
+        repos[repo_id] = files
+        config['checkpoints'][f"snapshot-{r}"] = {'repo_url': f"https://huggingface.co/{repo_id}"}
+    scenarios['snapshot'] = {'repos': repos, 'config': config}
+
+    return scenarios
+
+
+class RunProbe:
+    """Accumulates time spent in an installer's verification methods."""
+
+    def __init__(self, installer):
+        self.verify_seconds = 0.0
+        self._lock = threading.Lock()
+        for name in ('verify_file_integrity', 'prehash_files'):
+            setattr(installer, name, self._timed(getattr(installer, name)))
+
+    def _timed(self, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.verify_seconds += time.perf_counter() - start
+        return wrapper
+
+
+def run_once(hub: FakeHub, work_dir: Path) -> Dict:
+    """Run one installer pass against the configured work directory."""
+    from install_models import ModelInstaller
+
+    hub.reset_counters()
+    installer = ModelInstaller()
+    probe = RunProbe(installer)
+
+    start = time.perf_counter()
+    installer.process_model_config()
+    wall = time.perf_counter() - start
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'bytes_downloaded': hub.bytes_served,
+        'mb_per_second': round(hub.bytes_served / 1e6 / wall, 1) if wall > 0 else 0.0,
+        'metadata_requests': hub.metadata_requests,
+        'file_requests': hub.file_requests,
+        'verify_seconds': round(probe.verify_seconds, 3),
+    }
+
+
+def run_scenario(hub: FakeHub, name: str, scenario: Dict, root: Path) -> Dict:
+    """Cold run into an empty model directory, then a warm no-op run."""
+    for repo_id, files in scenario['repos'].items():
+        hub.add_repo(repo_id, files)
+
+    work_dir = root / name
+    model_dir = work_dir / "models"
+    model_dir.mkdir(parents=True)
+    config_file = work_dir / "model_config.yaml"
+    import yaml
+    with open(config_file, 'w') as f:
+        yaml.safe_dump(scenario['config'], f)
+
+    os.environ["USERPROFILE"] = str(work_dir)
+    os.environ["MODEL_BASE_PATH"] = str(model_dir)
+    os.environ["MODEL_CONFIG"] = str(config_file)
+
+    files = [f for repo in scenario['repos'].values() for f in repo]
+    result = {
+        'files': len(files),
+        'total_bytes': sum(f.size for f in files),
+        'cold': run_once(hub, work_dir),
+        'warm': run_once(hub, work_dir),
+    }
+
+    installed = sum(1 for p in model_dir.rglob("*") if p.is_file()
+                    and not p.name.startswith('.') and '.blobs' not in p.parts and '.cache' not in p.parts)
+    result['installed_files'] = installed
+    if installed < len(files):
+        result['error'] = f"only {installed} of {len(files)} files installed"
+    return result
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Return a description of every metric that regressed against the baseline."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for phase in ('cold', 'warm'):
+            cur, old = current[phase], base[phase]
+            for metric in ('wall_seconds', 'verify_seconds'):
+                # Ignore noise on sub-100ms timings
+                if cur[metric] > old[metric] * (1 + threshold) and cur[metric] - old[metric] > 0.1:
+                    regressions.append(f"{name}/{phase} {metric}: {old[metric]} -> {cur[metric]}")
+            for metric in ('metadata_requests', 'file_requests', 'bytes_downloaded'):
+                if cur[metric] > old[metric]:
+                    regressions.append(f"{name}/{phase} {metric}: {old[metric]} -> {cur[metric]}")
+            if phase == 'cold' and cur['mb_per_second'] < old['mb_per_second'] * (1 - threshold):
+                regressions.append(f"{name}/{phase} mb_per_second: {old['mb_per_second']} -> {cur['mb_per_second']}")
+    return regressions
+
+
+def print_results(results: Dict) -> None:
+    print(f"{'scenario':<10} {'phase':<5} {'wall s':>8} {'MB/s':>8} {'meta':>5} {'files':>6} {'verify s':>9}")
+    for name, r in results['scenarios'].items():
+        for phase in ('cold', 'warm'):
+            p = r[phase]
+            print(f"{name:<10} {phase:<5} {p['wall_seconds']:>8.2f} {p['mb_per_second']:>8.1f} "
+                  f"{p['metadata_requests']:>5} {p['file_requests']:>6} {p['verify_seconds']:>9.2f}")
+        if 'error' in r:
+            print(f"{name:<10} ERROR: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark install_models.py against a local fake Hub")
+    parser.add_argument("--scenario", action="append", choices=['small', 'huge', 'snapshot'],
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--small-count", type=int, default=200, help="Files in the small scenario")
+    parser.add_argument("--small-kb", type=int, default=256, help="Size of each small file in KiB")
+    parser.add_argument("--huge-count", type=int, default=2, help="Files in the huge scenario")
+    parser.add_argument("--huge-mb", type=int, default=512, help="Size of each huge file in MiB")
+    parser.add_argument("--snapshot-files", type=int, default=12, help="Weight files per snapshot repo")
+    parser.add_argument("--snapshot-mb", type=int, default=16, help="Size of each snapshot weight file in MiB")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown that counts as a regression (default: 0.2)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary model directories")
+    args = parser.parse_args()
+
+    hub = FakeHub().start()
+
+    # Must be set before huggingface_hub is imported
+    os.environ["HF_ENDPOINT"] = hub.url
+    os.environ["HF_HUB_DISABLE_TELEMETRY"] = "1"
+    os.environ["TQDM_DISABLE"] = "1"
+    os.environ.pop("HF_TOKEN", None)
+    root = Path(tempfile.mkdtemp(prefix="bench_install_models_"))
+    os.environ["HF_HOME"] = str(root / "hf_home")
+
+    # Takes precedence over the installer's own basicConfig, so no log files are written
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s | %(message)s')
+
+    scenarios = build_scenarios(args)
+    selected = args.scenario or list(scenarios)
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {k: v for k, v in vars(args).items()
+                       if k not in ('output', 'compare', 'threshold', 'keep', 'scenario')},
+        'scenarios': {},
+    }
+    try:
+        for name in selected:
+            print(f"Running {name}...", file=sys.stderr)
+            results['scenarios'][name] = run_scenario(hub, name, scenarios[name], root)
+    finally:
+        hub.stop()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failed = any('error' in r for r in results['scenarios'].values())
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != results['parameters']:
+            print("Warning: baseline was recorded with different parameters", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Throughput of the launcher's output pipeline in lines/s.
+
+Spawns a child that writes ``--lines`` lines (a share of them as ``\\r``
+progress-bar updates) to stdout and stderr as fast as it can, and forwards
+them to a log file with:
+
+  legacy    text-mode ``readline`` per line, a lock per timestamp update and a
+            synchronous FileHandler write (the launcher before the queue pipeline)
+  pipeline  ComfyUILauncher._read_output with the queued, batched,
+            size-rotated ComfyUILogger
+
+Reports how long the child was kept writing (pipe back-pressure) and the total
+time until every line reached the log file.
+
+    python benchmarks/bench_launcher_logging.py --lines 200000
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict
+
+BENCH_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from comfyui_windows import ComfyUILauncher, ComfyUILogger, LauncherMetrics
+
+CHILD = r"""
+import sys
+lines, width, every = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+pad = "x" * width
+out, err = sys.stdout, sys.stderr
+for i in range(lines):
+    if every and i % every == 0:
+        err.write(f"\r{i % 100:3d}%|#####     | {i}/{lines} [00:01<00:02, 12.34it/s]")
+    else:
+        out.write(f"line {i} {pad}\n")
+out.flush()
+err.write("\n")
+"""
+
+
+def spawn(args, text: bool) -> subprocess.Popen:
+    cmd = [sys.executable, "-u", "-c", CHILD, str(args.lines), str(args.width), str(args.progress_every)]
+    if text:
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def run_legacy(args, log_dir: Path) -> Dict:
+    logger = logging.getLogger("bench.legacy")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(log_dir / "legacy.log", encoding="utf-8")
+    handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s'))
+    logger.addHandler(handler)
+    lock = threading.Lock()
+    state = {"ts": 0.0}
+    ready = threading.Event()
+
+    def output_reader(pipe, log_func):
+        with pipe:
+            for line in iter(pipe.readline, ''):
+                line = line.strip()
+                log_func(line)
+                now = time.time()
+                with lock:
+                    state["ts"] = now
+                lower = line.lower()
+                if "to see the gui" in lower or "running on" in lower:
+                    ready.set()
+
+    start = time.perf_counter()
+    proc = spawn(args, text=True)
+    readers = [threading.Thread(target=output_reader, args=(proc.stdout, logger.info)),
+               threading.Thread(target=output_reader, args=(proc.stderr, logger.error))]
+    for t in readers:
+        t.start()
+    proc.wait()
+    child_done = time.perf_counter() - start
+    for t in readers:
+        t.join()
+    handler.close()
+    return {"child_seconds": child_done, "total_seconds": time.perf_counter() - start}
+
+
+def run_pipeline(args, log_dir: Path) -> Dict:
+    # Only the pieces _read_output touches; the full constructor would read .env and set up paths
+    launcher = ComfyUILauncher.__new__(ComfyUILauncher)
+    launcher.logger = ComfyUILogger(log_dir=log_dir)
+    launcher.metrics = LauncherMetrics()
+    launcher._readiness_event = threading.Event()
+    launcher._last_output_ts = time.time()
+
+    start = time.perf_counter()
+    proc = spawn(args, text=False)
+    readers = [threading.Thread(target=launcher._read_output, args=(proc.stdout, logging.INFO)),
+               threading.Thread(target=launcher._read_output, args=(proc.stderr, logging.ERROR))]
+    for t in readers:
+        t.start()
+    proc.wait()
+    child_done = time.perf_counter() - start
+    for t in readers:
+        t.join()
+    launcher.logger.close()
+    return {"child_seconds": child_done, "total_seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the launcher's log pipeline")
+    parser.add_argument("--lines", type=int, default=200000, help="Lines written by the child")
+    parser.add_argument("--width", type=int, default=100, help="Padding characters per line")
+    parser.add_argument("--progress-every", type=int, default=4,
+                        help="Every Nth line is a \\r progress update on stderr (0 = none)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the best is reported")
+    parser.add_argument("--mode", action="append", choices=["legacy", "pipeline"], help="Mode to run (default: both)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    modes = {"legacy": run_legacy, "pipeline": run_pipeline}
+    results = {"parameters": {"lines": args.lines, "width": args.width, "progress_every": args.progress_every},
+               "modes": {}}
+    with tempfile.TemporaryDirectory(prefix="bench_launcher_logging_") as tmp:
+        for name in args.mode or list(modes):
+            runs = []
+            for i in range(args.repeat):
+                log_dir = Path(tmp) / f"{name}_{i}"
+                log_dir.mkdir()
+                runs.append(modes[name](args, log_dir))
+                # Release the handlers the run attached
+                for logger_name in ("bench.legacy", "ComfyUIManager"):
+                    logging.getLogger(logger_name).handlers = []
+            best = min(runs, key=lambda r: r["total_seconds"])
+            best["lines_per_second"] = round(args.lines / best["total_seconds"])
+            best["child_seconds"] = round(best["child_seconds"], 3)
+            best["total_seconds"] = round(best["total_seconds"], 3)
+            results["modes"][name] = best
+            print(f"{name:<9} {best['lines_per_second']:>10,} lines/s  "
+                  f"child blocked {best['child_seconds']:.2f}s  total {best['total_seconds']:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
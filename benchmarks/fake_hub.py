@@ -0,0 +1,252 @@
+"""Local stand-in for the Hugging Face Hub endpoints used by install_models.py.
+
+Serves repository metadata (``/api/models/<repo>``) and file downloads
+(``/<repo>/resolve/<revision>/<path>``, with Range support) for synthetic
+files generated on the fly, so installer benchmarks and tests run offline and are
+repeatable. Point ``HF_ENDPOINT`` at ``FakeHub.url`` before importing
+huggingface_hub.
+
+Failure modes for tests: ``accept_ranges = False`` answers Range requests
+with the whole file, ``redirect_ttl`` redirects downloads to presigned
+``/cdn/`` URLs that expire (403) after that many requests, and
+``interrupt_after`` cuts the next longer response for a path after N bytes.
+"""
+
+import re
+import json
+import socket
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATTERN_SIZE = 1024 * 1024
+
+
+class SyntheticFile:
+    """Deterministic file content: a 1 MiB block derived from the path, repeated.
+
+    ``content`` serves those exact bytes instead (e.g. a valid safetensors file).
+    """
+
+    def __init__(self, path: str, size: int = 0, lfs: bool = True, content: Optional[bytes] = None):
+        self.path = path
+        self.size = len(content) if content is not None else size
+        self.lfs = lfs
+        self.content = content
+        seed = hashlib.sha256(path.encode()).digest()
+        block = bytearray()
+        counter = 0
+        while content is None and len(block) < PATTERN_SIZE:
+            block += hashlib.sha256(seed + counter.to_bytes(8, 'little')).digest()
+            counter += 1
+        self.pattern = bytes(block[:PATTERN_SIZE])
+        self.sha256 = self._digest(hashlib.sha256())
+        self.blob_id = self._digest(hashlib.sha1(f"blob {self.size}\0".encode()))
+
+    def _digest(self, hasher) -> str:
+        for chunk in self.read(0, self.size):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def read(self, start: int, end: int):
+        """Yield the bytes in ``[start, end)``."""
+        if self.content is not None:
+            yield self.content[start:end]
+            return
+        pos = start
+        while pos < end:
+            offset = pos % PATTERN_SIZE
+            n = min(PATTERN_SIZE - offset, end - pos)
+            yield self.pattern[offset:offset + n]
+            pos += n
+
+
+class FakeHub:
+    """Threaded HTTP server hosting synthetic repositories."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.repos: Dict[str, Dict[str, SyntheticFile]] = {}
+        self.revisions: Dict[str, str] = {}
+        # Every revision ever added: {repo_id: {revision: {path: file}}}
+        self.history: Dict[str, Dict[str, Dict[str, SyntheticFile]]] = {}
+        self.metadata_requests = 0
+        self.file_requests = 0
+        self.bytes_served = 0
+        self.accept_ranges = True
+        self.redirect_ttl: Optional[int] = None
+        self.interrupt_after: Dict[str, int] = {}
+        self.requested_revisions: List[str] = []
+        self._presigned: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_repo(self, repo_id: str, files: List[SyntheticFile], revision: Optional[str] = None):
+        """Publish ``files`` as the head of ``repo_id``; earlier revisions stay downloadable."""
+        revision = revision or hashlib.sha1(repo_id.encode()).hexdigest()
+        self.repos[repo_id] = {f.path: f for f in files}
+        self.revisions[repo_id] = revision
+        self.history.setdefault(repo_id, {})[revision] = self.repos[repo_id]
+
+    def _files_at(self, repo_id: str, revision: Optional[str]) -> Optional[Dict[str, SyntheticFile]]:
+        if revision in (None, 'main'):
+            return self.repos.get(repo_id)
+        return self.history.get(repo_id, {}).get(revision)
+
+    def reset_counters(self):
+        with self._lock:
+            self.metadata_requests = 0
+            self.file_requests = 0
+            self.bytes_served = 0
+
+    def start(self) -> 'FakeHub':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _model_info(self, repo_id: str, revision: Optional[str] = None) -> Dict:
+        siblings = []
+        for f in self._files_at(repo_id, revision).values():
+            sibling = {'rfilename': f.path, 'size': f.size, 'blobId': f.blob_id}
+            if f.lfs:
+                sibling['lfs'] = {'sha256': f.sha256, 'size': f.size, 'pointerSize': 134}
+            siblings.append(sibling)
+        return {
+            'id': repo_id,
+            'modelId': repo_id,
+            'sha': revision if revision not in (None, 'main') else self.revisions[repo_id],
+            'private': False,
+            'disabled': False,
+            'gated': False,
+            'tags': [],
+            'siblings': siblings,
+        }
+
+    def _handler(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, data: Dict):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _lookup(self, path: str):
+                # /api/models/<owner>/<name>[/revision/<rev>]
+                m = re.match(r'^/api/models/([^/]+/[^/]+)(?:/revision/([^/]+))?$', path)
+                if m:
+                    return 'api', m.group(1), m.group(2), None
+                # /<owner>/<name>/resolve/<rev>/<path>
+                m = re.match(r'^/([^/]+/[^/]+)/resolve/([^/]+)/(.+)$', path)
+                if m:
+                    return 'file', m.group(1), m.group(2), m.group(3)
+                # /cdn/<token> (presigned redirect target)
+                m = re.match(r'^/cdn/([0-9a-f]+)$', path)
+                if m:
+                    return 'cdn', None, None, m.group(1)
+                return None, None, None, None
+
+            def do_HEAD(self):
+                self._serve(head=True)
+
+            def do_GET(self):
+                self._serve(head=False)
+
+            def _serve(self, head: bool):
+                kind, repo_id, revision, filename = self._lookup(unquote(urlparse(self.path).path))
+                if kind == 'cdn':
+                    with hub._lock:
+                        entry = hub._presigned.get(filename)
+                        if entry is not None:
+                            entry[1] -= 1
+                    if entry is None or entry[1] < 0:
+                        self.send_error(403)
+                        return
+                    f = entry[0]
+                else:
+                    files = hub._files_at(repo_id, revision)
+                    if files is None:
+                        self.send_error(404)
+                        return
+                    if kind == 'api':
+                        with hub._lock:
+                            hub.metadata_requests += 1
+                        self._send_json(hub._model_info(repo_id, revision))
+                        return
+                    f = files.get(filename)
+                    if f is None:
+                        self.send_error(404)
+                        return
+                    with hub._lock:
+                        hub.requested_revisions.append(revision)
+                    if hub.redirect_ttl is not None and not head:
+                        token = hashlib.sha1(f"{self.path}{len(hub._presigned)}".encode()).hexdigest()
+                        with hub._lock:
+                            hub._presigned[token] = [f, hub.redirect_ttl]
+                        self.send_response(302)
+                        self.send_header('Location', f"/cdn/{token}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+
+                start, end = 0, f.size
+                status = 200
+                m = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+                if m and hub.accept_ranges:
+                    start = int(m.group(1))
+                    end = min(int(m.group(2)) + 1, f.size) if m.group(2) else f.size
+                    status = 206
+                self.send_response(status)
+                self.send_header('Content-Length', str(end - start))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('ETag', f'"{f.sha256 if f.lfs else f.blob_id}"')
+                if kind == 'file':
+                    self.send_header('X-Repo-Commit', revision if revision != 'main' else hub.revisions[repo_id])
+                if f.lfs:
+                    self.send_header('X-Linked-Etag', f'"{f.sha256}"')
+                    self.send_header('X-Linked-Size', str(f.size))
+                if status == 206:
+                    self.send_header('Content-Range', f'bytes {start}-{end - 1}/{f.size}')
+                self.end_headers()
+                if head:
+                    return
+                with hub._lock:
+                    hub.file_requests += 1
+                    cut = hub.interrupt_after.get(f.path)
+                    if cut is not None and end - start > cut:
+                        del hub.interrupt_after[f.path]
+                    else:
+                        cut = None
+                try:
+                    for chunk in f.read(start, end if cut is None else min(end, start + cut)):
+                        self.wfile.write(chunk)
+                        with hub._lock:
+                            hub.bytes_served += len(chunk)
+                    if cut is not None:
+                        # Drop the connection mid-body
+                        self.close_connection = True
+                        self.connection.shutdown(socket.SHUT_RDWR)
+                except (BrokenPipeError, ConnectionResetError, OSError):
+                    pass
+
+        return Handler
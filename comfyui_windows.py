@@ -1,25 +1,133 @@
 import os
+import re
 import sys
 import time
 import uuid
+import json
+import gzip
+import queue
+import shutil
+import socket
 import subprocess
+import urllib.request
 import logging
 import logging.handlers
 import psutil
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, List, Set, Tuple, Callable, Deque
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from dotenv import load_dotenv
 import threading
 import signal
 
+# launch_comfyui.bat runs this script with -I, which keeps its folder off sys.path
+sys.path.insert(0, str(Path(__file__).parent.resolve()))
+from model_store import (HashCache, ModelCache, ModelInventory, MODEL_EXTENSIONS, LOADER_FOLDERS,
+                         load_lockfile, verify_lockfile, load_workflow_refs, resolve_model_ref, prewarm_files)
+
+# ComfyUI output is split on both newlines and carriage returns (progress bars)
+LINE_SPLIT = re.compile(rb"[\r\n]+")
+READY_MARKERS = ("to see the gui", "running on", "started server", "listening on")
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Size-rotated log file whose rotated segments are gzipped.
+
+    ``flush`` is a no-op so writes are buffered; the owner calls ``flush_now``
+    once per batch.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+    
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+    
+    def flush(self):
+        pass
+    
+    def flush_now(self):
+        super().flush()
+    
+    def close(self):
+        self.flush_now()
+        super().close()
+
+class BatchFormatter(logging.Formatter):
+    """Formatter that caches the timestamp per second and expands line batches.
+
+    A record carrying a ``lines`` attribute is written as one log line per
+    entry, all sharing the record's timestamp and level.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_time = ""
+    
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_time = super().formatTime(record, datefmt)
+        return self._cached_time
+    
+    def format(self, record):
+        lines = getattr(record, "lines", None)
+        if lines is None:
+            return super().format(record)
+        prefix = super().format(record)
+        return "\n".join(prefix + line for line in lines)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records as-is so formatting happens on the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args or record.exc_info:
+            return super().prepare(record)
+        return record
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """Writes queued records in batches, flushing when the queue drains or every ``flush_interval`` seconds."""
+    
+    def __init__(self, log_queue, *handlers, flush_interval: float = 1.0):
+        super().__init__(log_queue, *handlers)
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+    
+    def dequeue(self, block: bool):
+        try:
+            record = self.queue.get_nowait()
+        except queue.Empty:
+            self._flush()
+            return self.queue.get(block)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+        return record
+    
+    def _flush(self):
+        for handler in self.handlers:
+            getattr(handler, "flush_now", handler.flush)()
+        self._last_flush = time.monotonic()
+    
+    def stop(self):
+        super().stop()
+        self._flush()
+
 class ComfyUILogger:
     """Handles logging with date, UUID, and PID in filename."""
     
-    def __init__(self):
+    def __init__(self, log_dir: Optional[Path] = None, name: Optional[str] = None):
         # Get script directory for logs
         self.script_dir = Path(__file__).parent.resolve()
-        self.log_dir = self.script_dir / "logs"
+        self.log_dir = Path(log_dir) if log_dir else self.script_dir / "logs"
         self.log_dir.mkdir(parents=True, exist_ok=True)
         
         # Generate unique identifiers
@@ -28,29 +136,43 @@ class ComfyUILogger:
         
         # Create log filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_filename = f"comfyui_{timestamp}_{self.session_id}_{self.pid}.log"
+        suffix = f"_{name}" if name else ""
+        log_filename = f"comfyui_{timestamp}_{self.session_id}_{self.pid}{suffix}.log"
         self.log_file = self.log_dir / log_filename
         
-        # Configure logger
-        self.logger = logging.getLogger("ComfyUIManager")
+        # Configure logger (named streams, e.g. one per instance, stay out of the main log)
+        self.logger = logging.getLogger(f"ComfyUIManager.{name}" if name else "ComfyUIManager")
         self.logger.setLevel(logging.INFO)
+        self.logger.propagate = not name
         
         # Remove any existing handlers
         self.logger.handlers = []
         
-        # Create file handler
-        file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
+        # Create size-rotated file handler (rotated segments are gzipped)
+        file_handler = CompressedRotatingFileHandler(
+            self.log_file,
+            maxBytes=int(os.getenv("LOG_MAX_MB", "50")) * 1024 * 1024,
+            backupCount=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+            encoding='utf-8'
+        )
         file_handler.setLevel(logging.INFO)
         
         # Create formatter
-        formatter = logging.Formatter(
+        formatter = BatchFormatter(
             '%(asctime)s | %(levelname)s | %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         file_handler.setFormatter(formatter)
         
-        # Add handler to logger
-        self.logger.addHandler(file_handler)
+        # Callers only enqueue; a background listener formats and writes in batches
+        self.file_handler = file_handler
+        self._queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self.logger.addHandler(DeferredQueueHandler(self._queue))
+        self.listener = BatchingQueueListener(
+            self._queue, file_handler,
+            flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+        )
+        self.listener.start()
         
         # Log initial message
         self.logger.info(f"=== Starting new ComfyUI session ===")
@@ -58,10 +180,23 @@ class ComfyUILogger:
         self.logger.info(f"PID: {self.pid}")
         self.logger.info(f"Log file: {self.log_file}")
 
+    def log_lines(self, level: int, lines: List[str]) -> None:
+        """Log several lines as one queued record (one output line each, same timestamp)."""
+        if not self.logger.isEnabledFor(level):
+            return
+        record = self.logger.makeRecord(self.logger.name, level, "(child)", 0, "", None, None)
+        record.lines = lines
+        self._queue.put_nowait(record)
+
+    def close(self):
+        """Drain the log queue and close the log file."""
+        self.listener.stop()
+        self.file_handler.close()
+
     def clean_old_logs(self, days: int = 7):
         try:
             cutoff = datetime.now() - timedelta(days=days)
-            for log_file in self.log_dir.glob("comfyui_*.log"):
+            for log_file in self.log_dir.glob("comfyui_*.log*"):
                 file_time = datetime.fromtimestamp(log_file.stat().st_mtime)
                 if file_time < cutoff:
                     try:
@@ -72,22 +207,913 @@ class ComfyUILogger:
         except Exception as e:
             self.logger.error(f"Error cleaning old logs: {e}")
 
+class HealthProbe:
+    """Polls ComfyUI's HTTP API to detect readiness and liveness."""
+    
+    def __init__(self, port: str, host: str = "127.0.0.1", timeout: float = 10.0):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+        # Never route loopback probes through a configured HTTP proxy
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        self.last_error: Optional[str] = None
+        self.last_latency: Optional[float] = None
+        self.last_queue: Optional[Dict[str, int]] = None
+    
+    def _get_json(self, path: str) -> Dict:
+        with self._opener.open(self.base_url + path, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8") or "{}")
+    
+    def check(self) -> bool:
+        """Return True if /system_stats and /queue both answer."""
+        start = time.time()
+        try:
+            self._get_json("/system_stats")
+            queue = self._get_json("/queue")
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        self.last_latency = time.time() - start
+        self.last_error = None
+        self.last_queue = {
+            "running": len(queue.get("queue_running", [])),
+            "pending": len(queue.get("queue_pending", [])),
+        }
+        return True
+    
+    def queue_depth(self) -> Optional[int]:
+        """Read /queue now and return running + pending prompts, or None if it does not answer."""
+        try:
+            queue = self._get_json("/queue")
+        except Exception:
+            return None
+        return len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+
+class ProcessTreeSampler:
+    """Samples CPU, memory, threads and handles over a process tree.
+
+    Child processes are cached and re-listed only every ``refresh_interval``
+    seconds (or when one exits); reusing the same ``psutil.Process`` objects
+    also keeps their ``cpu_percent`` deltas meaningful between ticks.
+    """
+    
+    def __init__(self, pid: int, refresh_interval: float = 30.0):
+        self.root = psutil.Process(pid)
+        self.root.cpu_percent(interval=None)
+        self.refresh_interval = refresh_interval
+        self._children: Dict[int, psutil.Process] = {}
+        self._last_refresh = 0.0
+    
+    def _refresh_children(self) -> None:
+        children = {}
+        for child in self.root.children(recursive=True):
+            cached = self._children.get(child.pid)
+            if cached is not None and cached == child:
+                children[child.pid] = cached
+                continue
+            try:
+                child.cpu_percent(interval=None)
+            except psutil.Error:
+                continue
+            children[child.pid] = child
+        self._children = children
+        self._last_refresh = time.time()
+    
+    def sample(self) -> Dict[str, float]:
+        """Return totals across the tree; raises psutil.Error if the root is gone."""
+        if time.time() - self._last_refresh >= self.refresh_interval:
+            self._refresh_children()
+        totals = {"cpu_percent": 0.0, "rss_bytes": 0, "vms_bytes": 0, "threads": 0, "handles": 0,
+                  "processes": 0}
+        gone = []
+        for proc in [self.root, *self._children.values()]:
+            try:
+                with proc.oneshot():
+                    totals["cpu_percent"] += proc.cpu_percent(interval=None)
+                    mem = proc.memory_info()
+                    totals["rss_bytes"] += mem.rss
+                    totals["vms_bytes"] += mem.vms
+                    totals["threads"] += proc.num_threads()
+                    totals["handles"] += proc.num_handles() if os.name == "nt" else proc.num_fds()
+                totals["processes"] += 1
+            except psutil.NoSuchProcess:
+                if proc is self.root:
+                    raise
+                gone.append(proc.pid)
+            except psutil.AccessDenied:
+                totals["processes"] += 1
+        if gone:
+            for pid in gone:
+                self._children.pop(pid, None)
+            # Re-list on the next tick in case replacements were spawned
+            self._last_refresh = 0.0
+        return totals
+    
+    def open_paths(self) -> Set[str]:
+        """Files the tree has open or memory-mapped (model weights are usually mapped)."""
+        paths: Set[str] = set()
+        for proc in [self.root, *self._children.values()]:
+            try:
+                paths.update(f.path for f in proc.open_files())
+                paths.update(m.path for m in proc.memory_maps(grouped=True) if m.path)
+            except (psutil.Error, OSError):
+                continue
+        return paths
+
+class MemoryWatchdog:
+    """Tracks the process tree's RSS and reports a ceiling breach or sustained growth.
+    
+    The slope is a least-squares fit over the last ``window_secs`` of samples and
+    is only judged once the window is full and ``warmup_secs`` have passed, so the
+    first model loads after boot do not count as a leak. Growth must also be
+    steady: the median of each quarter of the window has to exceed the one
+    before, so a single step (loading another model) is not mistaken for a leak.
+    """
+    
+    def __init__(self, ceiling_mb: float = 0.0, growth_mb_per_hour: float = 0.0,
+                 window_secs: float = 3600.0, warmup_secs: float = 900.0):
+        self.ceiling_mb = ceiling_mb
+        self.growth_mb_per_hour = growth_mb_per_hour
+        self.window_secs = window_secs
+        self.warmup_secs = warmup_secs
+        self.reset()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ceiling_mb > 0 or self.growth_mb_per_hour > 0
+    
+    def reset(self, started: Optional[float] = None) -> None:
+        """Forget the samples of a previous process."""
+        self.started = time.time() if started is None else started
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._first: Optional[Tuple[float, float]] = None
+    
+    def add(self, now: float, rss_bytes: float) -> None:
+        mb = rss_bytes / (1024 * 1024)
+        if self._first is None:
+            self._first = (now, mb)
+        self._samples.append((now, mb))
+        while self._samples and now - self._samples[0][0] > self.window_secs:
+            self._samples.popleft()
+    
+    def slope(self) -> Optional[float]:
+        """RSS growth in MB/hour over the window, or None until the window is full."""
+        if len(self._samples) < 3 or self._first is None:
+            return None
+        t0 = self._samples[0][0]
+        if self._samples[-1][0] - self._first[0] < self.window_secs * 0.9:
+            return None
+        n = len(self._samples)
+        mean_t = sum(t - t0 for t, _ in self._samples) / n
+        mean_m = sum(m for _, m in self._samples) / n
+        var = sum((t - t0 - mean_t) ** 2 for t, _ in self._samples)
+        if var <= 0:
+            return None
+        cov = sum((t - t0 - mean_t) * (m - mean_m) for t, m in self._samples)
+        return cov / var * 3600
+    
+    def _steady(self) -> bool:
+        values = [m for _, m in self._samples]
+        size = len(values) // 4
+        if size == 0:
+            return False
+        medians = [sorted(values[i * size:(i + 1) * size])[size // 2] for i in range(4)]
+        return all(b > a for a, b in zip(medians, medians[1:]))
+    
+    def check(self, now: float) -> Optional[str]:
+        """Return why the process should be recycled, or None."""
+        if not self._samples:
+            return None
+        current = self._samples[-1][1]
+        if self.ceiling_mb > 0 and current > self.ceiling_mb:
+            return f"RSS {current:.0f} MB exceeds the {self.ceiling_mb:.0f} MB ceiling"
+        if self.growth_mb_per_hour > 0 and now - self.started >= self.warmup_secs:
+            slope = self.slope()
+            if slope is not None and slope > self.growth_mb_per_hour and self._steady():
+                return (f"RSS grew {slope:.0f} MB/h over the last {self.window_secs / 60:.0f} min "
+                        f"(limit {self.growth_mb_per_hour:.0f} MB/h), now {current:.0f} MB")
+        return None
+    
+    def curve(self, points: int = 8) -> str:
+        """A short ``+minutes: MB`` summary of the samples in the window."""
+        if not self._samples:
+            return "no samples"
+        samples = list(self._samples)
+        step = max(1, len(samples) // points)
+        picked = samples[::step]
+        if picked[-1] is not samples[-1]:
+            picked.append(samples[-1])
+        return ", ".join(f"+{(t - self.started) / 60:.0f}m {m:.0f} MB" for t, m in picked)
+
+class LauncherMetrics:
+    """Launcher and process-tree metrics in the Prometheus text format."""
+    
+    GAUGES = {
+        "tree_cpu_percent": "CPU percent summed over the ComfyUI process tree",
+        "tree_rss_bytes": "Resident memory summed over the process tree",
+        "tree_vms_bytes": "Virtual memory summed over the process tree",
+        "tree_threads": "Threads in the process tree",
+        "tree_handles": "Open handles (Windows) or file descriptors in the process tree",
+        "tree_processes": "Processes in the tree",
+        "silence_seconds": "Seconds since ComfyUI last wrote output",
+        "quiet_cpu_seconds": "Seconds the tree CPU has stayed below QUIET_CPU_THRESHOLD",
+        "time_to_ready_seconds": "Seconds from launch to readiness for the current process",
+        "log_lines_per_second": "Output lines per second over the last monitor interval",
+        "up": "1 if the last HTTP health check succeeded",
+        "health_check_latency_seconds": "Latency of the last successful health check",
+        "queue_running": "Prompts executing, from /queue",
+        "queue_pending": "Prompts waiting, from /queue",
+        "process_start_time_seconds": "Unix time the current ComfyUI process was launched",
+        "memory_growth_mb_per_hour": "RSS growth of the process tree over MEMORY_WINDOW_SECS",
+        "memory_recycle_pending": "1 while a memory recycle waits for the queue to empty",
+        "prewarm_bytes": "Bytes of workflow models read into the page cache at startup",
+        "prewarm_seconds": "Seconds the startup prewarm took",
+        "model_cache_bytes": "Bytes held in the local model cache",
+    }
+    
+    COUNTERS = {
+        "frontend_requests_total": "Requests routed to this instance by the front end",
+        "prompts_routed_total": "Prompts routed to this instance by the front end",
+        "model_cache_hits_total": "Models ComfyUI loaded from the local cache",
+        "model_cache_misses_total": "Models ComfyUI loaded from MODEL_BASE_PATH instead of the cache",
+        "model_cache_served_bytes_total": "Bytes of models loaded from the local cache",
+        "model_source_served_bytes_total": "Bytes of models loaded from MODEL_BASE_PATH",
+    }
+    
+    def __init__(self, labels: Optional[Dict[str, str]] = None):
+        self.labels = labels or {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._restarts: Dict[str, int] = {}
+        self._log_lines: Dict[str, int] = {"stdout": 0, "stderr": 0}
+        self._launches = 0
+        self._last_restart_reason = ""
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def set(self, **values: float) -> None:
+        with self._lock:
+            self._gauges.update(values)
+    
+    def inc(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+    
+    def add_lines(self, stream: str, count: int) -> None:
+        with self._lock:
+            self._log_lines[stream] = self._log_lines.get(stream, 0) + count
+    
+    def total_lines(self) -> int:
+        with self._lock:
+            return sum(self._log_lines.values())
+    
+    def record_launch(self, started: Optional[float] = None) -> None:
+        with self._lock:
+            self._launches += 1
+            self._gauges["process_start_time_seconds"] = started or time.time()
+            for name in ("time_to_ready_seconds", "up"):
+                self._gauges.pop(name, None)
+    
+    def record_restart(self, reason: str) -> None:
+        with self._lock:
+            self._restarts[reason] = self._restarts.get(reason, 0) + 1
+            self._last_restart_reason = reason
+    
+    def samples(self) -> List[Tuple[str, str, str, Dict[str, str], float]]:
+        """Return ``(name, type, help, labels, value)`` for every metric."""
+        with self._lock:
+            gauges = dict(self._gauges)
+            counters = dict(self._counters)
+            restarts = dict(self._restarts)
+            log_lines = dict(self._log_lines)
+            launches = self._launches
+            last_reason = self._last_restart_reason
+        base = self.labels
+        out = []
+        for name, help_text in self.GAUGES.items():
+            if name in gauges:
+                out.append((name, "gauge", help_text, base, gauges[name]))
+        out.append(("launches_total", "counter", "ComfyUI processes started by the launcher", base, launches))
+        for reason, count in sorted(restarts.items()):
+            out.append(("restarts_total", "counter", "Restarts by reason", {**base, "reason": reason}, count))
+        if last_reason:
+            out.append(("last_restart_reason", "gauge", "Reason of the most recent restart",
+                        {**base, "reason": last_reason}, 1))
+        for stream, count in sorted(log_lines.items()):
+            out.append(("log_lines_total", "counter", "Output lines read from ComfyUI",
+                        {**base, "stream": stream}, count))
+        for name, help_text in self.COUNTERS.items():
+            if name in counters:
+                out.append((name, "counter", help_text, base, counters[name]))
+        return out
+    
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        return render_metrics([self])
+    
+    def write_textfile(self, path: Path, sources: Optional[List["LauncherMetrics"]] = None) -> None:
+        """Write metrics atomically for node_exporter's textfile collector."""
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(render_metrics(sources or [self]), encoding="utf-8")
+        os.replace(tmp, path)
+    
+    def serve(self, host: str, port: int, sources: Optional[List["LauncherMetrics"]] = None) -> None:
+        """Serve /metrics (for ``sources``, default this set) on a background thread."""
+        sources = sources or [self]
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_metrics(sources).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+    
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def relay_sockets(client: socket.socket, backend: socket.socket,
+                  on_close: Optional[Callable[[], None]] = None) -> None:
+    """Copy bytes both ways until either side closes; blocks the calling thread."""
+    for sock in (client, backend):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+    pair = (client, backend)
+    
+    def pump(src: socket.socket, dst: socket.socket):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            # Closing both ends also stops the opposite pump
+            for sock in pair:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+    
+    other = threading.Thread(target=pump, args=(backend, client), daemon=True)
+    other.start()
+    pump(client, backend)
+    other.join()
+    if on_close is not None:
+        on_close()
+
+def render_metrics(sources: List[LauncherMetrics]) -> str:
+    """Render several metric sets (e.g. one per instance) as one exposition, grouped by metric."""
+    families: "OrderedDict[str, Tuple[str, str, List[Tuple[Dict[str, str], float]]]]" = OrderedDict()
+    for source in sources:
+        for name, kind, help_text, labels, value in source.samples():
+            families.setdefault(name, (kind, help_text, []))[2].append((labels, value))
+    out = []
+    for name, (kind, help_text, rows) in families.items():
+        out.append(f"# HELP comfyui_{name} {help_text}")
+        out.append(f"# TYPE comfyui_{name} {kind}")
+        for labels, value in rows:
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            out.append(f"comfyui_{name}{{{label_str}}} {value}" if label_str else f"comfyui_{name} {value}")
+    return "\n".join(out) + "\n"
+
+class TcpForwarder:
+    """Relays connections on the public port to whichever backend port is active.
+
+    Switching only affects new connections; ``close_backend`` drops the ones
+    still relayed to a retired backend. Raw TCP, so HTTP and websockets both pass.
+    """
+    
+    def __init__(self, host: str, port: int, logger: logging.Logger, backend_host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.backend_host = backend_host
+        self.backend_port: Optional[int] = None
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._connections: Dict[int, Set[socket.socket]] = {}
+        self._listener: Optional[socket.socket] = None
+    
+    def start(self) -> None:
+        self._listener = socket.create_server((self.host, self.port), backlog=128)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+    
+    def switch(self, backend_port: int) -> None:
+        self.backend_port = backend_port
+    
+    def _accept_loop(self) -> None:
+        while self._listener is not None:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._relay, args=(client,), daemon=True).start()
+    
+    def _relay(self, client: socket.socket) -> None:
+        port = self.backend_port
+        try:
+            if port is None:
+                raise OSError("no backend")
+            backend = socket.create_connection((self.backend_host, port), timeout=10)
+            backend.settimeout(None)
+        except OSError:
+            client.close()
+            return
+        pair = {client, backend}
+        with self._lock:
+            self._connections.setdefault(port, set()).update(pair)
+        
+        def forget():
+            with self._lock:
+                self._connections.get(port, set()).difference_update(pair)
+        
+        relay_sockets(client, backend, on_close=forget)
+    
+    def open_connections(self, backend_port: int) -> int:
+        with self._lock:
+            return len(self._connections.get(backend_port, ())) // 2
+    
+    def close_backend(self, backend_port: int) -> None:
+        """Drop every connection still relayed to a backend."""
+        with self._lock:
+            socks = self._connections.pop(backend_port, set())
+        for sock in socks:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+    
+    def stop(self) -> None:
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.close()
+        for port in list(self._connections):
+            self.close_backend(port)
+
+class LoadBalancer:
+    """HTTP front end on SERVER_PORT for several ComfyUI instances.
+
+    Every connection carries one request (``Connection: close`` is forced), so
+    only the request head is parsed. Websockets are pinned to an instance by
+    ``clientId``. A ``/prompt`` from a client with an open websocket goes to
+    that instance so its progress events arrive; other prompts go to the
+    instance with the shortest queue. ``/history/<prompt_id>`` follows the
+    prompt, and remaining requests follow the caller's latest websocket.
+    """
+    
+    MAX_HEAD = 64 * 1024
+    HOP_HEADERS = ("connection", "keep-alive", "proxy-connection")
+    
+    def __init__(self, host: str, port: int, instances: List["ComfyUILauncher"], logger: logging.Logger):
+        self.host = host
+        self.port = port
+        self.instances = instances
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, int] = {}
+        self._client_hosts: Dict[str, int] = {}
+        self._prompts: "OrderedDict[str, int]" = OrderedDict()
+        self._submitting = [0] * len(instances)
+        self._next = 0
+        self._listener: Optional[socket.socket] = None
+    
+    def start(self) -> None:
+        self._listener = socket.create_server((self.host, self.port), backlog=128)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+    
+    def stop(self) -> None:
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.close()
+    
+    def _accept_loop(self) -> None:
+        while self._listener is not None:
+            try:
+                client, addr = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(client, addr[0]), daemon=True).start()
+    
+    def _available(self) -> List[int]:
+        ready = [i for i, inst in enumerate(self.instances) if inst.is_available()]
+        return ready or list(range(len(self.instances)))
+    
+    def _least_loaded(self) -> int:
+        """Pick the instance with the fewest running, pending and in-flight prompts."""
+        candidates = self._available()
+        with self._lock:
+            start = self._next
+            self._next += 1
+        best, best_load = candidates[0], None
+        # Rotate the starting point so ties spread across instances
+        for k in range(len(candidates)):
+            i = candidates[(start + k) % len(candidates)]
+            depth = self.instances[i].probe.queue_depth()
+            if depth is None:
+                continue
+            with self._lock:
+                load = depth + self._submitting[i]
+            if best_load is None or load < best_load:
+                best, best_load = i, load
+        return best
+    
+    def _default_for(self, client_host: str) -> int:
+        with self._lock:
+            i = self._client_hosts.get(client_host)
+        available = self._available()
+        return i if i in available else available[0]
+    
+    @staticmethod
+    def _read_head(sock: socket.socket) -> Tuple[Optional[bytes], bytes]:
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = sock.recv(65536)
+            if not chunk or len(data) > LoadBalancer.MAX_HEAD:
+                return None, b""
+            data += chunk
+        head, _, rest = data.partition(b"\r\n\r\n")
+        return head, rest
+    
+    @staticmethod
+    def _read_chunked(sock: socket.socket, data: bytes) -> bytes:
+        """Read a chunked request body that starts with ``data``; returns the decoded body."""
+        def need(condition):
+            nonlocal data
+            while not condition():
+                chunk = sock.recv(65536)
+                if not chunk:
+                    raise ConnectionError("client closed during a chunked body")
+                data += chunk
+        
+        body = b""
+        while True:
+            need(lambda: b"\r\n" in data)
+            size_line, _, data = data.partition(b"\r\n")
+            size = int(size_line.split(b";")[0].strip(), 16)
+            if size == 0:
+                # Optional trailers end with an empty line
+                need(lambda: data.startswith(b"\r\n") or b"\r\n\r\n" in data)
+                return body
+            need(lambda: len(data) >= size + 2)
+            body += data[:size]
+            data = data[size + 2:]
+    
+    @staticmethod
+    def _with_length(head: bytes, length: int) -> bytes:
+        """Replace Transfer-Encoding/Content-Length in a request head with a fixed length."""
+        lines = [l for l in head.split(b"\r\n")
+                 if l.split(b":", 1)[0].strip().lower() not in (b"transfer-encoding", b"content-length")]
+        return b"\r\n".join(lines + [b"Content-Length: " + str(length).encode()])
+    
+    @classmethod
+    def _close_head(cls, head: bytes) -> bytes:
+        """Re-emit a request head with hop-by-hop headers replaced by ``Connection: close``."""
+        lines = head.split(b"\r\n")
+        kept = [lines[0]] + [l for l in lines[1:]
+                             if l.split(b":", 1)[0].strip().lower().decode("latin-1") not in cls.HOP_HEADERS]
+        return b"\r\n".join(kept + [b"Connection: close"]) + b"\r\n\r\n"
+    
+    def _connect(self, i: int) -> socket.socket:
+        backend = socket.create_connection(("127.0.0.1", self.instances[i].backend_port), timeout=10)
+        backend.settimeout(None)
+        return backend
+    
+    def _handle(self, client: socket.socket, client_host: str) -> None:
+        try:
+            head, rest = self._read_head(client)
+            if head is None:
+                client.close()
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            method, target = lines[0].split(" ")[:2]
+            headers = {}
+            for line in lines[1:]:
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            path, _, query = target.partition("?")
+            # The newer frontend prefixes API routes with /api
+            route = path[4:] if path.startswith("/api/") else path
+            
+            if headers.get("upgrade", "").lower() == "websocket":
+                self._handle_websocket(client, client_host, head + b"\r\n\r\n" + rest, query)
+            elif method == "POST" and route == "/prompt":
+                self._handle_prompt(client, head, rest, headers)
+            else:
+                i = self._default_for(client_host)
+                if route.startswith("/history/"):
+                    with self._lock:
+                        i = self._prompts.get(route[len("/history/"):], i)
+                self.instances[i].metrics.inc("frontend_requests_total")
+                backend = self._connect(i)
+                backend.sendall(self._close_head(head) + rest)
+                relay_sockets(client, backend)
+        except Exception as e:
+            self.logger.warning(f"Front end request failed: {e}")
+            try:
+                client.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            client.close()
+    
+    def _handle_websocket(self, client: socket.socket, client_host: str, request: bytes, query: str) -> None:
+        client_id = parse_qs(query).get("clientId", [None])[0]
+        with self._lock:
+            i = self._sessions.get(client_id) if client_id else None
+        if i is None:
+            i = self._least_loaded()
+        with self._lock:
+            if client_id:
+                self._sessions[client_id] = i
+            self._client_hosts[client_host] = i
+        backend = self._connect(i)
+        backend.sendall(request)
+        
+        def unpin():
+            with self._lock:
+                if client_id and self._sessions.get(client_id) == i:
+                    del self._sessions[client_id]
+        
+        relay_sockets(client, backend, on_close=unpin)
+    
+    def _handle_prompt(self, client: socket.socket, head: bytes, body: bytes, headers: Dict[str, str]) -> None:
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            body = self._read_chunked(client, body)
+            head = self._with_length(head, len(body))
+        elif "content-length" not in headers:
+            client.sendall(b"HTTP/1.1 411 Length Required\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            client.close()
+            return
+        else:
+            length = int(headers["content-length"] or 0)
+            while len(body) < length:
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                body += chunk
+        try:
+            client_id = json.loads(body or b"{}").get("client_id")
+        except ValueError:
+            client_id = None
+        with self._lock:
+            i = self._sessions.get(client_id) if client_id else None
+        if i is None:
+            i = self._least_loaded()
+        with self._lock:
+            self._submitting[i] += 1
+        try:
+            backend = self._connect(i)
+            with backend:
+                backend.sendall(self._close_head(head) + body)
+                response = b""
+                while True:
+                    chunk = backend.recv(65536)
+                    if not chunk:
+                        break
+                    response += chunk
+        finally:
+            with self._lock:
+                self._submitting[i] -= 1
+        
+        # Remember where the prompt went so /history/<prompt_id> can follow it
+        try:
+            prompt_id = json.loads(response.partition(b"\r\n\r\n")[2]).get("prompt_id")
+        except (ValueError, AttributeError):
+            prompt_id = None
+        if prompt_id:
+            with self._lock:
+                self._prompts[prompt_id] = i
+                while len(self._prompts) > 10000:
+                    self._prompts.popitem(last=False)
+        metrics = self.instances[i].metrics
+        metrics.inc("prompts_routed_total")
+        metrics.inc("frontend_requests_total")
+        client.sendall(response)
+        client.close()
+
+class StartupProfiler:
+    """Timestamps ComfyUI's boot output and writes a startup report per launch.
+
+    Phases are recognised from known log lines, the "Prestartup/Import times
+    for custom nodes" blocks are parsed, and ``-X importtime`` output (when
+    enabled) is aggregated and kept out of the log. Reports go to
+    ``logs/startup``; ``history.jsonl`` keeps one summary line per launch.
+    """
+    
+    PHASES = (
+        ("prestartup", "prestartup times for custom nodes"),
+        ("torch_init", "total vram"),
+        ("model_paths", "adding extra search path"),
+        ("custom_nodes", "import times for custom nodes"),
+        ("server_start", "starting server"),
+        ("listening", "to see the gui"),
+    )
+    NODE_TIME = re.compile(r"^\s*([\d.]+) seconds(?: \(([^)]*)\))?: (.+)$")
+    IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+    
+    def __init__(self, report_dir: Path, logger: logging.Logger, comfyui_dir: Path,
+                 importtime: bool = False, name: Optional[str] = None, top: int = 15):
+        self.report_dir = report_dir
+        self.logger = logger
+        self.comfyui_dir = comfyui_dir
+        self.importtime = importtime
+        self.name = name
+        self.top = top
+        self.active = False
+        self._lock = threading.Lock()
+        self._reset(time.time())
+    
+    def _reset(self, launched_at: float) -> None:
+        self.launched_at = launched_at
+        self.first_output: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.node_times: Dict[str, List[Dict]] = {"prestartup": [], "import": []}
+        self.imports: List[Tuple[int, int, int, str]] = []
+        self._block: Optional[str] = None
+    
+    def start(self, launched_at: float) -> None:
+        with self._lock:
+            self._reset(launched_at)
+            self.active = True
+    
+    def feed(self, lines: List[str], now: float) -> List[str]:
+        """Record boot events from a batch of output lines; returns the lines that should be logged."""
+        with self._lock:
+            if not self.active:
+                return lines
+            if self.first_output is None:
+                self.first_output = now
+            keep = []
+            for line in lines:
+                if line.startswith("import time:"):
+                    m = self.IMPORT_TIME.match(line)
+                    if m:
+                        depth = max(0, len(m.group(3)) - 1) // 2
+                        self.imports.append((int(m.group(1)), int(m.group(2)), depth, m.group(4)))
+                    continue
+                keep.append(line)
+                lower = line.lower()
+                for phase, marker in self.PHASES:
+                    if phase not in self.phases and marker in lower:
+                        self.phases[phase] = now
+                if "times for custom nodes" in lower:
+                    self._block = "prestartup" if lower.startswith("prestartup") else "import"
+                    continue
+                if self._block:
+                    m = self.NODE_TIME.match(line)
+                    if m:
+                        self.node_times[self._block].append({
+                            "node": re.split(r"[\\/]", m.group(3).rstrip("\\/"))[-1],
+                            "seconds": float(m.group(1)),
+                            "status": m.group(2) or "ok",
+                        })
+                    else:
+                        self._block = None
+            return keep
+    
+    def _comfyui_version(self) -> Dict[str, Optional[str]]:
+        version = commit = None
+        try:
+            m = re.search(r'__version__\s*=\s*"([^"]+)"', (self.comfyui_dir / "comfyui_version.py").read_text())
+            version = m.group(1) if m else None
+        except OSError:
+            pass
+        try:
+            head = (self.comfyui_dir / ".git" / "HEAD").read_text().strip()
+            if head.startswith("ref: "):
+                ref = self.comfyui_dir / ".git" / head[5:]
+                head = ref.read_text().strip() if ref.exists() else None
+            commit = head[:12] if head else None
+        except OSError:
+            pass
+        return {"version": version, "commit": commit}
+    
+    def finish(self, ready_at: float) -> Optional[Dict]:
+        """Write the report for the current launch and compare it with the history."""
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+            self.phases["ready"] = ready_at
+            origin = self.launched_at
+            phases = {"python_start": round((self.first_output or origin) - origin, 3)}
+            phases.update({k: round(v - origin, 3) for k, v in sorted(self.phases.items(), key=lambda kv: kv[1])})
+            nodes = {block: sorted(times, key=lambda t: -t["seconds"]) for block, times in self.node_times.items()}
+            imports = list(self.imports)
+        
+        # Time spent reaching each marker from the previous one
+        names = list(phases)
+        durations = {name: round(phases[name] - (phases[names[i - 1]] if i else 0.0), 3)
+                     for i, name in enumerate(names)}
+        report = {
+            "launched_at": datetime.fromtimestamp(origin).isoformat(timespec="seconds"),
+            "instance": self.name,
+            "importtime": self.importtime,
+            "comfyui": self._comfyui_version(),
+            "total_seconds": round(ready_at - origin, 3),
+            "phases": phases,
+            "phase_durations": durations,
+            "custom_nodes": nodes["import"],
+            "prestartup_nodes": nodes["prestartup"],
+            "custom_nodes_seconds": round(sum(t["seconds"] for t in nodes["import"]), 3),
+        }
+        if imports:
+            report["slowest_packages"] = [
+                {"module": mod, "cumulative_ms": round(cum / 1000, 1)}
+                for _, cum, depth, mod in sorted((i for i in imports if i[2] == 0), key=lambda i: -i[1])[:self.top]
+            ]
+            report["slowest_modules_self"] = [
+                {"module": mod, "self_ms": round(own / 1000, 1)}
+                for own, _, _, mod in sorted(imports, key=lambda i: -i[0])[:self.top]
+            ]
+        
+        try:
+            self.report_dir.mkdir(parents=True, exist_ok=True)
+            suffix = f"_{self.name}" if self.name else ""
+            stamp = datetime.fromtimestamp(origin).strftime('%Y%m%d_%H%M%S')
+            report_file = self.report_dir / f"startup_{stamp}{suffix}.json"
+            report_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            self._compare_with_history(report)
+        except OSError as e:
+            self.logger.error(f"Could not write startup report: {e}")
+            return report
+        
+        slow = ", ".join(f"{t['node']} {t['seconds']:.1f}s" for t in nodes["import"][:3])
+        self.logger.info(
+            f"Startup took {report['total_seconds']:.1f}s ("
+            + ", ".join(f"{k} {v:.1f}s" for k, v in durations.items())
+            + (f"; slowest custom nodes: {slow}" if slow else "")
+            + f"); report: {report_file}"
+        )
+        return report
+    
+    def _compare_with_history(self, report: Dict) -> None:
+        """Append to history.jsonl and warn when boot got notably slower than recent launches."""
+        history_file = self.report_dir / "history.jsonl"
+        previous = []
+        if history_file.exists():
+            with open(history_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    # -X importtime slows boot down, so only compare like with like
+                    if entry.get("instance") == report["instance"] and entry.get("importtime") == report["importtime"]:
+                        previous.append(entry)
+        summary = {k: report[k] for k in ("launched_at", "instance", "importtime", "comfyui", "total_seconds",
+                                          "phase_durations", "custom_nodes_seconds")}
+        with open(history_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+        
+        recent = sorted(e["total_seconds"] for e in previous[-5:])
+        if not recent:
+            return
+        median = recent[len(recent) // 2]
+        if report["total_seconds"] > median * 1.2 and report["total_seconds"] - median > 5:
+            changed = ""
+            before = previous[-1].get("comfyui", {})
+            if before != report["comfyui"]:
+                changed = f" after ComfyUI changed from {before.get('version')}@{before.get('commit')} " \
+                          f"to {report['comfyui']['version']}@{report['comfyui']['commit']}"
+            self.logger.warning(
+                f"Startup regression{changed}: {report['total_seconds']:.1f}s vs a median of {median:.1f}s "
+                f"over the last {len(recent)} launches"
+            )
+
 class ComfyUILauncher:
     # Class-level annotations to satisfy static analysis
     _readiness_event: threading.Event
-    _last_output_lock: threading.Lock
     _last_output_ts: float
     no_output_restart_secs: int
     monitor_interval: int
     boot_wait_time: int
     server_port: str
-    def __init__(self):
-        # Initialize logger first
-        self.logger = ComfyUILogger()
-
-        # Load environment variables
+    def __init__(self, instance: Optional[int] = None):
+        # Load environment variables (log rotation settings are read by the logger)
         load_dotenv(override=True)
 
+        # Initialize logger; each supervised instance gets its own log stream
+        self.instance = instance
+        self.logger = ComfyUILogger(name=f"instance{instance}" if instance is not None else None)
+
         # Set up paths
         self.user_home = Path(os.environ["USERPROFILE"])
         self.comfyui_dir = Path(os.getenv("COMFYUI_DIR", self.user_home / "ComfyUI"))
@@ -97,6 +1123,30 @@ class ComfyUILauncher:
         self.temp_dir = os.getenv("TEMP_DIR")
         self.server_port = os.getenv("SERVER_PORT", "8188")
         self.custom_parameters = os.getenv("CUSTOM_PARAMETERS", "").split()
+        self.script_dir = Path(__file__).parent.resolve()
+        self.model_dir = Path(self.model_base_path or self.comfyui_dir / "models")
+        self.verify_models_on_start = os.getenv("VERIFY_MODELS_ON_START", "1") not in ("0", "false", "False")
+        # Workflow files/folders whose models are read into the page cache while ComfyUI boots
+        self.prewarm_workflows = [p.strip() for p in os.getenv("PREWARM_WORKFLOWS", "").split(";") if p.strip()]
+        self.prewarm_workers = int(os.getenv("PREWARM_WORKERS", "4"))
+        self.prewarm_max_gb = float(os.getenv("PREWARM_MAX_GB", "0"))
+        # Local SSD cache in front of a slow (NAS) MODEL_BASE_PATH, filled on first use and LRU-evicted
+        self.model_cache: Optional[ModelCache] = None
+        cache_dir = os.getenv("MODEL_CACHE_DIR")
+        if cache_dir and self.model_base_path:
+            self.model_cache = ModelCache(
+                Path(cache_dir),
+                Path(self.model_base_path),
+                int(float(os.getenv("MODEL_CACHE_MAX_GB", "200")) * 1024 ** 3),
+                self.logger.logger
+            )
+        self.model_cache_scan_secs = float(os.getenv("MODEL_CACHE_SCAN_SECS", "60"))
+        # Inventory of the model tree (shared with install_models.py), refreshed incrementally at startup
+        self.inventory: Optional[ModelInventory] = None
+        if os.getenv("MODEL_INVENTORY", "1") not in ("0", "false", "False"):
+            self.inventory = ModelInventory(self.model_dir / ".inventory.json", self.model_dir, logger=self.logger.logger)
+        self._models_in_use: Dict[str, str] = {}
+        self._cache_queue: "queue.Queue[str]" = queue.Queue()
 
         # Timings and monitoring thresholds
         self.monitor_interval = int(os.getenv("MONITOR_INTERVAL", "10"))
@@ -106,19 +1156,149 @@ class ComfyUILauncher:
         self.quiet_cpu_threshold = float(os.getenv("QUIET_CPU_THRESHOLD", "2.0"))
         self.quiet_cpu_window_secs = int(os.getenv("QUIET_CPU_WINDOW_SECS", "300"))
 
+        # Active HTTP probing of the server for readiness and health
+        self.health_checks = os.getenv("HEALTH_CHECKS", "1") not in ("0", "false", "False")
+        self.health_check_interval = int(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
+        self.health_failure_threshold = int(os.getenv("HEALTH_FAILURE_THRESHOLD", "3"))
+        # Metrics: served on METRICS_PORT and/or written to METRICS_TEXTFILE each monitor tick
+        self.metrics = LauncherMetrics(labels={"instance": str(instance)} if instance is not None else None)
+        self.metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))
+        self.metrics_textfile = os.getenv("METRICS_TEXTFILE")
+        self.child_refresh_secs = float(os.getenv("CHILD_REFRESH_SECS", "30"))
+        self.health_check_host = os.getenv("HEALTH_CHECK_HOST", "127.0.0.1")
+        self.health_check_timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT", "10"))
+        self.probe = self._make_probe(self.server_port)
+
+        # Memory watchdog: recycle ComfyUI between jobs when its tree's RSS passes a ceiling or keeps growing
+        self.memory_watchdog = MemoryWatchdog(
+            ceiling_mb=float(os.getenv("MEMORY_CEILING_MB", "0")),
+            growth_mb_per_hour=float(os.getenv("MEMORY_GROWTH_MB_PER_HOUR", "0")),
+            window_secs=float(os.getenv("MEMORY_WINDOW_SECS", "3600")),
+            warmup_secs=float(os.getenv("MEMORY_WARMUP_SECS", "900"))
+        )
+        self._recycle_pending = False
+
+        # Warm standby: ComfyUI runs on alternating backend ports behind a forwarder on SERVER_PORT,
+        # so a restart boots the replacement before the old process is retired
+        self.warm_standby = os.getenv("WARM_STANDBY", "0") in ("1", "true", "True")
+        port = int(self.server_port)
+        self.standby_ports = [int(p) for p in os.getenv("STANDBY_PORTS", f"{port + 1},{port + 2}").split(",")]
+        self.standby_drain_secs = float(os.getenv("STANDBY_DRAIN_SECS", "5"))
+        self.active_port: Optional[int] = None
+        self.forwarder: Optional[TcpForwarder] = None
+        self._standby: Optional[subprocess.Popen] = None
+        if self.warm_standby and not self.health_checks:
+            self.logger.logger.warning("WARM_STANDBY needs HEALTH_CHECKS=1; warm standby disabled")
+            self.warm_standby = False
+
+        # Startup profiling: per-launch boot report (optionally with -X importtime) plus history
+        self.startup_profile = os.getenv("STARTUP_PROFILE", "0") in ("1", "true", "True")
+        self.profiler = StartupProfiler(
+            self.logger.log_dir / "startup",
+            self.logger.logger,
+            self.comfyui_dir,
+            importtime=os.getenv("STARTUP_IMPORTTIME", "0") in ("1", "true", "True"),
+            name=f"instance{instance}" if instance is not None else None
+        )
+
+        # Multiple instances behind a load-balancing front end on SERVER_PORT
+        self.instances: List["ComfyUILauncher"] = []
+        self.frontend: Optional[LoadBalancer] = None
+        self.backend_port: Optional[int] = None
+        self.instance_env: Dict[str, str] = {}
+        instance_count = int(os.getenv("INSTANCES", "1"))
+        if instance is not None:
+            self._configure_instance(instance)
+        elif instance_count > 1:
+            if self.warm_standby:
+                self.logger.logger.warning("WARM_STANDBY is not supported with INSTANCES > 1; warm standby disabled")
+                self.warm_standby = False
+            self.instances = [ComfyUILauncher(instance=i) for i in range(instance_count)]
+            # One cache index and copy queue for every instance
+            for inst in self.instances:
+                inst.model_cache, inst._cache_queue = self.model_cache, self._cache_queue
+
         # Runtime state for monitoring
+        self._process: Optional[subprocess.Popen] = None
+        self._shutdown_event = threading.Event()
         self._readiness_event = threading.Event()
-        self._last_output_lock = threading.Lock()
+        # Written by the output readers, read by the monitor loop; a float store is atomic, so no lock
         self._last_output_ts = time.time()
     
+    def _configure_instance(self, index: int) -> None:
+        """Apply the per-instance port, device, parameter and environment overrides."""
+        ports = [p.strip() for p in os.getenv("INSTANCE_PORTS", "").split(",") if p.strip()]
+        self.backend_port = int(ports[index]) if index < len(ports) else int(self.server_port) + 1 + index
+        self.server_port = str(self.backend_port)
+        self.probe = self._make_probe(self.backend_port)
+        self.warm_standby = False
+        # Metrics are exported once for all instances by the parent launcher
+        self.metrics_port = 0
+        self.metrics_textfile = None
+        
+        self.custom_parameters = self.custom_parameters + os.getenv(f"INSTANCE_{index}_PARAMETERS", "").split()
+        devices = [d.strip() for d in os.getenv("INSTANCE_DEVICES", "").split(",") if d.strip()]
+        if devices:
+            self.instance_env["CUDA_VISIBLE_DEVICES"] = devices[index % len(devices)]
+        for pair in os.getenv(f"INSTANCE_{index}_ENV", "").split(";"):
+            key, sep, value = pair.partition("=")
+            if sep and key.strip():
+                self.instance_env[key.strip()] = value.strip()
+        # ComfyUI empties its temp directory at startup, so instances must not share one
+        self.temp_dir = str(Path(self.temp_dir or self.comfyui_dir) / f"instance{index}")
+    
+    def is_available(self) -> bool:
+        """True while this instance's process runs and its last health check passed."""
+        proc = self._process
+        return (proc is not None and proc.poll() is None and not self._recycle_pending
+                and self._readiness_event.is_set() and self.probe.last_error is None)
+    
+    def _metric_sources(self) -> List[LauncherMetrics]:
+        # The parent's set is unlabelled and holds shared series (prewarm, model cache)
+        return [self.metrics, *(inst.metrics for inst in self.instances)]
+    
+    def _run_instances(self, shutdown_event: threading.Event) -> None:
+        """Supervise every instance on its own thread behind the load-balancing front end."""
+        listen_host = self._listen_host()
+        self.frontend = LoadBalancer(listen_host, int(self.server_port), self.instances, self.logger.logger)
+        self.frontend.start()
+        self.logger.logger.info(
+            f"Supervising {len(self.instances)} instances on ports "
+            f"{[inst.backend_port for inst in self.instances]} behind {listen_host}:{self.server_port}"
+        )
+        
+        def supervise(inst: "ComfyUILauncher"):
+            try:
+                inst._supervise(shutdown_event)
+            except Exception as e:
+                inst.logger.logger.error(f"Critical error: {e}")
+        
+        threads = []
+        for inst in self.instances:
+            inst._shutdown_event = shutdown_event
+            thread = threading.Thread(target=supervise, args=(inst,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        
+        while not shutdown_event.wait(self.monitor_interval):
+            self._export_metrics()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.frontend.stop()
+        for inst in self.instances:
+            inst.logger.logger.info("ComfyUI instance stopped")
+            inst.logger.close()
+    
     def _create_model_paths_yaml(self) -> None:
-        """Create the extra_model_paths.yaml file if MODEL_BASE_PATH is set."""
+        """Create the extra_model_paths.yaml file if MODEL_BASE_PATH is set.
+
+        With a model cache, the cache is listed first so ComfyUI finds cached
+        copies before falling back to MODEL_BASE_PATH. MODEL_BASE_PATH stays the
+        default, so models downloaded from ComfyUI never land in the cache.
+        """
         if self.model_base_path:
-            yaml_content = f"""
-comfyui:
-  base_path: {self.model_base_path}
-  is_default: true
-  checkpoints: checkpoints
+            folders = """  checkpoints: checkpoints
   clip: clip
   clip_vision: clip_vision
   configs: configs
@@ -133,16 +1313,350 @@ comfyui:
   vae: vae
   reactor: reactor
 """
+            if self.model_cache is not None:
+                yaml_content = f"""
+model_cache:
+  base_path: {self.model_cache.cache_dir}
+{folders}
+comfyui:
+  base_path: {self.model_base_path}
+  is_default: true
+{folders}"""
+            else:
+                yaml_content = f"""
+comfyui:
+  base_path: {self.model_base_path}
+  is_default: true
+{folders}"""
             yaml_path = self.comfyui_dir / "extra_model_paths.yaml"
             yaml_path.write_text(yaml_content)
             self.logger.logger.info(f"Created model paths configuration at {yaml_path}")
     
-    def _launch_comfyui(self) -> Optional[subprocess.Popen]:
+    def _cache_worker(self, shutdown_event: threading.Event) -> None:
+        """Copy models ComfyUI loaded from MODEL_BASE_PATH into the cache, one at a time."""
+        while not shutdown_event.is_set():
+            try:
+                rel = self._cache_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if self.model_cache.fetch(rel) is not None:
+                self.metrics.set(model_cache_bytes=self.model_cache.used_bytes)
+    
+    def _track_model_usage(self, sampler: ProcessTreeSampler) -> None:
+        """Count cache hits and misses from the model files ComfyUI has open."""
+        in_use: Dict[str, str] = {}
+        for path in sampler.open_paths():
+            if not path.lower().endswith(MODEL_EXTENSIONS):
+                continue
+            found = self.model_cache.relative(Path(path))
+            if found is not None:
+                tier, rel = found
+                in_use[rel] = tier
+        for rel, tier in in_use.items():
+            # Count each load once, not every scan while it stays mapped
+            if self._models_in_use.get(rel) == tier:
+                continue
+            self.model_cache.record_use(rel, tier)
+            try:
+                size = os.path.getsize((self.model_cache.cache_dir if tier == "cache" else self.model_cache.source_dir) / rel)
+            except OSError:
+                size = 0
+            if tier == "cache":
+                self.metrics.inc("model_cache_hits_total")
+                self.metrics.inc("model_cache_served_bytes_total", size)
+                self.logger.logger.info(f"Model cache hit: {rel}")
+            else:
+                self.metrics.inc("model_cache_misses_total")
+                self.metrics.inc("model_source_served_bytes_total", size)
+                self.logger.logger.info(f"Model cache miss: {rel} is loading from {self.model_base_path}; caching it")
+                self._cache_queue.put(rel)
+        if in_use.keys() - self._models_in_use.keys():
+            self.model_cache.save()
+        self._models_in_use = in_use
+    
+    def _verify_models(self) -> None:
+        """Check the model tree against model_config.lock: sizes, cached hashes and the quick structural check."""
+        config_file = Path(os.getenv("MODEL_CONFIG", self.script_dir / "model_config.yaml"))
+        lock = load_lockfile(config_file.with_suffix('.lock'))
+        if lock is None:
+            return
+        try:
+            hash_cache = HashCache(self.model_dir / ".hash_cache.json", self.model_dir, self.logger.logger)
+            results = verify_lockfile(lock, self.model_dir, hash_cache, quick=True)
+            hash_cache.save()
+        except Exception as e:
+            self.logger.logger.error(f"Error verifying models against lockfile: {e}")
+            return
+        for status in ("missing", "mismatch"):
+            for path in results[status]:
+                self.logger.logger.warning(f"Model file {status}: {path}")
+        if results["quick"]:
+            self.logger.logger.info(
+                f"{len(results['quick'])} model files passed the quick structural check but have no cached hash; "
+                "run install_models.bat --verify-lock for a full check"
+            )
+        self.logger.logger.info(
+            f"Model lockfile check: {len(results['valid'])} valid, {len(results['quick'])} quick-verified, "
+            f"{len(results['missing'])} missing, {len(results['mismatch'])} mismatched"
+        )
+    
+    def _refresh_inventory(self) -> None:
+        """Rescan the model tree for new or changed files and log what it holds."""
+        start = time.time()
+        try:
+            counts = self.inventory.scan()
+        except OSError as e:
+            self.logger.logger.warning(f"Could not scan the model inventory: {e}")
+            return
+        entries = self.inventory.entries.values()
+        broken = [rel for rel, entry in self.inventory.entries.items() if entry.get('error')]
+        self.logger.logger.info(
+            f"Model inventory: {len(entries)} files, {sum(e['size'] for e in entries) / 1e9:.1f} GB "
+            f"({counts['added']} added, {counts['updated']} updated, {counts['removed']} removed) "
+            f"in {time.time() - start:.1f}s"
+        )
+        for rel in broken[:20]:
+            self.logger.logger.warning(f"Model file looks damaged: {rel} ({self.inventory.entries[rel]['error']})")
+        if len(broken) > 20:
+            self.logger.logger.warning(f"{len(broken) - 20} more damaged model files; "
+                                       "see install_models.bat --inventory --json")
+    
+    def _prewarm_models(self, shutdown_event: threading.Event) -> None:
+        """Read the models referenced by PREWARM_WORKFLOWS into the OS page cache."""
+        if self.inventory is not None:
+            self._refresh_inventory()
+        try:
+            refs = load_workflow_refs(Path(p) for p in self.prewarm_workflows)
+        except (OSError, ValueError) as e:
+            self.logger.logger.error(f"Could not read prewarm workflows: {e}")
+            return
+        roots = list(dict.fromkeys([self.model_dir, self.comfyui_dir / "models"]))
+        if self.model_cache is not None:
+            roots.insert(0, self.model_cache.cache_dir)
+        files = []
+        for node_type, ref in refs:
+            path = None
+            if self.inventory is not None and self.model_cache is None:
+                found = self.inventory.find(ref, LOADER_FOLDERS.get(node_type, ()))
+                if found is not None:
+                    rel, entry = found
+                    path = self.model_dir / rel
+                    if entry.get('parameters'):
+                        self.logger.logger.info(f"Prewarm: {rel} ({entry.get('quantization')}, "
+                                                f"{entry['parameters'] / 1e9:.2f}B parameters)")
+            path = path or resolve_model_ref(node_type, ref, roots)
+            if path is None:
+                self.logger.logger.warning(f"Prewarm: {ref} ({node_type}) not found under {', '.join(map(str, roots))}")
+                continue
+            found = self.model_cache.relative(path) if self.model_cache is not None else None
+            if found is not None and found[0] == "source":
+                # Copy to the local cache instead of warming the NAS copy
+                path = self.model_cache.fetch(found[1]) or path
+            files.append(path)
+        if self.model_cache is not None:
+            self.metrics.set(model_cache_bytes=self.model_cache.used_bytes)
+        if not files:
+            return
+        
+        # Warming more than fits in free RAM would only evict the first files again
+        if self.prewarm_max_gb > 0:
+            budget = int(self.prewarm_max_gb * 1024 ** 3)
+        else:
+            budget = int(psutil.virtual_memory().available * 0.8)
+        self.logger.logger.info(f"Prewarming {len(files)} model files referenced by {len(self.prewarm_workflows)} workflow path(s)")
+        total, elapsed = prewarm_files(files, workers=self.prewarm_workers, max_bytes=budget,
+                                       stop=shutdown_event, logger=self.logger.logger)
+        self.metrics.set(prewarm_bytes=total, prewarm_seconds=round(elapsed, 2))
+        rate = total / 1e6 / elapsed if elapsed > 0 else 0.0
+        self.logger.logger.info(f"Prewarmed {total / 1e9:.2f} GB in {elapsed:.1f}s ({rate:.0f} MB/s)")
+    
+    def _make_probe(self, port) -> HealthProbe:
+        return HealthProbe(str(port), host=self.health_check_host, timeout=self.health_check_timeout)
+    
+    def _listen_host(self) -> str:
+        """Address ComfyUI would bind given CUSTOM_PARAMETERS (used for the forwarder)."""
+        params = self.custom_parameters
+        for i, arg in enumerate(params):
+            if arg.startswith("--listen="):
+                return arg.split("=", 1)[1].split(",")[0]
+            if arg == "--listen":
+                value = params[i + 1] if i + 1 < len(params) and not params[i + 1].startswith("--") else "0.0.0.0"
+                return value.split(",")[0]
+        return "127.0.0.1"
+    
+    def _spare_port(self) -> int:
+        return next(p for p in self.standby_ports if p != self.active_port)
+    
+    def _activate(self, port: int, probe: HealthProbe) -> None:
+        """Route the forwarder and health checks to the backend on ``port``."""
+        self.active_port = port
+        self.probe = probe
+        if self.forwarder is not None:
+            self.forwarder.switch(port)
+    
+    def _swap_to_standby(self, process: subprocess.Popen,
+                         shutdown_event: threading.Event) -> Optional[subprocess.Popen]:
+        """Boot a replacement on the spare port, switch traffic once it answers, then retire ``process``."""
+        port = self._spare_port()
+        self.logger.logger.info(f"Starting warm standby on port {port} while the current instance keeps serving")
+        started = time.time()
+        standby = self._launch_comfyui(port)
+        if standby is None:
+            return None
+        self._standby = standby
+        try:
+            probe = self._make_probe(port)
+            ready, _ = self._wait_for_ready(standby, shutdown_event, probe)
+        finally:
+            self._standby = None
+        if not ready:
+            if not shutdown_event.is_set():
+                self.logger.logger.error(f"Standby on port {port} did not become ready; cold restarting")
+            if standby.poll() is None:
+                self._terminate_tree(standby)
+            return None
+        
+        old_port = self.active_port
+        self._activate(port, probe)
+        self.metrics.record_launch(started)
+        self.metrics.set(time_to_ready_seconds=round(time.time() - started, 3))
+        self.profiler.finish(time.time())
+        self._record_probe()
+        self.logger.logger.info(f"Switched traffic from port {old_port} to {port}; retiring the old instance")
+        
+        # Let in-flight requests on the old instance finish before it goes away
+        deadline = time.time() + self.standby_drain_secs
+        while self.forwarder.open_connections(old_port) and time.time() < deadline:
+            if shutdown_event.wait(0.2):
+                break
+        self._terminate_tree(process)
+        self.forwarder.close_backend(old_port)
+        return standby
+    
+    def _restart(self, process: subprocess.Popen, shutdown_event: threading.Event) -> Optional[subprocess.Popen]:
+        """Replace a running ComfyUI; returns the already-ready replacement when warm standby succeeds."""
+        if self.warm_standby:
+            replacement = self._swap_to_standby(process, shutdown_event)
+            if replacement is not None:
+                return replacement
+        self._terminate_tree(process)
+        return None
+    
+    def _wait_for_ready(self, process: subprocess.Popen, shutdown_event: threading.Event,
+                        probe: Optional[HealthProbe] = None):
+        """Wait until ComfyUI is ready; returns ``(ready, answered_over_http)``.
+
+        With an explicit ``probe`` (a standby), only an HTTP answer counts.
+        """
+        if not self.health_checks:
+            self.logger.logger.info("Waiting for ComfyUI to become ready (log-based)...")
+            return self._readiness_event.wait(timeout=self.boot_wait_time), False
+        
+        use_logs = probe is None
+        probe = probe or self.probe
+        self.logger.logger.info(f"Waiting for ComfyUI to answer on {probe.base_url}...")
+        start = time.time()
+        deadline = start + self.boot_wait_time
+        delay = 0.2
+        log_ready_at = None
+        while time.time() < deadline and not shutdown_event.is_set():
+            if process.poll() is not None:
+                return False, False
+            if probe.check():
+                self._readiness_event.set()
+                self.logger.logger.info(f"ComfyUI is ready after {time.time() - start:.1f}s")
+                return True, True
+            if use_logs and self._readiness_event.is_set():
+                # Logged readiness but never answers, e.g. --listen on another interface
+                log_ready_at = log_ready_at or time.time()
+                if time.time() - log_ready_at > 60:
+                    self.logger.logger.warning(
+                        f"ComfyUI reported readiness but {probe.base_url} does not answer "
+                        f"({probe.last_error}); falling back to log-based monitoring"
+                    )
+                    return True, False
+            shutdown_event.wait(min(delay, max(0.0, deadline - time.time())))
+            delay = min(delay * 1.5, 2.0)
+        return False, False
+    
+    def _record_probe(self, ok: bool = True) -> None:
+        """Copy the latest health probe result into the metrics."""
+        if not ok:
+            self.metrics.set(up=0)
+            return
+        self.metrics.set(up=1, health_check_latency_seconds=round(self.probe.last_latency or 0.0, 4))
+        if self.probe.last_queue is not None:
+            self.metrics.set(queue_running=self.probe.last_queue["running"],
+                             queue_pending=self.probe.last_queue["pending"])
+    
+    def _is_idle(self, http_ready: bool, silent_secs: float, quiet_cpu_secs: float) -> bool:
+        """True when no prompt is running or queued; without HTTP, when output and CPU are quiet."""
+        if http_ready:
+            return self.probe.queue_depth() == 0
+        return silent_secs >= 60 and quiet_cpu_secs >= 60
+    
+    def _export_metrics(self) -> None:
+        """Write the metrics textfile, if configured."""
+        if not self.metrics_textfile:
+            return
+        try:
+            self.metrics.write_textfile(Path(self.metrics_textfile), self._metric_sources())
+        except OSError as e:
+            self.logger.logger.warning(f"Could not write metrics textfile: {e}")
+    
+    def _read_output(self, pipe, level: int, chunk_size: int = 65536) -> None:
+        """Forward a binary child pipe to the log queue, one record per line."""
+        log_lines = self.logger.log_lines
+        add_lines = self.metrics.add_lines
+        stream = "stderr" if level >= logging.ERROR else "stdout"
+        profiler = self.profiler
+        ready = self._readiness_event
+        pending = b""
+        try:
+            with pipe:
+                read = getattr(pipe, "read1", pipe.read)
+                while True:
+                    chunk = read(chunk_size)
+                    if not chunk:
+                        break
+                    self._last_output_ts = time.time()
+                    lines = LINE_SPLIT.split(pending + chunk)
+                    pending = lines.pop()
+                    if len(pending) > chunk_size:
+                        # Runaway line without a terminator; log what we have
+                        lines.append(pending)
+                        pending = b""
+                    text = [line for line in (raw.decode("utf-8", errors="replace").strip() for raw in lines) if line]
+                    if profiler.active:
+                        text = profiler.feed(text, time.time())
+                    if not text:
+                        continue
+                    # One queued record per read, not per line
+                    log_lines(level, text)
+                    add_lines(stream, len(text))
+                    # Detect readiness from known messages
+                    if not ready.is_set():
+                        lower = "\n".join(text).lower()
+                        if any(marker in lower for marker in READY_MARKERS):
+                            ready.set()
+                line = pending.decode("utf-8", errors="replace").strip()
+                if line:
+                    log_lines(level, [line])
+        except Exception as e:
+            self.logger.logger.error(f"Error reading output: {e}")
+    
+    def _launch_comfyui(self, port: Optional[int] = None) -> Optional[subprocess.Popen]:
         """Launch ComfyUI process with output redirection, headless by default."""
         try:
             # Prefer launching directly with the current Python (env already activated by the batch file)
-            args = [sys.executable, "-B", "-s", "-u", str(self.comfyui_dir / "main.py"), f"--port={self.server_port}"]
+            args = [sys.executable, "-B", "-s", "-u"]
+            if self.startup_profile and self.profiler.importtime:
+                args.extend(["-X", "importtime"])
+            args.extend([str(self.comfyui_dir / "main.py"), f"--port={port or self.server_port}"])
             args.extend(self.custom_parameters)
+            if port is not None:
+                # Backends behind the forwarder stay on loopback; the forwarder owns the public address
+                args.append("--listen=127.0.0.1")
             
             if self.input_dir:
                 args.append(f"--input-directory={self.input_dir}")
@@ -151,32 +1665,14 @@ comfyui:
             if self.temp_dir:
                 args.append(f"--temp-directory={self.temp_dir}")
             
-            # Set up environment
+            # Set up environment; output is read as bytes and decoded as UTF-8
             env = os.environ.copy()
+            env.setdefault("PYTHONIOENCODING", "utf-8")
+            env.update(self.instance_env)
             
             self.logger.logger.info(f"Launching ComfyUI with arguments: {' '.join(args)}")
-            
-            def output_reader(pipe, log_func):
-                try:
-                    with pipe:
-                        for line in iter(pipe.readline, ''):
-                            line = line.strip()
-                            log_func(line)
-                            now = time.time()
-                            # Update last output timestamp
-                            with self._last_output_lock:
-                                self._last_output_ts = now
-                            # Detect readiness from known messages
-                            lower = line.lower()
-                            if (
-                                "to see the gui" in lower
-                                or "running on" in lower
-                                or "started server" in lower
-                                or "listening on" in lower
-                            ):
-                                self._readiness_event.set()
-                except Exception as e:
-                    self.logger.logger.error(f"Error reading output: {e}")
+            if self.startup_profile:
+                self.profiler.start(time.time())
             
             # On Windows, ensure no new console window is created for the child process
             creationflags = 0
@@ -195,8 +1691,6 @@ comfyui:
                 args,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
                 env=env,
                 cwd=str(self.comfyui_dir),
                 creationflags=creationflags,
@@ -204,13 +1698,13 @@ comfyui:
             )
             
             threading.Thread(
-                target=output_reader,
-                args=(process.stdout, self.logger.logger.info),
+                target=self._read_output,
+                args=(process.stdout, logging.INFO),
                 daemon=True
             ).start()
             threading.Thread(
-                target=output_reader,
-                args=(process.stderr, self.logger.logger.error),
+                target=self._read_output,
+                args=(process.stderr, logging.ERROR),
                 daemon=True
             ).start()
             
@@ -248,22 +1742,199 @@ comfyui:
             except psutil.Error:
                 pass
     
-    def run(self):
-        """Run ComfyUI with monitoring and auto-restart."""
-        process: Optional[subprocess.Popen] = None
-        shutdown_event = threading.Event()
-
-        def handle_sig(signum, frame):
+    def _handle_signal(self, signum, frame):
+        try:
+            self.logger.logger.info(f"Received signal {signum}; terminating subprocess tree...")
+        except Exception:
+            pass
+        self._shutdown_event.set()
+        for launcher in [self, *self.instances]:
             try:
-                self.logger.logger.info(f"Received signal {signum}; terminating subprocess tree...")
+                for proc in (launcher._process, launcher._standby):
+                    if proc and proc.poll() is None:
+                        launcher._terminate_tree(proc)
             except Exception:
                 pass
-            shutdown_event.set()
+    
+    def _supervise(self, shutdown_event: threading.Event) -> None:
+        """Launch, monitor and restart one ComfyUI process until shutdown."""
+        next_process: Optional[subprocess.Popen] = None
+        while not shutdown_event.is_set():
+            if next_process is not None:
+                # Warm standby already answered and took over the traffic
+                process, next_process = next_process, None
+                self._process = process
+                server_ready = http_ready = True
+                self._last_output_ts = time.time()
+            else:
+                launch_started = time.time()
+                port = self._spare_port() if self.warm_standby else self.backend_port
+                process = self._launch_comfyui(port)
+                self._process = process
+                if not process:
+                    self.metrics.record_restart("launch_failed")
+                    self.logger.logger.error("Failed to start ComfyUI. Retrying in 10 seconds...")
+                    shutdown_event.wait(10)
+                    continue
+                self.metrics.record_launch()
+                if port is not None:
+                    self._activate(port, self._make_probe(port))
+                
+                # Reset readiness and last output timestamps
+                self._readiness_event.clear()
+                self._last_output_ts = time.time()
+
+                # Wait for the server to answer over HTTP (or log readiness when probes are off)
+                server_ready, http_ready = self._wait_for_ready(process, shutdown_event)
+                if shutdown_event.is_set():
+                    if process and process.poll() is None:
+                        self._terminate_tree(process)
+                    break
+                
+                if server_ready:
+                    self.metrics.set(time_to_ready_seconds=round(time.time() - launch_started, 3))
+                    self.profiler.finish(time.time())
+                else:
+                    # Be lenient: continue monitoring instead of killing; many users suppress logs
+                    self.logger.logger.warning("No readiness signal within timeout; continuing to monitor")
+                if http_ready:
+                    self._record_probe()
+            
+            # Monitor loop
             try:
+                # Prime CPU percent for accurate readings
+                try:
+                    sampler: Optional[ProcessTreeSampler] = ProcessTreeSampler(
+                        process.pid, refresh_interval=self.child_refresh_secs
+                    )
+                except psutil.Error:
+                    sampler = None
+                last_line_total = self.metrics.total_lines()
+                last_tick = time.time()
+                quiet_cpu_accum = 0.0
+                health_failures = 0
+                last_health_check = time.time()
+                self.memory_watchdog.reset()
+                recycle_reason: Optional[str] = None
+                self._recycle_pending = False
+                last_cache_scan = 0.0
+                self._models_in_use = {}
+                if self.memory_watchdog.enabled:
+                    self.metrics.set(memory_recycle_pending=0)
+
+                while not shutdown_event.is_set():
+                    if process.poll() is not None:
+                        self.logger.logger.error("ComfyUI process has terminated unexpectedly")
+                        self.metrics.record_restart("exited")
+                        break
+
+                    # Periodic HTTP health check once the server has answered at least once
+                    if http_ready and time.time() - last_health_check >= self.health_check_interval:
+                        last_health_check = time.time()
+                        ok = self.probe.check()
+                        self._record_probe(ok)
+                        if ok:
+                            if health_failures:
+                                self.logger.logger.info("ComfyUI health check recovered")
+                            health_failures = 0
+                        else:
+                            health_failures += 1
+                            self.logger.logger.warning(
+                                f"Health check failed ({health_failures}/{self.health_failure_threshold}): "
+                                f"{self.probe.last_error}"
+                            )
+                            if health_failures >= self.health_failure_threshold:
+                                self.logger.logger.error(
+                                    f"ComfyUI failed {health_failures} consecutive health checks; restarting"
+                                )
+                                self.metrics.record_restart("health_check")
+                                next_process = self._restart(process, shutdown_event)
+                                break
+
+                    # Check for prolonged silence from the process (less aggressive)
+                    silent_secs = time.time() - self._last_output_ts
+
+                    # Compute CPU usage across process tree
+                    cpu_total = 0.0
+                    if sampler is not None:
+                        try:
+                            tree = sampler.sample()
+                            cpu_total = tree["cpu_percent"]
+                            self.metrics.set(**{f"tree_{name}": value for name, value in tree.items()})
+                            if self.memory_watchdog.enabled:
+                                self.memory_watchdog.add(time.time(), tree["rss_bytes"])
+                        except psutil.Error:
+                            pass
+                        if self.model_cache is not None and time.time() - last_cache_scan >= self.model_cache_scan_secs:
+                            last_cache_scan = time.time()
+                            self._track_model_usage(sampler)
+
+                    if cpu_total < self.quiet_cpu_threshold:
+                        quiet_cpu_accum += self.monitor_interval
+                    else:
+                        quiet_cpu_accum = 0.0
+
+                    now = time.time()
+                    line_total = self.metrics.total_lines()
+                    self.metrics.set(
+                        silence_seconds=round(silent_secs, 1),
+                        quiet_cpu_seconds=quiet_cpu_accum,
+                        log_lines_per_second=round((line_total - last_line_total) / max(now - last_tick, 1e-6), 2)
+                    )
+                    last_line_total, last_tick = line_total, now
+                    self._export_metrics()
+
+                    # An idle server is silent and quiet; only fall back to this heuristic
+                    # when the HTTP probe cannot vouch for it
+                    healthy = http_ready and health_failures == 0
+                    if self.enable_no_output_restart and not healthy and silent_secs > self.no_output_restart_secs and quiet_cpu_accum >= self.quiet_cpu_window_secs:
+                        self.logger.logger.error(
+                            f"No output for {int(silent_secs)}s and CPU quiet for {int(quiet_cpu_accum)}s; restarting"
+                        )
+                        self.metrics.record_restart("no_output")
+                        next_process = self._restart(process, shutdown_event)
+                        break
+                    
+                    # Memory watchdog: schedule a recycle, then wait for a moment with no work in flight
+                    if self.memory_watchdog.enabled:
+                        growth = self.memory_watchdog.slope()
+                        if growth is not None:
+                            self.metrics.set(memory_growth_mb_per_hour=round(growth, 1))
+                        if recycle_reason is None:
+                            recycle_reason = self.memory_watchdog.check(time.time())
+                            if recycle_reason:
+                                self._recycle_pending = True
+                                self.metrics.set(memory_recycle_pending=1)
+                                self.logger.logger.warning(
+                                    f"Memory watchdog: {recycle_reason}; restarting once the queue is empty. "
+                                    f"RSS curve: {self.memory_watchdog.curve()}"
+                                )
+                        if recycle_reason and self._is_idle(http_ready, silent_secs, quiet_cpu_accum):
+                            self.logger.logger.warning(f"Queue is empty; recycling ComfyUI ({recycle_reason})")
+                            self.metrics.record_restart("memory")
+                            self.metrics.set(memory_recycle_pending=0)
+                            next_process = self._restart(process, shutdown_event)
+                            self._recycle_pending = False
+                            break
+                    
+                    # Clean old logs periodically
+                    self.logger.clean_old_logs()
+                    
+                    shutdown_event.wait(self.monitor_interval)
+                    
+            except KeyboardInterrupt:
+                self._handle_signal(getattr(signal, "SIGINT", 2), None)
+            except Exception as e:
+                self.logger.logger.error(f"Error in monitoring loop: {e}")
+                self.metrics.record_restart("monitor_error")
                 if process and process.poll() is None:
                     self._terminate_tree(process)
-            except Exception:
-                pass
+                shutdown_event.wait(5)
+    
+    def run(self):
+        """Run ComfyUI with monitoring and auto-restart."""
+        shutdown_event = self._shutdown_event
+        handle_sig = self._handle_signal
 
         # Register signal handlers for Ctrl+C / termination on Windows
         try:
@@ -310,94 +1981,57 @@ comfyui:
             # Create model paths yaml if needed
             self._create_model_paths_yaml()
             
-            while not shutdown_event.is_set():
-                process = self._launch_comfyui()
-                if not process:
-                    self.logger.logger.error("Failed to start ComfyUI. Retrying in 10 seconds...")
-                    time.sleep(10)
-                    continue
-                
-                # Reset readiness and last output timestamps
-                self._readiness_event.clear()
-                with self._last_output_lock:
-                    self._last_output_ts = time.time()
-
-                # Wait for server startup based on logs
-                self.logger.logger.info("Waiting for ComfyUI to become ready (log-based)...")
-                server_ready = self._readiness_event.wait(timeout=self.boot_wait_time)
-                if shutdown_event.is_set():
-                    if process and process.poll() is None:
-                        self._terminate_tree(process)
-                    break
-                
-                if not server_ready:
-                    # Be lenient: continue monitoring instead of killing; many users suppress logs
-                    self.logger.logger.warning("No explicit readiness logs within timeout; continuing to monitor")
-                
-                # Monitor loop
+            if self.verify_models_on_start:
+                self._verify_models()
+            
+            if self.metrics_port:
                 try:
-                    # Prime CPU percent for accurate readings
-                    try:
-                        parent_proc = psutil.Process(process.pid)
-                        _ = parent_proc.cpu_percent(interval=None)
-                    except psutil.Error:
-                        parent_proc = None
-                    quiet_cpu_accum = 0.0
-
-                    while not shutdown_event.is_set():
-                        if process.poll() is not None:
-                            self.logger.logger.error("ComfyUI process has terminated unexpectedly")
-                            break
-
-                        # Check for prolonged silence from the process (less aggressive)
-                        with self._last_output_lock:
-                            last = self._last_output_ts
-                        silent_secs = time.time() - last
-
-                        # Compute CPU usage across process tree
-                        cpu_total = 0.0
-                        if parent_proc is not None:
-                            try:
-                                cpu_total += parent_proc.cpu_percent(interval=None)
-                                for ch in parent_proc.children(recursive=True):
-                                    try:
-                                        cpu_total += ch.cpu_percent(interval=None)
-                                    except psutil.Error:
-                                        pass
-                            except psutil.Error:
-                                pass
-
-                        if cpu_total < self.quiet_cpu_threshold:
-                            quiet_cpu_accum += self.monitor_interval
-                        else:
-                            quiet_cpu_accum = 0.0
-
-                        if self.enable_no_output_restart and silent_secs > self.no_output_restart_secs and quiet_cpu_accum >= self.quiet_cpu_window_secs:
-                            self.logger.logger.error(
-                                f"No output for {int(silent_secs)}s and CPU quiet for {int(quiet_cpu_accum)}s; restarting"
-                            )
-                            self._terminate_tree(process)
-                            break
-                        
-                        # Clean old logs periodically
-                        self.logger.clean_old_logs()
-                        
-                        time.sleep(self.monitor_interval)
-                        
-                except KeyboardInterrupt:
-                    handle_sig(getattr(signal, "SIGINT", 2), None)
-                except Exception as e:
-                    self.logger.logger.error(f"Error in monitoring loop: {e}")
-                    if process and process.poll() is None:
-                        self._terminate_tree(process)
-                    time.sleep(5)
+                    self.metrics.serve(self.metrics_host, self.metrics_port, self._metric_sources())
+                    self.logger.logger.info(
+                        f"Serving metrics on http://{self.metrics_host}:{self.metrics_port}/metrics"
+                    )
+                except OSError as e:
+                    self.logger.logger.error(f"Could not start metrics endpoint: {e}")
+            
+            if self.warm_standby:
+                forward_host = self._listen_host()
+                self.forwarder = TcpForwarder(forward_host, int(self.server_port), self.logger.logger)
+                self.forwarder.start()
+                self.logger.logger.info(
+                    f"Warm standby enabled: forwarding {forward_host}:{self.server_port} "
+                    f"to backend ports {self.standby_ports}"
+                )
+            
+            if self.model_cache is not None:
+                self.model_cache.prune()
+                self.metrics.set(model_cache_bytes=self.model_cache.used_bytes)
+                self.logger.logger.info(f"Model cache {self.model_cache.cache_dir}: {self.model_cache.summary()}")
+                threading.Thread(target=self._cache_worker, args=(shutdown_event,), daemon=True).start()
+            
+            if self.prewarm_workflows:
+                # Overlaps with ComfyUI's own boot; both end up reading the same files from the cache
+                threading.Thread(target=self._prewarm_models, args=(shutdown_event,), daemon=True).start()
+            elif self.inventory is not None:
+                threading.Thread(target=self._refresh_inventory, daemon=True).start()
+            
+            if self.instances:
+                self._run_instances(shutdown_event)
+            else:
+                self._supervise(shutdown_event)
             
         except KeyboardInterrupt:
             handle_sig(getattr(signal, "SIGINT", 2), None)
         except Exception as e:
             self.logger.logger.error(f"Critical error: {e}")
         finally:
+            if self.forwarder is not None:
+                self.forwarder.stop()
+            if self.model_cache is not None:
+                self.model_cache.save()
+                self.logger.logger.info(f"Model cache: {self.model_cache.summary()}")
+            self.metrics.stop()
             self.logger.logger.info("ComfyUI launcher stopped")
+            self.logger.close()
 
 if __name__ == "__main__":
     launcher = ComfyUILauncher()
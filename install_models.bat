@@ -65,7 +65,7 @@ call python -m pip install --no-warn-script-location --user ^
 
 :: Run the installer
 echo Starting model installation...
-python "%SCRIPT_DIR%\install_models.py"
+python "%SCRIPT_DIR%\install_models.py" %*
 if errorlevel 1 (
     echo Error: Model installation failed. Check the logs for details.
     pause
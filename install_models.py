@@ -1,27 +1,617 @@
 import os
 import sys
 import yaml
+import argparse
 import logging
 import hashlib
 import threading
 import shutil
+import json
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from urllib.parse import urlparse
 from pathlib import Path
-from typing import Optional, Dict, List, Set
+from typing import Optional, Dict, List, Set, Tuple, Callable
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from huggingface_hub import (
     HfApi, 
     hf_hub_download, 
+    hf_hub_url,
     snapshot_download,
     create_repo, 
     HfFolder,
     CommitOperationAdd
 )
 from dotenv import load_dotenv
+from model_store import (
+    HashCache,
+    BlobStore,
+    FileHasher,
+    HASH_BUFFER_SIZE,
+    LOCK_VERSION,
+    git_blob_sha1,
+    load_lockfile,
+    verify_lockfile,
+    load_workflow_refs,
+    LOADER_FOLDERS,
+    MODEL_FOLDERS,
+    ModelInventory,
+    quick_verify
+)
+
+class RepoMetadata:
+    """Thread-safe cache of repository file listings, fetched once per repo.
+
+    Listings map each repo-relative filename to its size, LFS sha256 and git
+    blob id. They are memoized for the run and optionally persisted to disk
+    for ``ttl`` seconds so consecutive runs skip the Hub entirely.
+    """
+
+    def __init__(self, api, token: Optional[str], logger: logging.Logger,
+                 cache_file: Optional[Path] = None, ttl: int = 0):
+        self.api = api
+        self.token = token
+        self.logger = logger
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, threading.Lock] = {}
+        self._listings: Dict[str, Dict] = {}
+        self._failures: Dict[str, Exception] = {}
+        self._dirty = False
+        # Revisions pinned by a lockfile, used when no revision is requested
+        self.pins: Dict[str, str] = {}
+        self._load()
+
+    def _load(self):
+        if not self.cache_file or self.ttl <= 0 or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            for key, listing in data.items():
+                if now - listing.get('fetched_at', 0) < self.ttl:
+                    self._listings[key] = listing
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable metadata cache {self.cache_file}: {e}")
+
+    def save(self):
+        """Persist fetched listings if a TTL is configured."""
+        if not self.cache_file or self.ttl <= 0:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._listings)
+            self._dirty = False
+        try:
+            tmp_file = self.cache_file.with_name(self.cache_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            self.logger.error(f"Error saving metadata cache {self.cache_file}: {e}")
+
+    def _fetch(self, repo_id: str, revision: Optional[str]) -> Dict:
+        self.request_count += 1
+        try:
+            info = self.api.model_info(repo_id, revision=revision, files_metadata=True)
+        except Exception:
+            if not self.token:
+                raise
+            self.request_count += 1
+            info = self.api.model_info(repo_id, revision=revision, files_metadata=True, token=self.token)
+        
+        files = {}
+        for sibling in info.siblings or []:
+            lfs = getattr(sibling, 'lfs', None)
+            files[sibling.rfilename] = {
+                'size': getattr(sibling, 'size', None) or (lfs.size if lfs else None),
+                'sha256': lfs.sha256 if lfs else None,
+                'blob_id': getattr(sibling, 'blob_id', None),
+            }
+        return {'revision': info.sha, 'fetched_at': time.time(), 'files': files}
+
+    def get_listing(self, repo_id: str, revision: Optional[str] = None) -> Dict:
+        """Return the cached listing for a repo, fetching it on first use."""
+        revision = revision or self.pins.get(repo_id)
+        key = f"{repo_id}@{revision}" if revision else repo_id
+        with self._lock:
+            if key in self._listings:
+                return self._listings[key]
+            if key in self._failures:
+                raise self._failures[key]
+            repo_lock = self._repo_locks.setdefault(key, threading.Lock())
+        
+        # Only one thread fetches a given repo; the others wait for its result
+        with repo_lock:
+            with self._lock:
+                if key in self._listings:
+                    return self._listings[key]
+                if key in self._failures:
+                    raise self._failures[key]
+            try:
+                listing = self._fetch(repo_id, revision)
+            except Exception as e:
+                with self._lock:
+                    self._failures[key] = e
+                raise
+            with self._lock:
+                self._listings[key] = listing
+                self._dirty = True
+            return listing
+
+    def invalidate(self, repo_id: str):
+        """Forget every cached listing of a repo, in memory and in the persisted cache."""
+        with self._lock:
+            for key in [k for k in self._listings if k == repo_id or k.startswith(f"{repo_id}@")]:
+                del self._listings[key]
+                self._dirty = True
+
+    def get_files(self, repo_id: str, revision: Optional[str] = None) -> Dict[str, Dict]:
+        """Return ``{rfilename: {size, sha256, blob_id}}`` for a repo."""
+        return self.get_listing(repo_id, revision)['files']
+
+    def get_file(self, repo_id: str, filename: str, revision: Optional[str] = None) -> Optional[Dict]:
+        """Return metadata for one file, or None if the repo does not contain it."""
+        return self.get_files(repo_id, revision).get(filename)
+
+    def get_revision(self, repo_id: str) -> Optional[str]:
+        """Return the commit sha the cached listing was taken from."""
+        return self.get_listing(repo_id).get('revision')
+
+class DownloadScheduler:
+    """Runs the download jobs of every model entry through one shared queue.
+
+    Jobs start largest-first under a global concurrency limit and a per-host
+    limit, so long transfers overlap with everything else instead of each
+    model downloading in its own burst.
+    """
+
+    def __init__(self, max_workers: int, per_host_limit: int, logger: logging.Logger):
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.logger = logger
+
+    def run(self, jobs: List[Dict], worker: Callable[[Dict], bool], desc: str = "Downloading models") -> Dict[str, bool]:
+        """Run all jobs and return ``{model: success}``; a model fails if any of its jobs fails."""
+        pending = sorted(jobs, key=lambda job: job.get('size') or 0, reverse=True)
+        results: Dict[str, bool] = {job['model']: True for job in jobs}
+        host_active: Dict[str, int] = {}
+        cond = threading.Condition()
+        
+        def next_job() -> Optional[Dict]:
+            with cond:
+                while pending:
+                    # Largest job whose host still has a free slot
+                    for i, job in enumerate(pending):
+                        if host_active.get(job['host'], 0) < self.per_host_limit:
+                            host_active[job['host']] = host_active.get(job['host'], 0) + 1
+                            return pending.pop(i)
+                    cond.wait()
+                return None
+        
+        def work_loop(pbar):
+            while True:
+                job = next_job()
+                if job is None:
+                    return
+                try:
+                    ok = bool(worker(job))
+                except Exception as e:
+                    self.logger.error(f"Error downloading {job.get('filename') or job['repo_id']}: {e}")
+                    ok = False
+                with cond:
+                    host_active[job['host']] -= 1
+                    if not ok:
+                        results[job['model']] = False
+                    cond.notify_all()
+                pbar.update(1)
+        
+        with tqdm(total=len(pending), desc=desc) as pbar:
+            threads = [threading.Thread(target=work_loop, args=(pbar,), daemon=True)
+                       for _ in range(min(self.max_workers, len(pending)))]
+            for t in threads:
+                t.start()
+            # Join with a timeout so Ctrl+C still reaches the main thread
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+        
+        return results
+
+def preallocate(path: Path, size: int) -> None:
+    """Create ``path`` with ``size`` bytes reserved on disk.
+
+    posix_fallocate reserves real blocks where available. On Windows, extending
+    the file with SetEndOfFile (truncate) allocates its clusters on NTFS.
+    Either way the file is laid out up front instead of growing piecemeal.
+    """
+    with open(path, 'wb') as f:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of concurrent HTTP transfers.
+
+    Every ``interval`` seconds it compares measured throughput with the
+    previous interval: it adds one slot while throughput keeps rising and the
+    slots are in use, halves the limit on errors or timeouts, and gives back
+    a slot when an increase made throughput worse. Each decision is logged.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, logger: logging.Logger, interval: float = 5.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.interval = interval
+        self.logger = logger
+        self.active = 0
+        self._cond = threading.Condition()
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_errors = 0
+        self._window_saturated = False
+        self._last_throughput: Optional[float] = None
+        self._last_action = 'hold'
+
+    @contextmanager
+    def slot(self):
+        """Hold one transfer slot for the duration of the block."""
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait(1.0)
+                self._maybe_adjust()
+            self.active += 1
+            if self.active >= self.limit:
+                self._window_saturated = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify()
+
+    def record_bytes(self, n: int):
+        with self._cond:
+            self._window_bytes += n
+            self._maybe_adjust()
+
+    def record_error(self):
+        with self._cond:
+            self._window_errors += 1
+            self._maybe_adjust()
+
+    def _maybe_adjust(self):
+        # Called with the condition held
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return
+        throughput = self._window_bytes / elapsed
+        previous = self._last_throughput
+        old_limit = self.limit
+        
+        if self._window_errors:
+            self.limit = max(self.minimum, self.limit // 2)
+            action, reason = 'decrease', f"{self._window_errors} errors/timeouts"
+        elif (previous is not None and self._last_action == 'increase'
+              and throughput < previous * 0.9):
+            self.limit = max(self.minimum, self.limit - 1)
+            action, reason = 'decrease', "throughput fell after the last increase"
+        elif self._window_saturated and (previous is None or throughput >= previous * 1.05):
+            self.limit = min(self.maximum, self.limit + 1)
+            action, reason = 'increase', "slots saturated and throughput rising"
+        else:
+            action, reason = 'hold', "throughput flat or slots idle"
+        
+        if self._window_bytes or self._window_errors:
+            self.logger.info(
+                f"Concurrency {old_limit} -> {self.limit} ({reason}): {throughput / 1e6:.1f} MB/s"
+                + (f", previous {previous / 1e6:.1f} MB/s" if previous is not None else "")
+                + f", {self.active} active"
+            )
+            self._last_throughput = throughput
+        self._last_action = action if self.limit != old_limit else 'hold'
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_errors = 0
+        self._window_saturated = self.active >= self.limit
+        self._cond.notify_all()
+
+class BandwidthLimiter:
+    """Token bucket shared by all transfers to cap total download bandwidth."""
+
+    def __init__(self, bytes_per_second: float):
+        self.rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._allowance = 0.0
+        self._last = time.monotonic()
+
+    def consume(self, n: int):
+        """Block until ``n`` bytes may be transferred."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Allow at most one second of burst
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate) - n
+            self._last = now
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+class StreamingHash:
+    """SHA-256 of a file whose segments are written concurrently.
+
+    Segment workers feed each chunk as they write it; chunks that arrive at
+    the current hash position are hashed straight from memory. Bytes written
+    ahead of that position are picked up by ``catch_up`` shortly after they
+    land, while they are still in the OS page cache, so the file is never
+    read back from disk after the download.
+    """
+
+    READ_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, part_path: Path, segments: List[List[int]], progress_lock: threading.Lock):
+        self.part_path = part_path
+        self.segments = segments
+        self.progress_lock = progress_lock
+        self.position = 0
+        self._sha = hashlib.sha256()
+        self._lock = threading.Lock()
+
+    def feed(self, offset: int, data: bytes):
+        """Hash a freshly written chunk if it is next in file order."""
+        with self._lock:
+            if offset == self.position:
+                self._sha.update(data)
+                self.position += len(data)
+
+    def _available_end(self) -> int:
+        # End of the contiguous region that is on disk, starting at position
+        with self.progress_lock:
+            for start, end, done in self.segments:
+                if start <= self.position < end:
+                    return start + done
+        return self.position
+
+    def catch_up(self):
+        """Hash any contiguous bytes that were written ahead of the hash position."""
+        with open(self.part_path, 'rb') as f:
+            while True:
+                pos = self.position
+                available = self._available_end()
+                if available <= pos:
+                    return
+                f.seek(pos)
+                data = f.read(min(self.READ_SIZE, available - pos))
+                with self._lock:
+                    # A feed() may have advanced past this range meanwhile
+                    if self.position == pos:
+                        self._sha.update(data)
+                        self.position += len(data)
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+class SegmentedDownloader:
+    """Downloads a file as parallel HTTP range segments, resumably.
+
+    The file is split into fixed-size segments that a pool of connections
+    fetches in file order. Data is written in place into a preallocated
+    ``<name>.part`` file and progress is recorded in ``<name>.part.json``, so
+    an interrupted transfer resumes from the last recorded chunk of each
+    segment. The SHA-256 is computed while the bytes stream in and is checked
+    before the finished file is renamed over the destination. Redirect targets
+    (presigned CDN URLs) are never persisted and are re-resolved from the
+    canonical URL when they expire.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    MANIFEST_INTERVAL = 64 * 1024 * 1024
+    RETRIES = 3
+
+    def __init__(self,
+                 connections: int,
+                 logger: logging.Logger,
+                 token: Optional[str] = None,
+                 segment_size: int = 64 * 1024 * 1024,
+                 timeout: int = 60,
+                 controller: Optional[AdaptiveConcurrency] = None,
+                 limiter: Optional[BandwidthLimiter] = None):
+        self.connections = max(1, connections)
+        self.segment_size = max(self.CHUNK_SIZE, segment_size)
+        self.logger = logger
+        self.token = token
+        self.timeout = timeout
+        self.controller = controller or AdaptiveConcurrency(self.connections, self.connections,
+                                                            self.connections, logger)
+        self.limiter = limiter or BandwidthLimiter(0)
+
+    def _request(self, url: str, start: int, end: int):
+        req = urllib.request.Request(url, headers={'Range': f"bytes={start}-{end}",
+                                                   'User-Agent': 'comfyui-windows-installer'})
+        if self.token:
+            # Not forwarded on redirect, so presigned CDN URLs never see the token
+            req.add_unredirected_header('Authorization', f"Bearer {self.token}")
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def probe(self, url: str):
+        """Resolve redirects and return ``(final_url, total_size, etag)`` for a ranged resource."""
+        with self._request(url, 0, 0) as resp:
+            if resp.status != 206:
+                raise IOError(f"Server ignored Range request (HTTP {resp.status})")
+            content_range = resp.headers.get('Content-Range', '')
+            total = int(content_range.rsplit('/', 1)[-1])
+            return resp.geturl(), total, resp.headers.get('ETag')
+
+    @staticmethod
+    def part_paths(dest: Path):
+        """Return the partial file and manifest paths used for a destination."""
+        return dest.with_name(dest.name + '.part'), dest.with_name(dest.name + '.part.json')
+
+    def _load_manifest(self, manifest_path: Path, size: int, etag: Optional[str]) -> Optional[List[List[int]]]:
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('size') != size or manifest.get('etag') != etag:
+            return None
+        return manifest['segments']
+
+    def _save_manifest(self, manifest_path: Path, size: int, etag: Optional[str], segments: List[List[int]]):
+        tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'size': size, 'etag': etag, 'segments': segments}, f)
+        os.replace(tmp_path, manifest_path)
+
+    def _fetch_range(self, url: str, part_path: Path, seg: List[int], lock: threading.Lock,
+                     streaming_hash: 'StreamingHash', save_progress: Callable[[], None]):
+        """Stream the unfinished part of one segment into the partial file."""
+        start, end, done = seg
+        with self._request(url, start + done, end - 1) as resp, open(part_path, 'r+b') as f:
+            if resp.status != 206:
+                raise IOError(f"Server ignored Range request (HTTP {resp.status})")
+            offset = start + done
+            f.seek(offset)
+            unsaved = 0
+            while True:
+                chunk = resp.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.limiter.consume(len(chunk))
+                # Hand data to the OS before it is counted as done
+                f.write(chunk)
+                f.flush()
+                unsaved += len(chunk)
+                with lock:
+                    seg[2] += len(chunk)
+                    if unsaved >= self.MANIFEST_INTERVAL:
+                        save_progress()
+                        unsaved = 0
+                self.controller.record_bytes(len(chunk))
+                streaming_hash.feed(offset, chunk)
+                offset += len(chunk)
+
+    def download(self,
+                 url: str,
+                 dest: Path,
+                 expected_size: Optional[int] = None,
+                 expected_sha256: Optional[str] = None,
+                 connections: Optional[int] = None) -> str:
+        """Download ``url`` to ``dest`` and return its SHA-256.
+
+        Raises if the size or hash does not match; ``dest`` is only replaced
+        by a verified file.
+        """
+        final_url, size, etag = self.probe(url)
+        if expected_size is not None and size != expected_size:
+            raise IOError(f"Remote size {size} does not match expected {expected_size}")
+        
+        part_path, manifest_path = self.part_paths(dest)
+        segments = self._load_manifest(manifest_path, size, etag) if part_path.exists() else None
+        if segments is None:
+            # Fresh transfer: [start, end_exclusive, bytes_done] per segment
+            segments = [[start, min(start + self.segment_size, size), 0]
+                        for start in range(0, size, self.segment_size)]
+            preallocate(part_path, size)
+        else:
+            done = sum(seg[2] for seg in segments)
+            self.logger.info(f"Resuming {dest.name} at {done / 1e6:.1f} of {size / 1e6:.1f} MB")
+        
+        lock = threading.Lock()
+        streaming_hash = StreamingHash(part_path, segments, lock)
+        self._save_manifest(manifest_path, size, etag, segments)
+        resolved = {'url': final_url}
+        resolve_lock = threading.Lock()
+        
+        def refresh_url(expired: str):
+            # Presigned redirect targets expire; ask the canonical URL for a new one (once per expiry)
+            with resolve_lock:
+                if resolved['url'] != expired:
+                    return
+                new_url, new_size, new_etag = self.probe(url)
+                if new_size != size or new_etag != etag:
+                    raise IOError(f"{dest.name} changed on the server during the download")
+                self.logger.info(f"Download URL for {dest.name} expired; re-resolved")
+                resolved['url'] = new_url
+        
+        def fetch_segment(seg: List[int]):
+            attempt = 0
+            progress_at_expiry = -1
+            while True:
+                start, end, done = seg
+                if start + done >= end:
+                    return
+                segment_url = resolved['url']
+                try:
+                    with self.controller.slot():
+                        self._fetch_range(segment_url, part_path, seg, lock, streaming_hash, save_progress)
+                    if seg[0] + seg[2] < seg[1]:
+                        raise IOError("connection closed early")
+                    return
+                except Exception as e:
+                    if isinstance(e, urllib.error.HTTPError) and e.code in (403, 410):
+                        refresh_url(segment_url)
+                        # An expired URL only costs an attempt if nothing was fetched since the last expiry
+                        with lock:
+                            progress = sum(s[2] for s in segments)
+                        if progress > progress_at_expiry:
+                            progress_at_expiry = progress
+                            continue
+                    self.controller.record_error()
+                    attempt += 1
+                    if attempt == self.RETRIES:
+                        raise
+                    self.logger.warning(f"Segment {start}-{end} of {dest.name} failed ({e}); retrying")
+                    time.sleep(attempt)
+        
+        def save_progress():
+            # Called with the progress lock held
+            self._save_manifest(manifest_path, size, etag, segments)
+        
+        try:
+            max_workers = min(connections or self.connections, len(segments) or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Segments are queued in file order, so the hash position trails closely
+                futures = [executor.submit(fetch_segment, seg) for seg in segments]
+                while not all(future.done() for future in futures):
+                    streaming_hash.catch_up()
+                    time.sleep(0.05)
+                for future in futures:
+                    future.result()
+            streaming_hash.catch_up()
+        finally:
+            with lock:
+                self._save_manifest(manifest_path, size, etag, segments)
+        
+        digest = streaming_hash.hexdigest()
+        if streaming_hash.position != size or (expected_sha256 and digest != expected_sha256):
+            # Corrupt transfer; start from scratch next time
+            part_path.unlink(missing_ok=True)
+            manifest_path.unlink(missing_ok=True)
+            raise IOError(f"Hash mismatch for {dest.name} after download")
+        
+        os.replace(part_path, dest)
+        manifest_path.unlink(missing_ok=True)
+        return digest
 
 class ModelInstaller:
-    def __init__(self):
+    def __init__(self, api: Optional[HfApi] = None):
         # Get script directory
         self.script_dir = Path(__file__).parent.resolve()
         
@@ -35,6 +625,9 @@ class ModelInstaller:
         self.comfyui_dir = Path(os.getenv("COMFYUI_DIR", self.user_home / "ComfyUI"))
         self.model_dir = Path(os.getenv("MODEL_BASE_PATH", self.comfyui_dir / "models")).resolve()
         
+        self.config_file = Path(os.getenv("MODEL_CONFIG", self.script_dir / "model_config.yaml"))
+        self.stats_file = self.model_dir / ".install_stats.json"
+        
         # Initialize logging
         self.setup_logging()
         
@@ -43,7 +636,7 @@ class ModelInstaller:
         self.logger.info(f"Model directory: {self.model_dir}")
         
         # Setup HF client
-        self.api = HfApi()
+        self.api = api or HfApi()
         self.token = os.getenv("HF_TOKEN")
         if self.token:
             HfFolder.save_token(self.token)
@@ -52,27 +645,85 @@ class ModelInstaller:
             self.logger.info("No Hugging Face token found, will use anonymous access")
         
         # Define folder structure
-        self.folder_structure = {
-            'checkpoints': 'checkpoints',
-            'clip': 'clip',
-            'clip_vision': 'clip_vision',
-            'configs': 'configs',
-            'controlnet': 'controlnet',
-            'diffusion_models': 'diffusion_models',
-            'unet': 'unet',
-            'embeddings': 'embeddings',
-            'loras': 'loras',
-            'text_encoders': 'text_encoders',
-            'upscale_models': 'upscale_models',
-            'vae': 'vae'
-        }
+        self.folder_structure = {folder: folder for folder in MODEL_FOLDERS}
+        
+        # Global download scheduler shared by every model entry
+        self.endpoint_host = urlparse(os.getenv("HF_ENDPOINT", "https://huggingface.co")).netloc
+        self.scheduler = DownloadScheduler(
+            max_workers=int(os.getenv("DOWNLOAD_WORKERS", "8")),
+            per_host_limit=int(os.getenv("DOWNLOAD_PER_HOST_LIMIT", "8")),
+            logger=self.logger
+        )
+        
+        # Streaming range downloads; files below the size threshold use a single connection
+        self.segmented_downloads = os.getenv("SEGMENTED_DOWNLOADS", "1") not in ("0", "false", "False")
+        self.segmented_min_size = int(os.getenv("SEGMENTED_MIN_SIZE_MB", "256")) * 1024 * 1024
+        # AIMD control of concurrent transfers plus an optional global bandwidth cap
+        self.concurrency = AdaptiveConcurrency(
+            initial=int(os.getenv("DOWNLOAD_CONNECTIONS", "8")),
+            minimum=int(os.getenv("DOWNLOAD_CONNECTIONS_MIN", "2")),
+            maximum=int(os.getenv("DOWNLOAD_CONNECTIONS_MAX", "32")),
+            logger=self.logger,
+            interval=float(os.getenv("DOWNLOAD_ADJUST_INTERVAL", "5"))
+        )
+        self.bandwidth = BandwidthLimiter(float(os.getenv("DOWNLOAD_BANDWIDTH_LIMIT_MBPS", "0")) * 1e6)
+        self.segmented = SegmentedDownloader(
+            connections=int(os.getenv("DOWNLOAD_SEGMENTS", "8")),
+            logger=self.logger,
+            token=self.token,
+            segment_size=int(os.getenv("DOWNLOAD_SEGMENT_MB", "64")) * 1024 * 1024,
+            controller=self.concurrency,
+            limiter=self.bandwidth
+        )
+        
+        # Free-space preflight before downloads
+        self.disk_preflight = os.getenv("DISK_PREFLIGHT", "1") not in ("0", "false", "False")
+        self.disk_reserve = int(os.getenv("DISK_RESERVE_MB", "1024")) * 1024 * 1024
+        self.trim_to_fit = os.getenv("TRIM_TO_FIT", "0") in ("1", "true", "True")
         
         # Create model directory structure
         self.setup_folder_structure()
         
         # Initialize download tracking
         self.downloaded_files: Set[Path] = set()
+        self.bytes_transferred = 0
         self.download_lock = threading.Lock()
+        
+        # Persistent hash index so unchanged files are not re-hashed every run
+        self.hash_cache = HashCache(self.model_dir / ".hash_cache.json", self.model_dir, self.logger)
+        
+        # Content-addressed store so shared files are stored and fetched once
+        self.dedup = os.getenv("DEDUP_STORE", "1") not in ("0", "false", "False")
+        self.blob_store = BlobStore(self.model_dir / ".blobs", self.hash_cache, self.logger)
+        
+        # Index of what is installed, with safetensors/GGUF header metadata
+        self.inventory = ModelInventory(self.model_dir / ".inventory.json", self.model_dir,
+                                        self.folder_structure, self.hash_cache, self.logger)
+        
+        # Tiered verification: files without a cached hash get a structural quick check
+        # (size, header, tensor layout); full hashing when that fails, when the last full
+        # check is older than FULL_VERIFY_DAYS, or with VERIFY_MODE=full / --full-verify
+        self.full_verify = os.getenv("VERIFY_MODE", "quick").lower() == "full"
+        self.full_verify_days = float(os.getenv("FULL_VERIFY_DAYS", "30"))
+        
+        # Parallel hashing engine for verification
+        self.hasher = FileHasher(
+            workers=int(os.getenv("HASH_WORKERS", "0")) or None,
+            buffer_size=int(os.getenv("HASH_BUFFER_MB", "0")) * 1024 * 1024 or HASH_BUFFER_SIZE,
+            use_processes=os.getenv("HASH_USE_PROCESSES", "0") in ("1", "true", "True"),
+            logger=self.logger
+        )
+        
+        # One metadata request per repo per run (optionally cached across runs)
+        self.metadata = RepoMetadata(
+            self.api,
+            self.token,
+            self.logger,
+            cache_file=self.model_dir / ".metadata_cache.json",
+            ttl=int(os.getenv("METADATA_CACHE_TTL", "0"))
+        )
+        # Set by use_lockfile: every Hub request must use the pinned revision
+        self.locked = False
     
     def setup_logging(self):
         """Configure logging with timestamps and proper formatting."""
@@ -115,35 +766,100 @@ class ModelInstaller:
         try:
             # Get remote file info
             try:
-                info = self.api.model_info(repo_id, files_metadata=True)
+                file_info = self.metadata.get_file(repo_id, filename)
             except Exception as e:
-                if self.token:
-                    info = self.api.model_info(repo_id, files_metadata=True, token=self.token)
-                else:
-                    self.logger.error(f"Could not access repository {repo_id}: {e}")
-                    return False
+                self.logger.error(f"Could not access repository {repo_id}: {e}")
+                return False
+            
+            if file_info is None:
+                self.logger.warning(f"File {filename} not found in repository metadata")
+                return False
             
-            # Find file info and verify hash
-            for file_info in info.siblings:
-                if file_info.rfilename == filename:
-                    sha256_hash = hashlib.sha256()
-                    with open(file_path, "rb") as f:
-                        for byte_block in iter(lambda: f.read(4096), b""):
-                            sha256_hash.update(byte_block)
-                    
-                    if sha256_hash.hexdigest() == file_info.sha256:
+            if file_info['size'] is not None and file_path.stat().st_size != file_info['size']:
+                self.logger.warning(f"Size mismatch for {filename}")
+                return False
+            
+            if file_info['sha256']:
+                local_hash = self.hash_cache.get(file_path)
+                due = self._full_check_due(file_path)
+                if local_hash is None and not due and not self.full_verify:
+                    problem = quick_verify(file_path, file_info['size'])
+                    if problem is None:
+                        self.hash_cache.mark_quick(file_path)
+                        self.logger.info(f"Quick-verified {filename} (size, header and tensor layout)")
                         return True
-                    else:
-                        self.logger.warning(f"Hash mismatch for {filename}")
-                        return False
+                    self.logger.warning(f"Quick check failed for {filename}: {problem}; hashing")
+                if local_hash is None or due or self.full_verify:
+                    local_hash = self.hasher.hash_file(file_path)
+                    self.hash_cache.put(file_path, local_hash)
+                matches = local_hash == file_info['sha256']
+            elif file_info['blob_id']:
+                # Small non-LFS file: the Hub only publishes its git blob id
+                matches = git_blob_sha1(file_path) == file_info['blob_id']
+            else:
+                matches = True
             
-            self.logger.warning(f"File {filename} not found in repository metadata")
-            return False
+            if not matches:
+                self.logger.warning(f"Hash mismatch for {filename}")
+            return matches
             
         except Exception as e:
             self.logger.error(f"Error verifying {filename}: {e}")
             return False
     
+    def _full_check_due(self, file_path: Path) -> bool:
+        """True if the file's last full hash (or first quick check) is older than FULL_VERIFY_DAYS."""
+        if self.full_verify_days <= 0:
+            return False
+        age = self.hash_cache.verified_age(file_path)
+        return age is not None and age > self.full_verify_days * 86400
+    
+    def _remote_file_info(self, repo_id: str, filename: str) -> Optional[Dict]:
+        """Return cached repo metadata for a file, or None if it is unavailable."""
+        try:
+            return self.metadata.get_file(repo_id, filename)
+        except Exception:
+            return None
+    
+    def prehash_files(self, paths: List[Path]) -> None:
+        """Hash every file that has no valid cache entry, in parallel."""
+        pending = [p for p in paths if p.is_file() and self.hash_cache.get(p) is None]
+        if not pending:
+            return
+        self.logger.info(f"Hashing {len(pending)} files not in the hash cache...")
+        for path, digest in self.hasher.hash_files(pending).items():
+            self.hash_cache.put(path, digest)
+        self.hash_cache.save()
+    
+    def _model_dest_dir(self, repo_id: str, model_type: str, subfolder: Optional[str] = None) -> Path:
+        """Return the local folder a repository is installed into."""
+        if model_type == 'clip':
+            model_type = 'text_encoders'
+        dest_dir = self.model_dir / model_type / repo_id.split('/')[-1]
+        if subfolder:
+            dest_dir = dest_dir / subfolder
+        return dest_dir
+    
+    def _existing_model_files(self, config: Dict) -> List[Path]:
+        """List the files already on disk for every entry in the model config."""
+        paths = []
+        for model_type, models in config.items():
+            for settings in (models or {}).values():
+                repo_url = settings.get('repo_url')
+                if not repo_url:
+                    continue
+                repo_id = '/'.join(repo_url.split('/')[-2:])
+                include_files = settings.get('include_files')
+                if include_files:
+                    dest_dir = self._model_dest_dir(repo_id, model_type, settings.get('include_folder'))
+                    paths.extend(dest_dir / f for f in include_files if (dest_dir / f).is_file())
+                else:
+                    dest_dir = self._model_dest_dir(repo_id, model_type)
+                    if dest_dir.exists():
+                        paths.extend(f for f in dest_dir.rglob("*")
+                                     if f.is_file() and '.cache' not in f.relative_to(dest_dir).parts)
+        return paths
+    
     def download_file(self, 
                      repo_id: str, 
                      filename: str, 
@@ -152,54 +868,103 @@ class ModelInstaller:
                      force: bool = False) -> Optional[Path]:
         """Download a specific file from a repository."""
         try:
-            if model_type == 'clip':
-                model_type = 'text_encoders'
-            
-            type_dir = self.model_dir / model_type
-            dest_dir = type_dir / repo_id.split('/')[-1]
-            if subfolder:
-                dest_dir = dest_dir / subfolder
-            
+            dest_dir = self._model_dest_dir(repo_id, model_type, subfolder)
             file_path = dest_dir / filename
             
+            remote = self._remote_file_info(repo_id, filename)
+            content_sha = remote['sha256'] if self.dedup and remote else None
+            
             # Check if file exists and is valid
             if not force and file_path.exists():
                 if self.verify_file_integrity(file_path, repo_id, filename):
                     self.logger.info(f"File already exists and is valid: {filename}")
+                    # Only content that was actually hashed may stand in for other paths
+                    if content_sha and self.hash_cache.get(file_path) == content_sha:
+                        self.blob_store.add(file_path, content_sha)
+                    self._discard_partial(file_path)
                     with self.download_lock:
                         self.downloaded_files.add(file_path)
                     return file_path
                 else:
                     self.logger.warning(f"File exists but is invalid, re-downloading: {filename}")
             
+            # Same content already on disk under another path: link it instead of fetching
+            if content_sha and self.blob_store.materialize(content_sha, file_path):
+                self._discard_partial(file_path)
+                with self.download_lock:
+                    self.downloaded_files.add(file_path)
+                return file_path
+            
+            revision = self._revision(repo_id)
+            
             # Create directory if needed
             dest_dir.mkdir(parents=True, exist_ok=True)
             
-            # Try download without token first
-            try:
-                local_file = hf_hub_download(
-                    repo_id=repo_id,
-                    filename=filename,
-                    local_dir=dest_dir,
-                    local_dir_use_symlinks=False,
-                    force_download=True
-                )
-            except Exception as e:
-                if self.token:
+            if self.segmented_downloads and remote and remote['size'] is not None:
+                try:
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    url = hf_hub_url(repo_id, filename, revision=revision)
+                    digest = self.segmented.download(
+                        url,
+                        file_path,
+                        expected_size=remote['size'],
+                        expected_sha256=remote['sha256'],
+                        connections=None if remote['size'] >= self.segmented_min_size else 1
+                    )
+                    # Hashed while streaming, so the next run needs no read pass
+                    self.hash_cache.put(file_path, digest)
+                    if content_sha:
+                        self.blob_store.add(file_path, digest)
+                    with self.download_lock:
+                        self.downloaded_files.add(file_path)
+                        self.bytes_transferred += remote['size']
+                    return file_path
+                except Exception as e:
+                    self.logger.warning(f"Streaming download of {filename} failed, using hf_hub_download: {e}")
+            
+            # Fallback transfers count against the same concurrency limit
+            with self.concurrency.slot():
+                # Try download without token first
+                try:
                     local_file = hf_hub_download(
                         repo_id=repo_id,
                         filename=filename,
+                        revision=revision,
                         local_dir=dest_dir,
                         local_dir_use_symlinks=False,
-                        token=self.token,
                         force_download=True
                     )
-                else:
-                    raise e
+                except Exception as e:
+                    if self.token:
+                        local_file = hf_hub_download(
+                            repo_id=repo_id,
+                            filename=filename,
+                            revision=revision,
+                            local_dir=dest_dir,
+                            local_dir_use_symlinks=False,
+                            token=self.token,
+                            force_download=True
+                        )
+                    else:
+                        raise e
             
             downloaded_path = Path(local_file)
+            self.hash_cache.invalidate(downloaded_path)
+            if content_sha:
+                # Blob store entries must be hashed, not just quick-verified
+                self.hash_cache.put(downloaded_path, self.hasher.hash_file(downloaded_path))
+            if remote and not self.verify_file_integrity(downloaded_path, repo_id, filename):
+                self.logger.error(f"Downloaded file failed verification: {filename}")
+                # The listing may predate an upstream change; fetch it afresh next time
+                self.metadata.invalidate(repo_id)
+                return None
+            # The segmented attempt may have left a resumable partial behind
+            self._discard_partial(file_path)
+            if content_sha and self.hash_cache.get(downloaded_path) == content_sha:
+                self.blob_store.add(downloaded_path, content_sha)
             with self.download_lock:
                 self.downloaded_files.add(downloaded_path)
+                self.bytes_transferred += downloaded_path.stat().st_size
             
             return downloaded_path
             
@@ -207,6 +972,115 @@ class ModelInstaller:
             self.logger.error(f"Error downloading {filename} from {repo_id}: {e}")
             return None
     
+    def _revision(self, repo_id: str) -> Optional[str]:
+        """Revision to request from the Hub: the locked pin, else the commit the listing came from."""
+        if self.locked:
+            revision = self.metadata.pins.get(repo_id)
+            if revision is None:
+                raise ValueError(f"{repo_id} is not pinned in {self.lock_file.name}")
+            return revision
+        try:
+            return self.metadata.get_revision(repo_id)
+        except Exception:
+            return None
+    
+    def _discard_partial(self, file_path: Path):
+        """Remove a segmented partial and its manifest once the destination is complete."""
+        for path in SegmentedDownloader.part_paths(file_path):
+            try:
+                path.unlink()
+                self.logger.info(f"Removed partial download: {path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.error(f"Error removing partial download {path}: {e}")
+    
+    def plan_model_jobs(self,
+                        model: str,
+                        repo_id: str,
+                        model_type: str,
+                        include_files: Optional[List[str]] = None,
+                        exclude_files: Optional[List[str]] = None,
+                        include_folder: Optional[str] = None,
+                        force: bool = False) -> List[Dict]:
+        """Expand one model entry into per-file download jobs."""
+        base = {
+            'model': model,
+            'repo_id': repo_id,
+            'model_type': model_type,
+            'host': self.endpoint_host,
+            'force': force,
+        }
+        
+        try:
+            files = self.metadata.get_files(repo_id)
+        except Exception as e:
+            files = None
+            self.logger.warning(f"Could not list {repo_id}: {e}")
+        base['listed'] = files is not None
+        
+        if include_files:
+            return [dict(base,
+                         filename=filename,
+                         subfolder=include_folder,
+                         size=(files or {}).get(filename, {}).get('size'),
+                         sha256=(files or {}).get(filename, {}).get('sha256'))
+                    for filename in include_files]
+        
+        if files is None:
+            # No listing available; let snapshot_download work it out
+            return [dict(base, filename=None, subfolder=include_folder,
+                         exclude_files=exclude_files, size=None, sha256=None)]
+        
+        jobs = []
+        for rfilename, info in files.items():
+            if include_folder and not fnmatch(rfilename, f"{include_folder}/*"):
+                continue
+            if exclude_files and any(rfilename == f or fnmatch(rfilename, f"*/{f}") for f in exclude_files):
+                continue
+            jobs.append(dict(base, filename=rfilename, subfolder=None,
+                             size=info['size'], sha256=info['sha256']))
+        return jobs
+    
+    def run_download_jobs(self, jobs: List[Dict]) -> Dict[str, bool]:
+        """Run download jobs through the global scheduler.
+
+        Jobs whose content appears more than once are fetched once; the other
+        paths are materialized from the blob store in a second pass.
+        """
+        first, duplicates = [], []
+        seen: Set[str] = set()
+        for job in jobs:
+            sha = job.get('sha256') if self.dedup else None
+            if sha and sha in seen:
+                duplicates.append(job)
+            else:
+                first.append(job)
+                if sha:
+                    seen.add(sha)
+        if duplicates:
+            self.logger.info(f"{len(duplicates)} files share content with other entries and will be linked")
+        
+        results = self.scheduler.run(first, self._run_download_job)
+        if duplicates:
+            linked = self.scheduler.run(duplicates, self._run_download_job, desc="Linking duplicates")
+            for model, ok in linked.items():
+                results[model] = results.get(model, True) and ok
+        return results
+    
+    def _run_download_job(self, job: Dict) -> bool:
+        if job['filename'] is None:
+            return self._download_snapshot(job['repo_id'],
+                                           job['model_type'],
+                                           job.get('exclude_files'),
+                                           job['subfolder'],
+                                           job['force'])
+        return self.download_file(job['repo_id'],
+                                  job['filename'],
+                                  job['model_type'],
+                                  job['subfolder'],
+                                  job['force']) is not None
+    
     def download_repository(self, 
                           repo_id: str,
                           model_type: str,
@@ -216,85 +1090,80 @@ class ModelInstaller:
                           force: bool = False) -> bool:
         """Download repository with proper folder structure."""
         try:
-            if model_type == 'clip':
-                model_type = 'text_encoders'
-            
-            type_dir = self.model_dir / model_type
-            dest_dir = type_dir / repo_id.split('/')[-1]
+            dest_dir = self._model_dest_dir(repo_id, model_type)
             
             self.logger.info(f"Processing repository: {repo_id} -> {dest_dir}")
             
-            if include_files:
-                success = True
-                with ThreadPoolExecutor(max_workers=4) as executor:
-                    futures = []
-                    for filename in include_files:
-                        future = executor.submit(
-                            self.download_file,
-                            repo_id,
-                            filename,
-                            model_type,
-                            include_folder,
-                            force
-                        )
-                        futures.append((future, filename))
-                    
-                    with tqdm(total=len(futures), desc=f"Downloading {repo_id}") as pbar:
-                        for future, filename in futures:
-                            try:
-                                result = future.result()
-                                if not result:
-                                    success = False
-                                pbar.update(1)
-                            except Exception as e:
-                                self.logger.error(f"Error downloading {filename}: {e}")
-                                success = False
-                                pbar.update(1)
-                
-                return success
+            jobs = self.plan_model_jobs(repo_id, repo_id, model_type, include_files,
+                                        exclude_files, include_folder, force)
+            if not jobs:
+                self.logger.error(f"No files in {repo_id} match the configured filters")
+                return False
+            return self.run_download_jobs(jobs)[repo_id]
+        
+        except Exception as e:
+            self.logger.error(f"Error downloading repository {repo_id}: {e}")
+            return False
+    
+    def _download_snapshot(self,
+                           repo_id: str,
+                           model_type: str,
+                           exclude_files: Optional[List[str]] = None,
+                           include_folder: Optional[str] = None,
+                           force: bool = False) -> bool:
+        """Download a whole repository or folder with snapshot_download."""
+        try:
+            dest_dir = self._model_dest_dir(repo_id, model_type)
             
-            else:
-                if not force and dest_dir.exists() and any(dest_dir.iterdir()):
-                    if all(self.verify_file_integrity(f, repo_id, f.name) 
-                          for f in dest_dir.rglob("*") if f.is_file()):
-                        self.logger.info(f"Repository already exists and is valid: {repo_id}")
-                        return True
-                    else:
-                        self.logger.warning(f"Repository exists but has invalid files: {repo_id}")
-                
-                # Download entire repository or folder
-                allow_patterns = None
-                if include_folder:
-                    allow_patterns = [f"{include_folder}/*"]
-                
-                ignore_patterns = None
-                if exclude_files:
-                    ignore_patterns = [f"*/{f}" for f in exclude_files]
-                
-                try:
+            if not force and dest_dir.exists() and any(dest_dir.iterdir()):
+                # Compare by repo-relative path; skip huggingface_hub's local_dir metadata
+                local_files = [f for f in dest_dir.rglob("*")
+                               if f.is_file() and '.cache' not in f.relative_to(dest_dir).parts]
+                if self.full_verify:
+                    self.prehash_files(local_files)
+                if all(self.verify_file_integrity(f, repo_id, f.relative_to(dest_dir).as_posix())
+                      for f in local_files):
+                    self.logger.info(f"Repository already exists and is valid: {repo_id}")
+                    return True
+                else:
+                    self.logger.warning(f"Repository exists but has invalid files: {repo_id}")
+            
+            # Download entire repository or folder
+            allow_patterns = None
+            if include_folder:
+                allow_patterns = [f"{include_folder}/*"]
+            
+            ignore_patterns = None
+            if exclude_files:
+                ignore_patterns = [f"*/{f}" for f in exclude_files]
+            
+            revision = self._revision(repo_id)
+            try:
+                snapshot_download(
+                    repo_id=repo_id,
+                    revision=revision,
+                    local_dir=dest_dir,
+                    local_dir_use_symlinks=False,
+                    allow_patterns=allow_patterns,
+                    ignore_patterns=ignore_patterns,
+                    force_download=force
+                )
+            except Exception as e:
+                if self.token:
                     snapshot_download(
                         repo_id=repo_id,
+                        revision=revision,
                         local_dir=dest_dir,
                         local_dir_use_symlinks=False,
+                        token=self.token,
                         allow_patterns=allow_patterns,
                         ignore_patterns=ignore_patterns,
                         force_download=force
                     )
-                except Exception as e:
-                    if self.token:
-                        snapshot_download(
-                            repo_id=repo_id,
-                            local_dir=dest_dir,
-                            local_dir_use_symlinks=False,
-                            token=self.token,
-                            allow_patterns=allow_patterns,
-                            ignore_patterns=ignore_patterns,
-                            force_download=force
-                        )
-                    else:
-                        raise e
-                
-                return True
+                else:
+                    raise e
+            
+            return True
         
         except Exception as e:
             self.logger.error(f"Error downloading repository {repo_id}: {e}")
@@ -306,7 +1175,20 @@ class ModelInstaller:
             for root, dirs, files in os.walk(self.model_dir):
                 for name in files:
                     file_path = Path(root) / name
-                    if file_path.suffix == '.temp' or file_path.name.endswith('.download'):
+                    # Segmented partials with a manifest are kept so the next run can resume them,
+                    # unless the destination has since been completed some other way
+                    if file_path.suffix == '.part':
+                        manifest_path = file_path.with_name(file_path.name + '.json')
+                        if manifest_path.exists() and self._partial_superseded(file_path.with_suffix(''),
+                                                                               manifest_path):
+                            self._discard_partial(file_path.with_suffix(''))
+                            continue
+                        orphan = not manifest_path.exists()
+                    elif name.endswith('.part.json'):
+                        orphan = file_path.exists() and not file_path.with_suffix('').exists()
+                    else:
+                        orphan = False
+                    if file_path.suffix == '.temp' or file_path.name.endswith('.download') or orphan:
                         try:
                             file_path.unlink()
                             self.logger.info(f"Removed partial download: {file_path}")
@@ -315,51 +1197,537 @@ class ModelInstaller:
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
     
+    def _partial_superseded(self, dest: Path, manifest_path: Path) -> bool:
+        """True if the destination of a partial already exists with the expected content."""
+        if not dest.is_file():
+            return False
+        if dest in self.downloaded_files:
+            return True
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                size = json.load(f).get('size')
+        except (OSError, ValueError):
+            return True
+        return quick_verify(dest, size) is None
+    
+    @property
+    def lock_file(self) -> Path:
+        """Lockfile that sits next to the model config."""
+        return self.config_file.with_suffix('.lock')
+    
+    def use_lockfile(self) -> bool:
+        """Pin every repository to the revision recorded in the lockfile."""
+        lock = load_lockfile(self.lock_file)
+        if lock is None:
+            self.logger.error(f"No usable lockfile at {self.lock_file}")
+            return False
+        for model in lock['models'].values():
+            self.metadata.pins[model['repo_id']] = model['revision']
+        self.locked = True
+        self.logger.info(f"Pinned {len(self.metadata.pins)} repositories from {self.lock_file.name}")
+        return True
+    
+    def write_lockfile(self, jobs: List[Dict]) -> None:
+        """Record revision, size and sha256 of every installed file."""
+        models: Dict[str, Dict] = {}
+        # Size- or quick-verified files take the sha256 from the repository listing;
+        # only small non-LFS files (no listed sha256) and --full-verify runs hash locally
+        listed: Dict[Path, Optional[str]] = {}
+        for job in jobs:
+            path = self.job_path(job)
+            if path is not None:
+                remote = self._remote_file_info(job['repo_id'], job['filename'])
+                listed[path] = job.get('sha256') or (remote or {}).get('sha256')
+        self.prehash_files([path for path, sha256 in listed.items() if self.full_verify or not sha256])
+        for job in jobs:
+            path = self.job_path(job)
+            if path is None:
+                self.logger.warning(f"Not locking {job['model']}: repository listing was unavailable")
+                models.pop(job['model'], None)
+                continue
+            sha256 = self.hash_cache.get(path) or listed[path]
+            model = models.setdefault(job['model'], {
+                'repo_id': job['repo_id'],
+                'revision': self.metadata.get_revision(job['repo_id']),
+                'model_type': job['model_type'],
+                'files': [],
+            })
+            model['files'].append({
+                'filename': job['filename'],
+                'path': path.relative_to(self.model_dir).as_posix(),
+                'size': path.stat().st_size,
+                'sha256': sha256,
+            })
+        
+        lock = {'version': LOCK_VERSION, 'generated_at': datetime.now().isoformat(timespec='seconds'),
+                'models': models}
+        tmp_file = self.lock_file.with_name(self.lock_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(lock, f, indent=2)
+        os.replace(tmp_file, self.lock_file)
+        self.logger.info(f"Wrote lockfile {self.lock_file} ({sum(len(m['files']) for m in models.values())} files)")
+    
+    def verify_lock(self, full: bool = True) -> bool:
+        """Verify the tree against the lockfile without network access."""
+        lock = load_lockfile(self.lock_file)
+        if lock is None:
+            self.logger.error(f"No usable lockfile at {self.lock_file}")
+            return False
+        results = verify_lockfile(lock, self.model_dir, self.hash_cache, self.hasher if full else None, quick=not full)
+        self.hash_cache.save()
+        for status in ('missing', 'mismatch', 'unverified'):
+            for path in results[status]:
+                self.logger.warning(f"{status}: {path}")
+        self.logger.info(", ".join(f"{len(paths)} {status}" for status, paths in results.items()))
+        return not (results['missing'] or results['mismatch'] or results['unverified'])
+    
+    def load_model_config(self) -> Optional[Dict]:
+        """Load the model configuration file."""
+        if not self.config_file.exists():
+            self.logger.error(f"Configuration file not found: {self.config_file}")
+            return None
+        with open(self.config_file, 'r') as f:
+            return yaml.safe_load(f) or {}
+    
+    def collect_config_jobs(self, config: Dict) -> Tuple[List[Dict], List[Tuple[str, str, bool]]]:
+        """Expand every model entry into file jobs; returns ``(jobs, [(model_key, name, has_jobs)])``."""
+        total_models = sum(len(models) for models in config.values())
+        processed = 0
+        jobs: List[Dict] = []
+        entries = []
+        for model_type, models in config.items():
+            self.logger.info(f"\nPlanning {model_type} models...")
+            
+            for model_name, settings in models.items():
+                processed += 1
+                repo_url = settings.get('repo_url')
+                if not repo_url:
+                    continue
+                
+                # Extract repo ID from URL
+                repo_id = '/'.join(repo_url.split('/')[-2:])
+                
+                self.logger.info(f"[{processed}/{total_models}] Planning {model_name} ({repo_id})...")
+                
+                model_key = f"{model_type}/{model_name}"
+                model_jobs = self.plan_model_jobs(
+                    model=model_key,
+                    repo_id=repo_id,
+                    model_type=model_type,
+                    include_files=settings.get('include_files'),
+                    exclude_files=settings.get('exclude_files'),
+                    include_folder=settings.get('include_folder'),
+                    force=False
+                )
+                entries.append((model_key, model_name, bool(model_jobs)))
+                jobs.extend(model_jobs)
+        return jobs, entries
+    
+    def job_path(self, job: Dict) -> Optional[Path]:
+        """Return the local path a file job installs to (None for snapshot fallbacks)."""
+        if job['filename'] is None:
+            return None
+        return self._model_dest_dir(job['repo_id'], job['model_type'], job['subfolder']) / job['filename']
+    
+    def _job_status(self, job: Dict, path: Optional[Path]) -> str:
+        """Classify a job against the local tree using only cached hashes."""
+        if path is None:
+            return 'unknown'
+        remote = self._remote_file_info(job['repo_id'], job['filename'])
+        exists = path.is_file()
+        if exists and remote:
+            if remote['size'] is not None and path.stat().st_size != remote['size']:
+                status = 'stale'
+            elif remote['sha256']:
+                cached = self.hash_cache.get(path)
+                if cached is not None and cached != remote['sha256']:
+                    status = 'stale'
+                elif self.full_verify or self._full_check_due(path):
+                    status = 'unverified'
+                elif cached is None:
+                    status = 'valid' if quick_verify(path, remote['size']) is None else 'stale'
+                else:
+                    status = 'valid'
+            elif remote['blob_id']:
+                status = 'valid' if git_blob_sha1(path) == remote['blob_id'] else 'stale'
+            else:
+                status = 'valid'
+        elif exists:
+            status = 'unverified'
+        else:
+            status = 'missing'
+        
+        if (status in ('missing', 'stale') and self.dedup and remote and remote['sha256']
+                and self.blob_store.has_content(remote['sha256'])):
+            status = 'linkable'
+        return status
+    
+    def _find_orphans(self, config: Dict, planned: Set[Path], unlisted: Set[str]) -> List[Path]:
+        """Files inside configured repo folders that no config entry accounts for.
+
+        Folders of repositories in ``unlisted`` are skipped: without a listing
+        the plan does not know which of their files belong there.
+        """
+        roots = set()
+        for model_type, models in config.items():
+            for settings in (models or {}).values():
+                repo_url = settings.get('repo_url')
+                if not repo_url:
+                    continue
+                repo_id = '/'.join(repo_url.split('/')[-2:])
+                if repo_id not in unlisted:
+                    roots.add(self._model_dest_dir(repo_id, model_type))
+        orphans = []
+        for root in sorted(roots):
+            if not root.exists():
+                continue
+            for f in root.rglob("*"):
+                if (not f.is_file() or '.cache' in f.relative_to(root).parts
+                        or f.name.endswith(('.part', '.part.json', '.dedup'))):
+                    continue
+                if f not in planned:
+                    orphans.append(f)
+        return orphans
+    
+    def _estimated_throughput(self) -> float:
+        """Bytes per second measured on the last run that downloaded enough to tell."""
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return float(json.load(f)['throughput_bps'])
+        except (OSError, ValueError, KeyError):
+            return float(os.getenv("PLAN_BANDWIDTH_MBPS", "50")) * 1e6
+    
+    def _plan_files(self, jobs: List[Dict]) -> List[Dict]:
+        """Classify each job against the local tree for a plan."""
+        files = []
+        for job in jobs:
+            path = self.job_path(job)
+            files.append({
+                'model': job['model'],
+                'repo_id': job['repo_id'],
+                'filename': job['filename'],
+                'path': str(path) if path else None,
+                'size': job['size'],
+                'status': self._job_status(job, path),
+                'job': job,
+            })
+        return files
+    
+    def plan(self, config: Dict) -> Dict:
+        """Compare the model config against the model tree without downloading anything."""
+        jobs, entries = self.collect_config_jobs(config)
+        files = self._plan_files(jobs)
+        planned = {Path(f['path']) for f in files if f['path']}
+        unlisted = {job['repo_id'] for job in jobs if not job.get('listed', True)}
+        orphans = self._find_orphans(config, planned, unlisted)
+        plan = self._plan_summary(files, orphans, [name for _, name, has_jobs in entries if not has_jobs])
+        plan['unlisted'] = sorted(unlisted)
+        return plan
+    
+    def _plan_summary(self, files: List[Dict], orphans: List[Path], models_without_files: List[str]) -> Dict:
+        counts: Dict[str, int] = {}
+        for f in files:
+            counts[f['status']] = counts.get(f['status'], 0) + 1
+        # Content shared by several paths is only fetched once
+        fetch: Dict[str, int] = {}
+        for f in files:
+            if f['status'] in ('missing', 'stale', 'unknown'):
+                fetch[f['job'].get('sha256') or f['path'] or f['repo_id']] = f['size'] or 0
+        bytes_to_fetch = sum(fetch.values())
+        throughput = self._estimated_throughput()
+        return {
+            'files': files,
+            'orphaned': [{'path': str(p), 'size': p.stat().st_size} for p in orphans],
+            'models_without_files': models_without_files,
+            'summary': {
+                'counts': counts,
+                'orphaned': len(orphans),
+                'bytes_to_fetch': bytes_to_fetch,
+                'orphaned_bytes': sum(p.stat().st_size for p in orphans),
+                'estimated_seconds': round(bytes_to_fetch / throughput, 1) if throughput else None,
+                'throughput_bps': throughput,
+            },
+        }
+    
+    def print_inventory(self, pattern: str = '*', folder: Optional[str] = None, as_json: bool = False) -> None:
+        """Refresh the inventory and print the entries matching a glob pattern."""
+        self.inventory.scan()
+        matches = self.inventory.query(pattern, folder)
+        if as_json:
+            print(json.dumps(dict(matches), indent=2))
+            return
+        print(f"{'FOLDER':<16} {'SIZE':>10} {'FORMAT':<12} {'QUANT':<8} {'PARAMS':>8} {'TENSORS':>7}  PATH")
+        for rel, entry in matches:
+            params = f"{entry['parameters'] / 1e9:.2f}B" if entry.get('parameters') else ""
+            print(f"{entry['folder']:<16} {entry['size'] / 1e6:>7.1f} MB {entry.get('format', '-'):<12} "
+                  f"{entry.get('quantization') or '-':<8} {params:>8} {entry.get('tensor_count', ''):>7}  {rel}")
+        total = sum(entry['size'] for _, entry in matches)
+        print(f"\n{len(matches)} files, {total / 1e9:.2f} GB")
+    
+    @staticmethod
+    def print_plan(plan: Dict, as_json: bool = False) -> None:
+        """Print a plan as a table or as JSON on stdout."""
+        if as_json:
+            files = [{k: v for k, v in f.items() if k != 'job'} for f in plan['files']]
+            print(json.dumps(dict(plan, files=files), indent=2))
+            return
+        
+        print(f"{'STATUS':<11} {'SIZE':>10}  {'MODEL':<40} FILE")
+        for f in sorted(plan['files'], key=lambda f: (f['status'], f['model'])):
+            size = f"{f['size'] / 1e6:.1f} MB" if f['size'] is not None else "?"
+            print(f"{f['status']:<11} {size:>10}  {f['model']:<40} {f['filename'] or '(whole repo)'}")
+        for orphan in plan['orphaned']:
+            print(f"{'orphaned':<11} {orphan['size'] / 1e6:>7.1f} MB  {'':<40} {orphan['path']}")
+        for name in plan['models_without_files']:
+            print(f"{'no-match':<11} {'':>10}  {name:<40} (no files match the configured filters)")
+        for repo_id in plan.get('unlisted', []):
+            print(f"{'unlisted':<11} {'':>10}  {repo_id:<40} (listing unavailable; orphans not checked)")
+        for ref in plan.get('unresolved', []):
+            print(f"{'unresolved':<11} {'':>10}  {ref['node_type']:<40} {ref['ref']} (not in the config or model tree)")
+        
+        summary = plan['summary']
+        counts = ", ".join(f"{count} {status}" for status, count in sorted(summary['counts'].items()))
+        print(f"\n{counts or 'no files'}; {summary['orphaned']} orphaned "
+              f"({summary['orphaned_bytes'] / 1e9:.2f} GB)")
+        estimate = f"{summary['estimated_seconds']:.0f}s" if summary['estimated_seconds'] is not None else "unknown"
+        print(f"To fetch: {summary['bytes_to_fetch'] / 1e9:.2f} GB, estimated "
+              f"{estimate} at {summary['throughput_bps'] / 1e6:.0f} MB/s")
+    
+    def sync(self, prune: bool = False) -> bool:
+        """Execute only the difference between the model config and the tree."""
+        config = self.load_model_config()
+        if config is None:
+            return False
+        
+        plan = self.plan(config)
+        todo = [f['job'] for f in plan['files'] if f['status'] != 'valid']
+        self.logger.info(f"Sync: {len(todo)} of {len(plan['files'])} files need work, "
+                         f"{plan['summary']['bytes_to_fetch'] / 1e9:.2f} GB to fetch")
+        
+        results = self._run_and_report(todo, [(key, key.split('/', 1)[1], True)
+                                              for key in dict.fromkeys(job['model'] for job in todo)])
+        for name in plan['models_without_files']:
+            self.logger.error(f"Failed to process {name}: no files match the configured filters")
+        
+        if prune and plan['unlisted']:
+            self.logger.warning(f"Not pruning: listing unavailable for {', '.join(plan['unlisted'])}")
+        elif prune:
+            for orphan in plan['orphaned']:
+                path = Path(orphan['path'])
+                try:
+                    path.unlink()
+                    self.hash_cache.invalidate(path)
+                    self.logger.info(f"Pruned orphaned file: {path}")
+                except OSError as e:
+                    self.logger.error(f"Error pruning {path}: {e}")
+        
+        success = all(results.values()) and not plan['models_without_files']
+        if success:
+            self.write_lockfile([f['job'] for f in plan['files']])
+        self._finish_run()
+        return success
+    
+    def workflow_plan(self, config: Dict, workflows: List[Path]) -> Dict:
+        """Plan only the config files that the given workflows reference.
+
+        Each loader reference (``<repo folder>/<file>`` relative to a model
+        folder, as ComfyUI lists it) is matched to the config job installing
+        that path. References already on disk but not in the config count as
+        present; the rest are reported as unresolved.
+        """
+        refs = load_workflow_refs(workflows)
+        self.logger.info(f"Workflows reference {len(refs)} model files")
+        self.inventory.scan()
+        jobs, _ = self.collect_config_jobs(config)
+        by_ref: Dict[str, List[Dict]] = {}
+        for job in jobs:
+            path = self.job_path(job)
+            if path is None:
+                self.logger.warning(f"{job['model']}: repository listing unavailable, cannot match it to workflows")
+                continue
+            parts = path.relative_to(self.model_dir).parts
+            by_ref.setdefault('/'.join(parts[1:]), []).append(dict(job, folder=parts[0]))
+        
+        selected: Dict[str, Dict] = {}
+        unresolved = []
+        present = 0
+        for node_type, ref in refs:
+            candidates = by_ref.get(ref, [])
+            preferred = LOADER_FOLDERS.get(node_type, ())
+            candidates.sort(key=lambda job: preferred.index(job['folder']) if job['folder'] in preferred else len(preferred))
+            if candidates:
+                job = {k: v for k, v in candidates[0].items() if k != 'folder'}
+                selected[str(self.job_path(job))] = job
+            elif self.inventory.find(ref, preferred) is not None:
+                present += 1
+                self.logger.info(f"{ref} is not in the config but already installed")
+            else:
+                unresolved.append({'node_type': node_type, 'ref': ref})
+                self.logger.error(f"{ref} ({node_type}) is neither in {self.config_file.name} nor installed")
+        
+        plan = self._plan_summary(self._plan_files(list(selected.values())), [], [])
+        plan['unresolved'] = unresolved
+        plan['summary']['references'] = len(refs)
+        plan['summary']['present_outside_config'] = present
+        return plan
+    
+    def install_workflows(self, workflows: List[Path]) -> bool:
+        """Fetch only the missing or stale files that the given workflows need."""
+        config = self.load_model_config()
+        if config is None:
+            return False
+        plan = self.workflow_plan(config, workflows)
+        todo = [f['job'] for f in plan['files'] if f['status'] != 'valid']
+        self.logger.info(f"Workflow install: {len(todo)} of {len(plan['files'])} referenced files need work, "
+                         f"{plan['summary']['bytes_to_fetch'] / 1e9:.2f} GB to fetch")
+        results = self._run_and_report(todo, [(key, key.split('/', 1)[1], True)
+                                              for key in dict.fromkeys(job['model'] for job in todo)])
+        # No lockfile: it has to describe the whole config, not a workflow's subset
+        self._finish_run()
+        return all(results.values()) and not plan['unresolved']
+    
+    @staticmethod
+    def _volume_of(path: Path) -> Path:
+        """Nearest existing ancestor of a path, used to identify its volume."""
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        return path
+    
+    def preflight(self, jobs: List[Dict]) -> Optional[Set[str]]:
+        """Check free space per target volume before any bytes move.
+
+        Returns the set of models to skip (empty if everything fits), or None
+        if the plan does not fit and trimming is disabled.
+        """
+        # Bytes each model still needs, per volume; shared content counts once
+        needed: Dict[int, Dict[str, int]] = {}
+        volumes: Dict[int, Path] = {self.model_dir.stat().st_dev: self.model_dir}
+        seen: Set[str] = set()
+        for job in jobs:
+            path = self.job_path(job)
+            if path is None or not job['size']:
+                continue
+            if self._job_status(job, path) not in ('missing', 'stale'):
+                continue
+            part_path, _ = SegmentedDownloader.part_paths(path)
+            if part_path.exists() and part_path.stat().st_size == job['size']:
+                # Interrupted download whose space is already allocated
+                continue
+            key = job.get('sha256') or str(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            volume = self._volume_of(path)
+            dev = volume.stat().st_dev
+            volumes.setdefault(dev, volume)
+            needed.setdefault(dev, {})
+            needed[dev][job['model']] = needed[dev].get(job['model'], 0) + job['size']
+        
+        skipped: Set[str] = set()
+        for dev, per_model in needed.items():
+            free = shutil.disk_usage(volumes[dev]).free - self.disk_reserve
+            total = sum(per_model.values())
+            self.logger.info(f"Preflight {volumes[dev]}: {total / 1e9:.2f} GB needed, "
+                             f"{max(free, 0) / 1e9:.2f} GB free after reserve")
+            if total <= free:
+                continue
+            if not self.trim_to_fit:
+                self.logger.error(f"Not enough disk space on {volumes[dev]}: need {total / 1e9:.2f} GB, "
+                                  f"have {max(free, 0) / 1e9:.2f} GB. Free space or use --trim-to-fit")
+                return None
+            # Keep whole models, in config order, while they fit
+            for model, model_bytes in per_model.items():
+                if model_bytes <= free:
+                    free -= model_bytes
+                else:
+                    skipped.add(model)
+                    self.logger.warning(f"Skipping {model}: {model_bytes / 1e9:.2f} GB does not fit on {volumes[dev]}")
+        return skipped
+    
+    def _run_and_report(self, jobs: List[Dict], entries: List[Tuple[str, str, bool]]) -> Dict[str, bool]:
+        """Run jobs and log the outcome per model entry."""
+        if self.disk_preflight:
+            skipped = self.preflight(jobs)
+            if skipped is None:
+                return {model_key: False for model_key, _, _ in entries}
+            jobs = [job for job in jobs if job['model'] not in skipped]
+        
+        total_bytes = sum(job['size'] or 0 for job in jobs)
+        self.logger.info(f"Scheduling {len(jobs)} files ({total_bytes / 1e9:.2f} GB) "
+                         f"across {len(entries)} models")
+        start = time.time()
+        try:
+            results = self.run_download_jobs(jobs)
+        finally:
+            # Persist hashes even if the run is interrupted
+            self.hash_cache.save()
+            self.metadata.save()
+        self._record_throughput(time.time() - start)
+        
+        for model_key, model_name, has_jobs in entries:
+            if not has_jobs:
+                self.logger.error(f"Failed to process {model_name}: no files match the configured filters")
+            elif model_key not in results:
+                results[model_key] = False
+                self.logger.error(f"Skipped {model_name}: not enough disk space")
+            elif results.get(model_key):
+                self.logger.info(f"Successfully processed {model_name}")
+            else:
+                self.logger.error(f"Failed to process {model_name}")
+        return results
+    
+    def _record_throughput(self, elapsed: float) -> None:
+        """Remember download throughput so plans can estimate transfer time."""
+        with self.download_lock:
+            transferred = self.bytes_transferred
+        if transferred < 100 * 1024 * 1024 or elapsed <= 0:
+            return
+        throughput = transferred / elapsed
+        self.logger.info(f"Downloaded {transferred / 1e9:.2f} GB at {throughput / 1e6:.1f} MB/s")
+        try:
+            with open(self.stats_file, 'w', encoding='utf-8') as f:
+                json.dump({'throughput_bps': throughput, 'measured_at': time.time()}, f)
+        except OSError as e:
+            self.logger.error(f"Error saving install stats: {e}")
+    
+    def _finish_run(self) -> None:
+        """Clean up partials and persist caches at the end of a run."""
+        self.cleanup_partial_downloads()
+        
+        if self.dedup:
+            freed = self.blob_store.prune()
+            if freed:
+                self.logger.info(f"Removed unreferenced blobs ({freed / 1e9:.2f} GB)")
+        
+        removed = self.hash_cache.prune()
+        if removed:
+            self.logger.info(f"Dropped {removed} stale hash cache entries")
+        self.hash_cache.save()
+        counts = self.inventory.scan()
+        self.logger.info(f"Model inventory: {len(self.inventory.entries)} files "
+                         f"({counts['added']} added, {counts['updated']} updated, {counts['removed']} removed)")
+        self.metadata.save()
+        self.logger.info(f"Repository metadata requests this run: {self.metadata.request_count}")
+    
     def process_model_config(self) -> None:
         """Process the model configuration file and download models."""
-        config_file = self.script_dir / "model_config.yaml"
-        
-        if not config_file.exists():
-            self.logger.error(f"Configuration file not found: {config_file}")
+        config = self.load_model_config()
+        if config is None:
             return
         
         try:
-            with open(config_file, 'r') as f:
-                config = yaml.safe_load(f)
-            
-            total_models = sum(len(models) for models in config.values())
-            processed = 0
+            # In full mode, hash anything not yet cached up front, using every worker at once
+            if self.full_verify:
+                self.prehash_files(self._existing_model_files(config))
             
-            for model_type, models in config.items():
-                self.logger.info(f"\nProcessing {model_type} models...")
-                
-                for model_name, settings in models.items():
-                    processed += 1
-                    repo_url = settings.get('repo_url')
-                    if not repo_url:
-                        continue
-                    
-                    # Extract repo ID from URL
-                    repo_id = '/'.join(repo_url.split('/')[-2:])
-                    
-                    self.logger.info(f"[{processed}/{total_models}] Processing {model_name}...")
-                    
-                    success = self.download_repository(
-                        repo_id=repo_id,
-                        model_type=model_type,
-                        include_files=settings.get('include_files'),
-                        exclude_files=settings.get('exclude_files'),
-                        include_folder=settings.get('include_folder'),
-                        force=False
-                    )
-                    
-                    if success:
-                        self.logger.info(f"Successfully processed {model_name}")
-                    else:
-                        self.logger.error(f"Failed to process {model_name}")
+            # Expand every model entry into file jobs for one shared queue
+            jobs, entries = self.collect_config_jobs(config)
+            results = self._run_and_report(jobs, entries)
+            if all(results.values()) and all(has_jobs for _, _, has_jobs in entries):
+                self.write_lockfile(jobs)
             
             # Final cleanup
-            self.cleanup_partial_downloads()
+            self._finish_run()
             
             self.logger.info("\nModel installation complete!")
             
@@ -368,9 +1736,59 @@ class ModelInstaller:
             raise
 
 def main():
+    parser = argparse.ArgumentParser(description="Install the models listed in model_config.yaml")
+    parser.add_argument("--config", help="Path to the model config (default: model_config.yaml next to this script)")
+    parser.add_argument("--plan", action="store_true", help="Show what is valid, missing, stale or orphaned without downloading")
+    parser.add_argument("--json", action="store_true", help="Print the plan as JSON")
+    parser.add_argument("--sync", action="store_true", help="Only fetch what the plan reports as missing or stale")
+    parser.add_argument("--prune", action="store_true", help="With --sync, delete orphaned files")
+    parser.add_argument("--trim-to-fit", action="store_true", help="Skip models that do not fit on disk instead of aborting")
+    parser.add_argument("--locked", action="store_true", help="Install the revisions pinned in model_config.lock")
+    parser.add_argument("--verify-lock", action="store_true", help="Verify the tree against model_config.lock offline")
+    parser.add_argument("--quick", action="store_true",
+                        help="With --verify-lock, check sizes, cached hashes and file structure instead of hashing")
+    parser.add_argument("--full-verify", action="store_true", help="Re-hash every existing file instead of the quick check")
+    parser.add_argument("--inventory", nargs="?", const="*", metavar="PATTERN",
+                        help="List installed models with header metadata, optionally filtered by a glob")
+    parser.add_argument("--folder", help="With --inventory, only this model folder (e.g. unet)")
+    parser.add_argument("--workflow", action="append", metavar="PATH",
+                        help="Only install the models this workflow JSON (or folder of workflows) uses; repeatable")
+    args = parser.parse_args()
+    
     try:
         installer = ModelInstaller()
-        installer.process_model_config()
+        if args.config:
+            installer.config_file = Path(args.config).resolve()
+        if args.trim_to_fit:
+            installer.trim_to_fit = True
+        if args.full_verify:
+            installer.full_verify = True
+        
+        if args.inventory:
+            installer.print_inventory(args.inventory, args.folder, as_json=args.json)
+            return
+        if args.verify_lock:
+            sys.exit(0 if installer.verify_lock(full=not args.quick) else 1)
+        if args.locked and not installer.use_lockfile():
+            sys.exit(1)
+        
+        workflows = [Path(p) for p in args.workflow or []]
+        if args.plan:
+            config = installer.load_model_config()
+            if config is None:
+                sys.exit(1)
+            plan = installer.workflow_plan(config, workflows) if workflows else installer.plan(config)
+            installer.print_plan(plan, as_json=args.json)
+            installer.hash_cache.save()
+            installer.metadata.save()
+        elif workflows:
+            if not installer.install_workflows(workflows):
+                sys.exit(1)
+        elif args.sync:
+            if not installer.sync(prune=args.prune):
+                sys.exit(1)
+        else:
+            installer.process_model_config()
     except KeyboardInterrupt:
         print("\nInstallation interrupted by user")
         sys.exit(1)
@@ -379,4 +1797,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
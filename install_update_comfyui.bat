@@ -155,50 +155,13 @@ if not exist "%COMFYUI_DIR%\.git" (
 )
 
 REM --------------------------------------------------------------------
-REM [9] Clone or update custom node repositories.
+REM [9] Prepare the custom nodes folder (repositories are synced in step 12).
 set "CUSTOM_NODES_DIR=%COMFYUI_DIR%\custom_nodes"
-cd /d "%COMFYUI_DIR%"
 if not exist "%CUSTOM_NODES_DIR%" mkdir "%CUSTOM_NODES_DIR%"
-pushd "%CUSTOM_NODES_DIR%"
 
 REM Configure Git credential helper to avoid login prompts.
 git config --global credential.helper manager-core
 
-REM Define custom nodes repositories.
-set "CUSTOM_NODES_REPOS[0]=https://github.com/ltdrdata/ComfyUI-Manager.git"
-set "CUSTOM_NODES_REPOS[1]=https://github.com/rgthree/rgthree-comfy.git"
-set "CUSTOM_NODES_REPOS[5]=https://github.com/city96/ComfyUI_ExtraModels.git"
-set "CUSTOM_NODES_REPOS[6]=https://github.com/city96/ComfyUI-GGUF.git"
-
-for /L %%i in (0,1,7) do (
-    set "REPO_URL=!CUSTOM_NODES_REPOS[%%i]!"
-    if defined REPO_URL (
-        REM Extract repository name from URL (strip .git and path components)
-        for %%A in ("!REPO_URL!") do set "REPO_NAME=%%~nA"
-        set "TARGET_DIR=%CUSTOM_NODES_DIR%\!REPO_NAME!"
-        if not exist "!TARGET_DIR!" (
-            echo [INFO] Cloning custom node: !REPO_NAME!...
-            git clone --depth 1 "!REPO_URL!" "!TARGET_DIR!"
-            if !ERRORLEVEL! neq 0 (
-                echo [ERROR] Failed to clone custom node repository: !REPO_NAME!
-                popd
-                goto END
-            )
-            REM Trust this custom_nodes directory even if moved
-            git config --global --add safe.directory "!TARGET_DIR!"
-        ) else (
-            echo [INFO] Updating custom node: !REPO_NAME!...
-            pushd "!TARGET_DIR!"
-            REM Trust this custom_nodes directory even if moved
-            git config --global --add safe.directory "%CD%"
-            git stash push -m "Auto-stash before update"
-            git pull --ff-only
-            popd
-        )
-    )
-)
-popd
-
 REM --------------------------------------------------------------------
 REM [10] Upgrade pip and install pre-update packages.
 echo [INFO] Upgrading pip and installing pre-update packages...
@@ -228,38 +191,33 @@ if exist "requirements.txt" (
 )
 
 REM --------------------------------------------------------------------
-REM [12] Pre-accelerator: install custom node requirements and run install scripts.
+REM [12] Pre-accelerator: clone/update custom nodes concurrently, install their merged
+REM      requirements with a single pip call and run their install scripts.
+REM      Repositories come from CUSTOM_NODE_REPOS in .env (default: the nodes listed in README).
+echo [INFO] Syncing custom nodes and installing their requirements...
+python "%~dp0sync_custom_nodes.py" --comfyui-dir "%COMFYUI_DIR%"
+if %ERRORLEVEL%==1 (
+    echo [ERROR] Failed to clone a custom node repository. Aborting.
+    goto END
+)
+if %ERRORLEVEL% neq 0 (
+    echo [WARNING] Some custom node requirements conflicted or failed to install; see the log above (continuing)
+)
 if exist "%CUSTOM_NODES_DIR%" (
-    echo [INFO] Processing custom nodes requirements and install scripts...
     pushd "%CUSTOM_NODES_DIR%"
     for /d %%D in (*) do (
-        if exist "%%D" (
-            echo [INFO] Checking custom node: %%D
-            REM Install any requirements*.txt files found
-            for %%R in ("%%D\requirements*.txt") do (
-                if exist "%%~fR" (
-                    echo [INFO] Installing requirements: %%~nxR
-                    python -m pip install --no-user -r "%%~fR"
-                    if !ERRORLEVEL! neq 0 (
-                        echo [WARNING] Failed to install requirements from %%~nxR (continuing)
-                    )
-                )
-            )
-            REM Run install.bat if present
-            if exist "%%D\install.bat" (
-                echo [INFO] Running install.bat in %%D
-                pushd "%%D"
-                call install.bat
-                if !ERRORLEVEL! neq 0 (
-                    echo [WARNING] install.bat in %%D returned a non-zero exit code (continuing)
-                )
-                popd
+        REM Run install.bat if present
+        if exist "%%D\install.bat" (
+            echo [INFO] Running install.bat in %%D
+            pushd "%%D"
+            call install.bat
+            if !ERRORLEVEL! neq 0 (
+                echo [WARNING] install.bat in %%D returned a non-zero exit code (continuing)
             )
+            popd
         )
     )
     popd
-) else (
-    echo [INFO] No custom_nodes directory found at %CUSTOM_NODES_DIR%.
 )
 
 REM --------------------------------------------------------------------
@@ -0,0 +1,1181 @@
+"""Stdlib-only helpers for the model tree, shared by the installer and the launcher."""
+
+import os
+import sys
+import json
+import shutil
+import struct
+import hashlib
+import logging
+import threading
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Iterable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+# Large reads keep hashing bound by the disk rather than per-call overhead
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class HashCache:
+    """On-disk SHA-256 index keyed by path, size, mtime and file ID.
+
+    An entry is only trusted while the file's (size, mtime_ns, inode) signature
+    is unchanged, so edited, replaced or re-downloaded files are re-hashed.
+    Entries also record when the file was last fully hashed or passed a quick
+    structural check, so full re-verification can be scheduled by age.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_file: Path, root: Path, logger: Optional[logging.Logger] = None):
+        self.cache_file = Path(cache_file)
+        self.root = Path(root)
+        self.logger = logger or logging.getLogger("ModelStore")
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        if not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self._entries = data.get('entries', {})
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable hash cache {self.cache_file}: {e}")
+            self._entries = {}
+
+    def _key(self, path: Path) -> str:
+        path = Path(path)
+        try:
+            return path.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return str(path.resolve())
+
+    @staticmethod
+    def _signature(st: os.stat_result) -> List[int]:
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def get(self, path: Path) -> Optional[str]:
+        """Return the cached hash if the file is unchanged since it was hashed."""
+        key = self._key(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if entry.get('sig') != self._signature(st):
+                # File changed since it was hashed
+                del self._entries[key]
+                self._dirty = True
+                return None
+            return entry.get('sha256')
+
+    def put(self, path: Path, sha256: str):
+        """Record the hash of a file together with its current signature."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._entries[self._key(path)] = {'sig': self._signature(st), 'sha256': sha256, 'hashed_at': time.time()}
+            self._dirty = True
+
+    def mark_quick(self, path: Path):
+        """Record that an unhashed file passed the quick structural check."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.get('sig') == self._signature(st):
+                entry.setdefault('quick_at', time.time())
+            else:
+                self._entries[key] = {'sig': self._signature(st), 'sha256': None, 'quick_at': time.time()}
+            self._dirty = True
+
+    def verified_age(self, path: Path) -> Optional[float]:
+        """Seconds since the file was last fully hashed (or first quick-checked, if never hashed)."""
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            # Entries written before timestamps were recorded count as fresh
+            since = entry.get('hashed_at') if entry.get('sha256') else entry.get('quick_at')
+        return time.time() - since if since else 0.0
+
+    def invalidate(self, path: Path):
+        """Drop any cached hash for a path."""
+        with self._lock:
+            if self._entries.pop(self._key(path), None) is not None:
+                self._dirty = True
+
+    def paths_for(self, sha256: str) -> List[Path]:
+        """Return the files whose cached hash equals ``sha256``."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.get('sha256') == sha256]
+        paths = [Path(key) if Path(key).is_absolute() else self.root / key for key in keys]
+        # Only trust entries whose file is unchanged
+        return [path for path in paths if self.get(path) == sha256]
+
+    def prune(self) -> int:
+        """Remove entries for files that no longer exist or have changed."""
+        removed = 0
+        with self._lock:
+            for key in list(self._entries):
+                path = Path(key) if Path(key).is_absolute() else self.root / key
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    st = None
+                if st is None or self._entries[key].get('sig') != self._signature(st):
+                    del self._entries[key]
+                    removed += 1
+            if removed:
+                self._dirty = True
+        return removed
+
+    def save(self):
+        """Atomically write the index if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': self.VERSION, 'entries': dict(self._entries)}
+            self._dirty = False
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_name(self.cache_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            self.logger.error(f"Error saving hash cache {self.cache_file}: {e}")
+            with self._lock:
+                self._dirty = True
+
+
+LOCK_VERSION = 1
+
+
+def load_lockfile(lock_file: Path) -> Optional[Dict]:
+    """Load a model lockfile, or return None if it is missing or unreadable."""
+    try:
+        with open(lock_file, 'r', encoding='utf-8') as f:
+            lock = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return lock if lock.get('version') == LOCK_VERSION else None
+
+
+def verify_lockfile(lock: Dict,
+                    model_dir: Path,
+                    hash_cache: HashCache,
+                    hasher: Optional['FileHasher'] = None,
+                    quick: bool = False) -> Dict[str, List[str]]:
+    """Check the installed tree against a lockfile without any network access.
+
+    Files are checked by size and then by cached hash. Files with no cached
+    hash are hashed when a ``hasher`` is given. Otherwise, with ``quick``, they
+    get the structural check (``quick``: passed, ``mismatch``: failed), and
+    without it they are reported as ``unverified``. Either way the check costs
+    a few small reads per file.
+    """
+    results: Dict[str, List[str]] = {'valid': [], 'quick': [], 'unverified': [], 'missing': [], 'mismatch': []}
+    to_hash: Dict[Path, Dict] = {}
+    for model in lock.get('models', {}).values():
+        for entry in model.get('files', []):
+            path = Path(model_dir) / entry['path']
+            try:
+                size = path.stat().st_size
+            except OSError:
+                results['missing'].append(entry['path'])
+                continue
+            if size != entry['size']:
+                results['mismatch'].append(entry['path'])
+                continue
+            cached = hash_cache.get(path)
+            if cached is None:
+                to_hash[path] = entry
+            elif cached == entry['sha256']:
+                results['valid'].append(entry['path'])
+            else:
+                results['mismatch'].append(entry['path'])
+    
+    if hasher is None and quick:
+        for path, entry in to_hash.items():
+            problem = quick_verify(path, entry['size'])
+            if problem is None:
+                hash_cache.mark_quick(path)
+                results['quick'].append(entry['path'])
+            else:
+                results['mismatch'].append(f"{entry['path']} ({problem})")
+    elif hasher is None:
+        results['unverified'].extend(entry['path'] for entry in to_hash.values())
+    else:
+        digests = hasher.hash_files(list(to_hash))
+        for path, entry in to_hash.items():
+            digest = digests.get(path)
+            if digest is not None:
+                hash_cache.put(path, digest)
+            results['valid' if digest == entry['sha256'] else 'mismatch'].append(entry['path'])
+    return results
+
+
+class BlobStore:
+    """Content-addressed store of model files keyed by SHA-256.
+
+    Blobs live at ``<root>/<sha[:2]>/<sha>`` as hardlinks of installed files,
+    so the store costs no extra space. Configured paths that share content
+    are materialized from the store as hardlinks, reflinks or, failing both,
+    copies, instead of being downloaded again.
+    """
+
+    def __init__(self, root: Path, hash_cache: HashCache, logger: Optional[logging.Logger] = None):
+        self.root = Path(root)
+        self.hash_cache = hash_cache
+        self.logger = logger or logging.getLogger("ModelStore")
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def _source_for(self, sha256: str) -> Optional[Path]:
+        # Only trust content whose hash is still valid; a linked file edited in
+        # place changes the blob too, and its signature no longer matches.
+        # Filesystems without hardlinks have no blobs, so any verified copy will do.
+        paths = self.hash_cache.paths_for(sha256)
+        blob = self.blob_path(sha256)
+        if blob in paths:
+            return blob
+        return paths[0] if paths else None
+
+    def has_content(self, sha256: str) -> bool:
+        """Return True if the content can be materialized without a download."""
+        return self._source_for(sha256) is not None
+
+    def add(self, path: Path, sha256: str) -> int:
+        """Register a verified file; returns bytes reclaimed by replacing a duplicate with a link."""
+        blob = self.blob_path(sha256)
+        with self._lock:
+            try:
+                if blob.exists() and self.hash_cache.get(blob) != sha256:
+                    # Blob changed behind our back; replace it with this verified file
+                    blob.unlink()
+                if not blob.exists():
+                    blob.parent.mkdir(parents=True, exist_ok=True)
+                    os.link(path, blob)
+                    self.hash_cache.put(blob, sha256)
+                    return 0
+                if os.path.samefile(path, blob):
+                    return 0
+                # Same content stored twice: point this path at the blob instead
+                size = os.path.getsize(path)
+                tmp_path = path.with_name(path.name + '.dedup')
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                self.logger.debug(f"Blob store link skipped for {path}: {e}")
+                return 0
+        self.hash_cache.put(path, sha256)
+        self.logger.info(f"Deduplicated {path.name} ({size / 1e6:.1f} MB reclaimed)")
+        return size
+
+    def materialize(self, sha256: str, dest: Path) -> bool:
+        """Create ``dest`` from stored content; returns False if the content is not available."""
+        source = self._source_for(sha256)
+        if source is None:
+            return False
+        if dest.exists() and os.path.samefile(source, dest):
+            return True
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dest.with_name(dest.name + '.dedup')
+        tmp_path.unlink(missing_ok=True)
+        try:
+            try:
+                os.link(source, tmp_path)
+                method = "hardlink"
+            except OSError:
+                if _reflink(source, tmp_path):
+                    method = "reflink"
+                else:
+                    shutil.copyfile(source, tmp_path)
+                    method = "copy"
+            os.replace(tmp_path, dest)
+        except OSError as e:
+            self.logger.warning(f"Could not materialize {dest.name} from {source}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+        self.hash_cache.put(dest, sha256)
+        self.logger.info(f"Materialized {dest.name} from local content ({method})")
+        return True
+
+    def prune(self) -> int:
+        """Remove blobs no installed file links to; returns bytes freed."""
+        freed = 0
+        if not self.root.exists():
+            return freed
+        for blob in self.root.glob("*/*"):
+            try:
+                st = blob.stat()
+                if st.st_nlink <= 1:
+                    blob.unlink()
+                    freed += st.st_size
+            except OSError as e:
+                self.logger.error(f"Error pruning blob {blob}: {e}")
+        return freed
+
+
+class ModelCache:
+    """Size-bounded local copy of a slow model tree (for example a NAS share).
+
+    Files keep their path relative to the source root, so ComfyUI can list the
+    cache before the source in ``extra_model_paths.yaml``. Entries record the
+    source size and mtime and are dropped when the source changes. When a new
+    copy would exceed ``max_bytes``, the least recently used files are evicted.
+    Hits, misses and bytes used from each tier are kept in the index across runs.
+    """
+
+    VERSION = 1
+    INDEX_NAME = ".cache_index.json"
+
+    def __init__(self, cache_dir: Path, source_dir: Path, max_bytes: int, logger: Optional[logging.Logger] = None):
+        self.cache_dir = Path(cache_dir)
+        self.source_dir = Path(source_dir)
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger("ModelStore")
+        self.index_file = self.cache_dir / self.INDEX_NAME
+        self._lock = threading.Lock()
+        self._copying: Dict[str, threading.Event] = {}
+        self._entries: Dict[str, Dict] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_from_cache': 0, 'bytes_from_source': 0,
+                      'evictions': 0, 'bytes_evicted': 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self._entries = data.get('entries', {})
+            self.stats.update(data.get('stats', {}))
+
+    def save(self):
+        """Atomically write the index."""
+        with self._lock:
+            data = {'version': self.VERSION, 'entries': dict(self._entries), 'stats': dict(self.stats)}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.index_file.with_name(self.index_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            self.logger.error(f"Error saving model cache index {self.index_file}: {e}")
+
+    def relative(self, path: Path) -> Optional[Tuple[str, str]]:
+        """Return ``(tier, relative_path)`` for a path inside the cache or source tree."""
+        # psutil reports paths as the OS spells them; compare case-insensitively on Windows
+        path = os.path.normcase(os.path.abspath(path))
+        for tier, root in (('cache', self.cache_dir), ('source', self.source_dir)):
+            root = os.path.normcase(os.path.abspath(root))
+            if path.startswith(root + os.sep):
+                rel = Path(os.path.relpath(path, root)).as_posix()
+                # Hand back the index's spelling of the path when it differs only in case
+                with self._lock:
+                    for known in self._entries:
+                        if os.path.normcase(known) == os.path.normcase(rel):
+                            return tier, known
+                return tier, rel
+        return None
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(entry['size'] for entry in self._entries.values())
+
+    def _source_signature(self, rel: str) -> Optional[List[int]]:
+        try:
+            st = os.stat(self.source_dir / rel)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def cached_path(self, rel: str) -> Optional[Path]:
+        """Return the cached copy if it is present and the source has not changed."""
+        with self._lock:
+            entry = self._entries.get(rel)
+        if entry is None:
+            return None
+        path = self.cache_dir / rel
+        sig = self._source_signature(rel)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = None
+        if size != entry['size'] or (sig is not None and sig != entry['source']):
+            self._remove(rel, reason="source changed" if size == entry['size'] else "copy missing")
+            return None
+        return path
+
+    def record_use(self, rel: str, tier: str) -> None:
+        """Count one use of a model from the given tier and refresh its LRU position."""
+        with self._lock:
+            entry = self._entries.get(rel)
+            if tier == 'cache':
+                self.stats['hits'] += 1
+                if entry is not None:
+                    self.stats['bytes_from_cache'] += entry['size']
+                    entry['last_access'] = time.time()
+            else:
+                self.stats['misses'] += 1
+                try:
+                    self.stats['bytes_from_source'] += os.path.getsize(self.source_dir / rel)
+                except OSError:
+                    pass
+
+    def fetch(self, rel: str) -> Optional[Path]:
+        """Return a cached copy of ``rel``, copying it from the source first if needed."""
+        path = self.cached_path(rel)
+        if path is not None:
+            with self._lock:
+                self._entries[rel]['last_access'] = time.time()
+            return path
+        with self._lock:
+            busy = self._copying.get(rel)
+            if busy is None:
+                self._copying[rel] = threading.Event()
+        if busy is not None:
+            busy.wait()
+            return self.cached_path(rel)
+        try:
+            return self._copy_in(rel)
+        finally:
+            with self._lock:
+                self._copying.pop(rel).set()
+
+    def _copy_in(self, rel: str) -> Optional[Path]:
+        source = self.source_dir / rel
+        sig = self._source_signature(rel)
+        if sig is None:
+            return None
+        size = sig[0]
+        if size > self.max_bytes:
+            self.logger.info(f"Not caching {rel}: {size / 1e9:.1f} GB exceeds the cache budget")
+            return None
+        self._make_room(size, keep=rel)
+        dest = self.cache_dir / rel
+        tmp_path = dest.with_name(dest.name + '.caching')
+        start = time.perf_counter()
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, dest)
+        except OSError as e:
+            self.logger.warning(f"Could not cache {rel}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._entries[rel] = {'size': size, 'source': sig, 'last_access': time.time()}
+        self.logger.info(f"Cached {rel}: {size / 1e6:.1f} MB at {_rate(size, elapsed)}")
+        self.save()
+        return dest
+
+    def _make_room(self, size: int, keep: Optional[str] = None) -> None:
+        """Evict least recently used files until ``size`` more bytes fit the budget."""
+        with self._lock:
+            candidates = sorted((entry['last_access'], rel) for rel, entry in self._entries.items() if rel != keep)
+            used = sum(entry['size'] for entry in self._entries.values())
+        for _, rel in candidates:
+            if used + size <= self.max_bytes:
+                break
+            freed = self._remove(rel, reason="evicted")
+            used -= freed
+
+    def _remove(self, rel: str, reason: str) -> int:
+        try:
+            (self.cache_dir / rel).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Windows refuses to delete a file ComfyUI still has open or mapped
+            self.logger.debug(f"Cannot remove cached {rel} yet: {e}")
+            return 0
+        with self._lock:
+            entry = self._entries.pop(rel, None)
+            if entry is None:
+                return 0
+            if reason == "evicted":
+                self.stats['evictions'] += 1
+                self.stats['bytes_evicted'] += entry['size']
+        self.logger.info(f"Removed {rel} from the model cache ({reason}, {entry['size'] / 1e6:.1f} MB)")
+        return entry['size']
+
+    def prune(self) -> None:
+        """Drop stale entries and interrupted copies, then enforce the budget.
+
+        Only files the cache wrote itself are deleted; anything else found in
+        the cache directory is left alone.
+        """
+        with self._lock:
+            rels = list(self._entries)
+        for rel in rels:
+            self.cached_path(rel)
+        if self.cache_dir.exists():
+            for path in self.cache_dir.rglob("*.caching"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        self._make_room(0)
+        self.save()
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{s['hits']} hits ({s['bytes_from_cache'] / 1e9:.2f} GB from cache), "
+                f"{s['misses']} misses ({s['bytes_from_source'] / 1e9:.2f} GB from source), "
+                f"{s['evictions']} evictions; {self.used_bytes / 1e9:.2f} of {self.max_bytes / 1e9:.2f} GB used")
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    """Copy-on-write clone where the filesystem supports it (Linux FICLONE)."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        FICLONE = 0x40049409
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except (OSError, ImportError):
+        try:
+            dest.unlink()
+        except OSError:
+            pass
+        return False
+
+
+def _hash_stream(file_path: Path, hasher, buffer_size: int = HASH_BUFFER_SIZE):
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher
+
+
+def sha256_file(file_path: Path, buffer_size: int = HASH_BUFFER_SIZE) -> str:
+    """Compute the SHA-256 of a file."""
+    return _hash_stream(file_path, hashlib.sha256(), buffer_size).hexdigest()
+
+
+def git_blob_sha1(file_path: Path) -> str:
+    """Compute the git blob id of a file (how the Hub identifies non-LFS files)."""
+    size = os.path.getsize(file_path)
+    return _hash_stream(file_path, hashlib.sha1(f"blob {size}\0".encode())).hexdigest()
+
+
+def _timed_sha256(file_path: str, buffer_size: int) -> Tuple[str, str, int, float]:
+    # Module-level so it can run in a process pool
+    start = time.perf_counter()
+    digest = sha256_file(Path(file_path), buffer_size)
+    return file_path, digest, os.path.getsize(file_path), time.perf_counter() - start
+
+
+class FileHasher:
+    """Hashes many files concurrently and reports throughput.
+
+    hashlib and file reads release the GIL for large buffers, so a thread pool
+    already scales with the disk; a process pool can be selected for hosts
+    where many small files make the interpreter the bottleneck.
+    """
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 buffer_size: int = HASH_BUFFER_SIZE,
+                 use_processes: bool = False,
+                 logger: Optional[logging.Logger] = None):
+        self.workers = workers or min(8, os.cpu_count() or 4)
+        self.buffer_size = buffer_size
+        self.use_processes = use_processes
+        self.logger = logger or logging.getLogger("ModelStore")
+
+    def hash_file(self, file_path: Path) -> str:
+        """Hash a single file, logging its throughput."""
+        _, digest, size, elapsed = _timed_sha256(str(file_path), self.buffer_size)
+        self._log_file(Path(file_path), size, elapsed)
+        return digest
+
+    def hash_files(self, paths: Iterable[Path]) -> Dict[Path, str]:
+        """Hash files in parallel; returns ``{path: sha256}`` for files that could be read."""
+        paths = [Path(p) for p in paths]
+        results: Dict[Path, str] = {}
+        if not paths:
+            return results
+        
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        total_bytes = 0
+        start = time.perf_counter()
+        with executor_cls(max_workers=min(self.workers, len(paths))) as executor:
+            futures = {executor.submit(_timed_sha256, str(p), self.buffer_size): p for p in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    _, digest, size, elapsed = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error hashing {path}: {e}")
+                    continue
+                results[path] = digest
+                total_bytes += size
+                self._log_file(path, size, elapsed)
+        
+        elapsed = time.perf_counter() - start
+        self.logger.info(
+            f"Hashed {len(results)} files, {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+            f"({_rate(total_bytes, elapsed)}) with {self.workers} workers"
+        )
+        return results
+
+    def _log_file(self, path: Path, size: int, elapsed: float):
+        self.logger.info(f"Hashed {path.name}: {size / 1e6:.1f} MB at {_rate(size, elapsed)}")
+
+
+def _rate(num_bytes: int, seconds: float) -> str:
+    return f"{num_bytes / 1e6 / seconds:.1f} MB/s" if seconds > 0 else "n/a MB/s"
+
+
+# Weight file extensions ComfyUI's loaders list
+MODEL_EXTENSIONS = ('.safetensors', '.sft', '.gguf', '.ckpt', '.pt', '.pth', '.bin', '.pkl', '.onnx')
+
+# Model folders a loader reads from, in the order they are tried; other nodes fall back to every folder
+LOADER_FOLDERS = {
+    'CheckpointLoaderSimple': ('checkpoints',),
+    'CheckpointLoader': ('checkpoints',),
+    'ImageOnlyCheckpointLoader': ('checkpoints',),
+    'unCLIPCheckpointLoader': ('checkpoints',),
+    'VAELoader': ('vae',),
+    'LoraLoader': ('loras',),
+    'LoraLoaderModelOnly': ('loras',),
+    'UNETLoader': ('diffusion_models', 'unet'),
+    'UnetLoaderGGUF': ('unet', 'diffusion_models'),
+    'UnetLoaderGGUFAdvanced': ('unet', 'diffusion_models'),
+    'CLIPLoader': ('text_encoders', 'clip'),
+    'DualCLIPLoader': ('text_encoders', 'clip'),
+    'TripleCLIPLoader': ('text_encoders', 'clip'),
+    'CLIPLoaderGGUF': ('clip', 'text_encoders'),
+    'DualCLIPLoaderGGUF': ('clip', 'text_encoders'),
+    'TripleCLIPLoaderGGUF': ('clip', 'text_encoders'),
+    'CLIPVisionLoader': ('clip_vision',),
+    'ControlNetLoader': ('controlnet',),
+    'DiffControlNetLoader': ('controlnet',),
+    'StyleModelLoader': ('style_models',),
+    'UpscaleModelLoader': ('upscale_models',),
+    'GLIGENLoader': ('gligen',),
+    'HypernetworkLoader': ('hypernetworks',),
+    'PhotoMakerLoader': ('photomaker',),
+}
+
+
+def _model_strings(values) -> List[str]:
+    if isinstance(values, dict):
+        values = values.values()
+    elif not isinstance(values, list):
+        return []
+    return [v for v in values if isinstance(v, str) and v.lower().endswith(MODEL_EXTENSIONS)]
+
+
+def workflow_model_refs(workflow: Dict) -> List[Tuple[str, str]]:
+    """Return ``(node_type, relative_path)`` for every model file a workflow references.
+
+    Understands both the UI format saved by the browser (``nodes`` with
+    ``widgets_values``, including group-node definitions under ``extra``) and
+    the API format (``{id: {"class_type", "inputs"}}``). Paths are returned
+    with forward slashes, as ComfyUI lists them relative to a model folder.
+    """
+    refs: List[Tuple[str, str]] = []
+    if isinstance(workflow.get('nodes'), list):
+        nodes = list(workflow['nodes'])
+        for group in (workflow.get('extra') or {}).get('groupNodes', {}).values():
+            nodes.extend(group.get('nodes', []))
+        for node in nodes:
+            # mode 2 (muted) and 4 (bypassed) nodes never load their models
+            if node.get('mode') in (2, 4):
+                continue
+            for value in _model_strings(node.get('widgets_values')):
+                refs.append((node.get('type', ''), value))
+    else:
+        for node in workflow.values():
+            if isinstance(node, dict) and 'class_type' in node:
+                for value in _model_strings(node.get('inputs')):
+                    refs.append((node['class_type'], value))
+    
+    seen = set()
+    unique = []
+    for node_type, value in refs:
+        key = (node_type, value.replace('\\', '/'))
+        if key not in seen:
+            seen.add(key)
+            unique.append(key)
+    return unique
+
+
+def load_workflow_refs(paths: Iterable[Path]) -> List[Tuple[str, str]]:
+    """Collect model references from workflow files and folders of ``*.json`` workflows."""
+    files: List[Path] = []
+    for path in paths:
+        path = Path(path)
+        files.extend(sorted(path.glob('*.json')) if path.is_dir() else [path])
+    refs: List[Tuple[str, str]] = []
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            workflow = json.load(f)
+        # Workflows embedded in API requests wrap the graph in "prompt"
+        if isinstance(workflow.get('prompt'), dict):
+            workflow = workflow['prompt']
+        refs.extend(r for r in workflow_model_refs(workflow) if r not in refs)
+    return refs
+
+
+def resolve_model_ref(node_type: str, ref: str, roots: Iterable[Path]) -> Optional[Path]:
+    """Find the file a loader reference points to under the given model roots."""
+    parts = ref.split('/')
+    preferred = LOADER_FOLDERS.get(node_type, ())
+    for root in roots:
+        root = Path(root)
+        candidates = [root / folder for folder in preferred]
+        try:
+            candidates.extend(sorted(p for p in root.iterdir() if p.is_dir() and p not in candidates))
+        except OSError:
+            continue
+        for folder in candidates:
+            path = folder.joinpath(*parts)
+            if path.is_file():
+                return path
+    return None
+
+
+def _read_through(path: Path, buffer_size: int, stop: Optional[threading.Event]) -> int:
+    buffer = bytearray(buffer_size)
+    total = 0
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while stop is None or not stop.is_set():
+            n = f.readinto(buffer)
+            if not n:
+                break
+            total += n
+    return total
+
+
+def prewarm_files(paths: Iterable[Path],
+                  workers: int = 4,
+                  max_bytes: Optional[int] = None,
+                  buffer_size: int = HASH_BUFFER_SIZE,
+                  stop: Optional[threading.Event] = None,
+                  logger: Optional[logging.Logger] = None) -> Tuple[int, float]:
+    """Read files end to end so the OS keeps them in its page cache.
+
+    Files are read in parallel, largest first, and skipped once ``max_bytes``
+    would be exceeded (warming more than fits in RAM only evicts earlier
+    files). Returns ``(bytes_read, seconds)``.
+    """
+    logger = logger or logging.getLogger("ModelStore")
+    sized = []
+    for path in dict.fromkeys(Path(p) for p in paths):
+        try:
+            sized.append((path, path.stat().st_size))
+        except OSError as e:
+            logger.warning(f"Cannot prewarm {path}: {e}")
+    sized.sort(key=lambda item: -item[1])
+    
+    selected, budget = [], max_bytes
+    for path, size in sized:
+        if budget is not None and size > budget:
+            logger.info(f"Not prewarming {path.name} ({size / 1e9:.1f} GB): over the memory budget")
+            continue
+        selected.append(path)
+        if budget is not None:
+            budget -= size
+    
+    total = 0
+    start = time.perf_counter()
+    if selected:
+        with ThreadPoolExecutor(max_workers=min(workers, len(selected))) as executor:
+            futures = {executor.submit(_read_through, p, buffer_size, stop): p for p in selected}
+            for future in as_completed(futures):
+                try:
+                    total += future.result()
+                except OSError as e:
+                    logger.warning(f"Cannot prewarm {futures[future]}: {e}")
+    return total, time.perf_counter() - start
+
+
+# Top-level model folders, as laid out by the installer and listed in extra_model_paths.yaml
+MODEL_FOLDERS = ('checkpoints', 'clip', 'clip_vision', 'configs', 'controlnet', 'diffusion_models', 'unet',
+                 'embeddings', 'loras', 'text_encoders', 'upscale_models', 'vae')
+
+# GGML tensor type ids (ggml.h) -> names
+GGML_TYPES = {
+    0: 'F32', 1: 'F16', 2: 'Q4_0', 3: 'Q4_1', 6: 'Q5_0', 7: 'Q5_1', 8: 'Q8_0', 9: 'Q8_1',
+    10: 'Q2_K', 11: 'Q3_K', 12: 'Q4_K', 13: 'Q5_K', 14: 'Q6_K', 15: 'Q8_K',
+    16: 'IQ2_XXS', 17: 'IQ2_XS', 18: 'IQ3_XXS', 19: 'IQ1_S', 20: 'IQ4_NL', 21: 'IQ3_S', 22: 'IQ2_S',
+    23: 'IQ4_XS', 24: 'I8', 25: 'I16', 26: 'I32', 27: 'I64', 28: 'F64', 29: 'IQ1_M', 30: 'BF16',
+    34: 'TQ1_0', 35: 'TQ2_0',
+}
+
+# Bytes per element of safetensors dtypes
+SAFETENSORS_DTYPE_BYTES = {
+    'F64': 8, 'F32': 4, 'F16': 2, 'BF16': 2, 'F8_E4M3': 1, 'F8_E5M2': 1,
+    'I64': 8, 'I32': 4, 'I16': 2, 'I8': 1, 'U64': 8, 'U32': 4, 'U16': 2, 'U8': 1, 'BOOL': 1,
+}
+
+# (elements per block, bytes per block) of GGML tensor types
+GGML_BLOCKS = {
+    'F32': (1, 4), 'F16': (1, 2), 'BF16': (1, 2), 'F64': (1, 8), 'I8': (1, 1), 'I16': (1, 2), 'I32': (1, 4),
+    'I64': (1, 8), 'Q4_0': (32, 18), 'Q4_1': (32, 20), 'Q5_0': (32, 22), 'Q5_1': (32, 24), 'Q8_0': (32, 34),
+    'Q8_1': (32, 36), 'Q2_K': (256, 84), 'Q3_K': (256, 110), 'Q4_K': (256, 144), 'Q5_K': (256, 176),
+    'Q6_K': (256, 210), 'Q8_K': (256, 292), 'IQ2_XXS': (256, 66), 'IQ2_XS': (256, 74), 'IQ3_XXS': (256, 98),
+    'IQ1_S': (256, 50), 'IQ4_NL': (32, 18), 'IQ3_S': (256, 110), 'IQ2_S': (256, 82), 'IQ4_XS': (256, 136),
+    'IQ1_M': (256, 56), 'TQ1_0': (256, 54), 'TQ2_0': (256, 66),
+}
+
+# Safetensors headers are JSON; anything larger than this is not a real header
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+
+def _count_params(shape: List[int]) -> int:
+    count = 1
+    for dim in shape:
+        count *= dim
+    return count
+
+
+def read_safetensors_header(path: Path) -> Dict:
+    """Parse the JSON header of a .safetensors file without touching the tensor data."""
+    with open(path, 'rb') as f:
+        raw = f.read(8)
+        if len(raw) != 8:
+            raise ValueError("file too short for a safetensors header")
+        header_len = int.from_bytes(raw, 'little')
+        if header_len > MAX_HEADER_BYTES:
+            raise ValueError(f"implausible header length {header_len}")
+        header = json.loads(f.read(header_len))
+    metadata = header.pop('__metadata__', None) or {}
+    dtypes: Dict[str, int] = {}
+    params_by_type: Dict[str, int] = {}
+    spans = []
+    layout_error = None
+    for name, info in header.items():
+        count = _count_params(info['shape'])
+        dtypes[info['dtype']] = dtypes.get(info['dtype'], 0) + 1
+        params_by_type[info['dtype']] = params_by_type.get(info['dtype'], 0) + count
+        start, end = info['data_offsets']
+        spans.append((start, end))
+        width = SAFETENSORS_DTYPE_BYTES.get(info['dtype'])
+        if layout_error is None and width is not None and end - start != count * width:
+            layout_error = f"tensor {name} spans {end - start} bytes, expected {count * width}"
+    # The format stores tensors back to back from offset 0, without gaps or overlaps
+    position = 0
+    for start, end in sorted(spans):
+        if layout_error is None and start != position:
+            layout_error = f"tensor data {'overlaps' if start < position else 'has a gap'} at offset {start}"
+        position = max(position, end)
+    params = sum(params_by_type.values())
+    return {
+        'format': 'safetensors',
+        'header_bytes': 8 + header_len,
+        'data_bytes': position,
+        'layout_error': layout_error,
+        'tensor_count': len(header),
+        'dtypes': dtypes,
+        'parameters': params,
+        'quantization': max(params_by_type, key=params_by_type.get) if params_by_type else None,
+        'metadata': {k: v for k, v in metadata.items() if isinstance(v, str) and len(v) <= 256},
+    }
+
+
+class _GGUFReader:
+    """Sequential reader for the little-endian GGUF header fields."""
+
+    SCALARS = {0: '<B', 1: '<b', 2: '<H', 3: '<h', 4: '<I', 5: '<i', 6: '<f', 7: '<?', 10: '<Q', 11: '<q', 12: '<d'}
+
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, fmt: str):
+        size = struct.calcsize(fmt)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise ValueError("truncated GGUF header")
+        return struct.unpack(fmt, data)[0]
+
+    def string(self) -> str:
+        length = self.read('<Q')
+        if length > MAX_HEADER_BYTES:
+            raise ValueError(f"implausible GGUF string length {length}")
+        return self.f.read(length).decode('utf-8', errors='replace')
+
+    def value(self, value_type: int):
+        if value_type == 8:
+            return self.string()
+        if value_type == 9:
+            item_type, count = self.read('<I'), self.read('<Q')
+            if item_type in self.SCALARS:
+                # Skip numeric arrays (token scores, types) in one seek
+                size = struct.calcsize(self.SCALARS[item_type])
+                self.f.seek(size * count, os.SEEK_CUR)
+            else:
+                for _ in range(count):
+                    self.value(item_type)
+            return None
+        if value_type not in self.SCALARS:
+            raise ValueError(f"unknown GGUF value type {value_type}")
+        return self.read(self.SCALARS[value_type])
+
+
+def read_gguf_header(path: Path) -> Dict:
+    """Parse the key/value and tensor-info sections of a .gguf file without reading tensor data."""
+    with open(path, 'rb') as f:
+        if f.read(4) != b'GGUF':
+            raise ValueError("missing GGUF magic")
+        reader = _GGUFReader(f)
+        version = reader.read('<I')
+        if version < 2:
+            raise ValueError(f"unsupported GGUF version {version}")
+        tensor_count, kv_count = reader.read('<Q'), reader.read('<Q')
+        kv = {}
+        for _ in range(kv_count):
+            key = reader.string()
+            value = reader.value(reader.read('<I'))
+            if value is not None and not (isinstance(value, str) and len(value) > 256):
+                kv[key] = value
+        dtypes: Dict[str, int] = {}
+        params_by_type: Dict[str, int] = {}
+        params = 0
+        spans = []
+        for _ in range(tensor_count):
+            name = reader.string()
+            dims = [reader.read('<Q') for _ in range(reader.read('<I'))]
+            type_name = GGML_TYPES.get(reader.read('<I'), 'unknown')
+            offset = reader.read('<Q')
+            count = _count_params(dims)
+            dtypes[type_name] = dtypes.get(type_name, 0) + 1
+            params_by_type[type_name] = params_by_type.get(type_name, 0) + count
+            params += count
+            block = GGML_BLOCKS.get(type_name)
+            spans.append((offset, offset + count // block[0] * block[1] if block else None, name))
+        header_end = f.tell()
+    alignment = int(kv.get('general.alignment', 32))
+    layout_error = None
+    data_bytes: Optional[int] = 0
+    position = 0
+    for offset, end, name in sorted(spans, key=lambda span: span[0]):
+        if layout_error is None and offset % alignment:
+            layout_error = f"tensor {name} at offset {offset} is not {alignment}-byte aligned"
+        if layout_error is None and offset < position:
+            layout_error = f"tensor {name} overlaps the previous tensor"
+        if end is None:
+            # Unknown tensor type: its size, and so the end of the data, cannot be checked
+            data_bytes = None
+            position = offset
+        else:
+            position = end
+            if data_bytes is not None:
+                data_bytes = max(data_bytes, end)
+    # Norms and biases stay F32 in quantized files; the bulk of the weights names the quantization
+    quantized = {t: n for t, n in params_by_type.items() if t not in ('F32', 'F64', 'I32', 'I64')} or params_by_type
+    return {
+        'format': 'gguf',
+        'version': version,
+        'header_bytes': header_end,
+        'data_start': -(-header_end // alignment) * alignment,
+        'alignment': alignment,
+        'data_bytes': data_bytes,
+        'layout_error': layout_error,
+        'tensor_count': tensor_count,
+        'dtypes': dtypes,
+        'parameters': params,
+        'quantization': max(quantized, key=quantized.get) if quantized else None,
+        'metadata': {k: v for k, v in kv.items() if k.startswith('general.')},
+    }
+
+
+def read_model_header(path: Path) -> Optional[Dict]:
+    """Header metadata for safetensors and GGUF files; None for other formats."""
+    suffix = Path(path).suffix.lower()
+    if suffix in ('.safetensors', '.sft'):
+        return read_safetensors_header(path)
+    if suffix == '.gguf':
+        return read_gguf_header(path)
+    return None
+
+
+def layout_problem(header: Dict, size: int) -> Optional[str]:
+    """Check a parsed header against the file length; returns what is wrong, or None."""
+    if header.get('layout_error'):
+        return header['layout_error']
+    data_bytes = header.get('data_bytes')
+    if data_bytes is None:
+        return None
+    if header['format'] == 'safetensors':
+        expected = header['header_bytes'] + data_bytes
+        if size != expected:
+            return f"file is {size} bytes but its tensors end at {expected}"
+    elif header['format'] == 'gguf':
+        expected = header['data_start'] + data_bytes
+        # The last tensor may be followed by alignment padding, nothing more
+        if size < expected:
+            return f"file is {size} bytes but its tensors end at {expected} (truncated)"
+        if size - expected >= max(header['alignment'], 1) and data_bytes:
+            return f"file has {size - expected} bytes after the last tensor"
+    return None
+
+
+def quick_verify(path: Path, expected_size: Optional[int] = None) -> Optional[str]:
+    """Structural check in a few small reads: size, header and tensor layout.
+
+    Returns None if the file looks complete, otherwise the reason it does not.
+    Catches truncated, padded or mislabelled files; silent corruption of the
+    tensor data still needs a full hash.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError as e:
+        return str(e)
+    if expected_size is not None and size != expected_size:
+        return f"size {size} does not match the expected {expected_size}"
+    try:
+        header = read_model_header(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return f"unreadable header: {e}"
+    return layout_problem(header, size) if header else None
+
+
+class ModelInventory:
+    """Index of the model tree with header metadata, rescanned incrementally.
+
+    Entries are keyed by path relative to ``root`` and reused while a file's
+    size and mtime are unchanged, so a rescan costs one stat per file plus a
+    header read for new or changed files. Hashes come from the ``HashCache``
+    when one is given; nothing is hashed here.
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_file: Path, root: Path, folders: Iterable[str] = MODEL_FOLDERS,
+                 hash_cache: Optional[HashCache] = None, logger: Optional[logging.Logger] = None):
+        self.index_file = Path(index_file)
+        self.root = Path(root)
+        self.folders = list(folders)
+        self.hash_cache = hash_cache
+        self.logger = logger or logging.getLogger("ModelStore")
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        """Atomically write the index."""
+        with self._lock:
+            data = {'version': self.VERSION, 'scanned_at': time.time(), 'entries': dict(self.entries)}
+        try:
+            tmp_file = self.index_file.with_name(self.index_file.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            self.logger.error(f"Error saving model inventory {self.index_file}: {e}")
+
+    def _walk(self, folder: Path):
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.') or name.endswith(('.part', '.part.json', '.dedup', '.caching', '.tmp')):
+                    continue
+                yield Path(dirpath) / name
+
+    def scan(self) -> Dict[str, int]:
+        """Refresh the index; returns counts of added, updated, removed and unchanged files."""
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        with self._lock:
+            old = dict(self.entries)
+        entries = {}
+        for folder in self.folders:
+            for path in self._walk(self.root / folder):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                rel = path.relative_to(self.root).as_posix()
+                entry = old.get(rel)
+                if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                    counts['unchanged'] += 1
+                else:
+                    counts['updated' if entry else 'added'] += 1
+                    entry = {'folder': folder, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+                    try:
+                        header = read_model_header(path)
+                        if header:
+                            header['error'] = layout_problem(header, st.st_size)
+                            del header['layout_error']
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        header = {'error': f"unreadable header: {e}"}
+                    if header:
+                        entry.update({k: v for k, v in header.items() if v is not None})
+                if self.hash_cache is not None and not entry.get('sha256'):
+                    entry['sha256'] = self.hash_cache.get(path)
+                entries[rel] = entry
+        counts['removed'] = len(old.keys() - entries.keys())
+        with self._lock:
+            self.entries = entries
+        if counts['added'] or counts['updated'] or counts['removed'] or not self.index_file.exists():
+            self.save()
+        return counts
+
+    def find(self, ref: str, folders: Iterable[str] = ()) -> Optional[Tuple[str, Dict]]:
+        """Look up a loader reference (``<sub>/<file>`` under a model folder); preferred folders first."""
+        ref = ref.replace('\\', '/')
+        order = list(folders)
+        with self._lock:
+            matches = [(rel, entry) for rel, entry in self.entries.items()
+                       if rel.split('/', 1)[-1] == ref]
+        matches.sort(key=lambda m: order.index(m[1]['folder']) if m[1]['folder'] in order else len(order))
+        return matches[0] if matches else None
+
+    def query(self, pattern: str = '*', folder: Optional[str] = None) -> List[Tuple[str, Dict]]:
+        """Entries whose relative path matches a glob pattern (case-insensitive)."""
+        pattern = pattern.lower()
+        with self._lock:
+            items = sorted(self.entries.items())
+        return [(rel, entry) for rel, entry in items
+                if (folder is None or entry['folder'] == folder)
+                and (fnmatch(rel.lower(), pattern) or fnmatch(rel.rsplit('/', 1)[-1].lower(), pattern))]
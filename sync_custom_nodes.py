@@ -0,0 +1,442 @@
+"""Clone/update the custom node repositories and install their requirements.
+
+Replaces the serial clone/pull loop and the per-node ``pip install -r`` calls
+of install_update_comfyui.bat: repositories are fetched concurrently, every
+node's requirements*.txt is merged into one requirement set checked against
+ComfyUI's own requirements (used as constraints), and pip runs once. Conflicts
+are reported per node; when the combined install fails, nodes are installed
+one at a time so a single broken node does not hold back the others.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+try:
+    from packaging.requirements import Requirement, InvalidRequirement
+    from packaging.specifiers import SpecifierSet
+    from packaging.utils import canonicalize_name
+    from packaging.version import Version, InvalidVersion
+except ImportError:
+    # pip always ships a copy, so the orchestrator works in a bare environment
+    from pip._vendor.packaging.requirements import Requirement, InvalidRequirement
+    from pip._vendor.packaging.specifiers import SpecifierSet
+    from pip._vendor.packaging.utils import canonicalize_name
+    from pip._vendor.packaging.version import Version, InvalidVersion
+
+DEFAULT_NODE_REPOS = [
+    "https://github.com/ltdrdata/ComfyUI-Manager.git",
+    "https://github.com/rgthree/rgthree-comfy.git",
+    "https://github.com/city96/ComfyUI_ExtraModels.git",
+    "https://github.com/city96/ComfyUI-GGUF.git",
+]
+
+# Requirement-file lines copied verbatim into the merged file (index options and editable installs)
+PASSTHROUGH_OPTIONS = ("--extra-index-url", "--index-url", "-i", "--find-links", "-f", "--trusted-host", "--pre",
+                       "-e", "--editable")
+
+def repo_name(url: str) -> str:
+    """Directory name for a repository URL or path (last component without .git)."""
+    name = url.rstrip("/\\").replace("\\", "/").rsplit("/", 1)[-1]
+    return name[:-4] if name.endswith(".git") else name
+
+def _probe_versions(specifier: SpecifierSet) -> List[Version]:
+    """Versions at and around every bound of ``specifier``."""
+    probes = [Version("0")]
+    for spec in specifier:
+        try:
+            base = Version(spec.version.replace(".*", ""))
+        except InvalidVersion:
+            continue
+        release = list(base.release)
+        probes.append(base)
+        probes.append(Version(".".join(map(str, release + [1]))))
+        probes.append(Version(".".join(map(str, release + [0, 1]))))
+        for i, part in enumerate(release):
+            probes.append(Version(".".join(map(str, release[:i] + [part + 1]))))
+            if part > 0:
+                probes.append(Version(".".join(map(str, release[:i] + [part - 1]))))
+    return probes
+
+def satisfiable(specifier: SpecifierSet) -> bool:
+    """Whether any version can satisfy ``specifier``.
+
+    Probes the versions around each bound; a combination such as
+    ``numpy<2`` and ``numpy>=2`` has no passing probe.
+    """
+    if not str(specifier):
+        return True
+    if any(spec.operator == "===" for spec in specifier):
+        return True
+    return any(specifier.contains(v, prereleases=True) for v in _probe_versions(specifier))
+
+class RequirementSet:
+    """Requirements merged across nodes in order, keeping the first compatible specifiers."""
+    
+    def __init__(self, constraints: Optional["RequirementSet"] = None):
+        self.constraints = constraints
+        self.packages: Dict[str, Dict] = {}
+        self.direct: Dict[str, Tuple[str, str]] = {}
+        self.options: List[str] = []
+        self.conflicts: List[Dict] = []
+    
+    def _effective(self, key: str, specifier: SpecifierSet) -> SpecifierSet:
+        if self.constraints and key in self.constraints.packages:
+            return specifier & self.constraints.packages[key]["specifier"]
+        return specifier
+    
+    def add(self, req: Requirement, owner: str, source: str) -> bool:
+        """Merge ``req`` from ``owner``; returns False and records a conflict when it cannot be satisfied."""
+        key = canonicalize_name(req.name)
+        if req.url:
+            previous = self.direct.get(key)
+            if previous and previous[0] != req.url:
+                self.conflicts.append({"package": req.name, "node": owner, "file": source,
+                                       "wanted": req.url, "kept": previous[0], "kept_by": [previous[1]]})
+                return False
+            self.direct[key] = (req.url, owner)
+            return True
+        entry = self.packages.get(key)
+        merged = (entry["specifier"] & req.specifier) if entry else req.specifier
+        if not satisfiable(self._effective(key, merged)):
+            kept = self._effective(key, entry["specifier"] if entry else SpecifierSet())
+            kept_by = [f"{name} ({spec or 'any'})" for name, spec in entry["owners"]] if entry else []
+            if self.constraints and key in self.constraints.packages:
+                kept_by += [f"{name} ({spec or 'any'})" for name, spec in self.constraints.packages[key]["owners"]]
+            self.conflicts.append({"package": req.name, "node": owner, "file": source,
+                                   "wanted": str(req.specifier), "kept": str(kept), "kept_by": kept_by})
+            return False
+        if entry is None:
+            entry = self.packages[key] = {"name": req.name, "extras": set(), "specifier": SpecifierSet(), "owners": []}
+        entry["specifier"] = merged
+        entry["extras"] |= set(req.extras)
+        entry["owners"].append((owner, str(req.specifier)))
+        return True
+    
+    def lines(self, with_extras: bool = True) -> List[str]:
+        """Requirement-file lines for the merged set."""
+        lines = list(self.options)
+        for key in sorted(self.packages):
+            entry = self.packages[key]
+            extras = f"[{','.join(sorted(entry['extras']))}]" if with_extras and entry["extras"] else ""
+            lines.append(f"{entry['name']}{extras}{entry['specifier']}")
+        for key in sorted(self.direct):
+            url, _ = self.direct[key]
+            lines.append(f"{key} @ {url}")
+        return lines
+
+class CustomNodeSync:
+    def __init__(self, comfyui_dir: Optional[Path] = None, repos: Optional[List[str]] = None):
+        self.script_dir = Path(__file__).parent.resolve()
+        
+        env_file = self.script_dir / '.env'
+        if env_file.exists():
+            load_dotenv(env_file)
+        
+        self.user_home = Path(os.getenv("USERPROFILE", Path.home()))
+        self.comfyui_dir = Path(comfyui_dir or os.getenv("COMFYUI_DIR", self.user_home / "ComfyUI"))
+        self.nodes_dir = self.comfyui_dir / "custom_nodes"
+        configured = [r.strip() for r in os.getenv("CUSTOM_NODE_REPOS", "").split(";") if r.strip()]
+        self.repos = repos or configured or list(DEFAULT_NODE_REPOS)
+        self.workers = int(os.getenv("NODE_SYNC_WORKERS", "8"))
+        self.find_links = [p.strip() for p in os.getenv("NODE_FIND_LINKS", "").split(";") if p.strip()]
+        self.no_index = os.getenv("NODE_NO_INDEX", "0") in ("1", "true", "True")
+        self.constraint_files = [Path(p.strip()) for p in os.getenv("NODE_CONSTRAINTS", "").split(";") if p.strip()]
+        
+        self.setup_logging()
+    
+    def setup_logging(self):
+        """Configure logging with timestamps and proper formatting."""
+        self.log_dir = self.script_dir / "logs"
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        log_file = self.log_dir / f"node_sync_{timestamp}.log"
+        
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s | %(levelname)s | %(message)s',
+            handlers=[
+                logging.FileHandler(log_file, encoding='utf-8'),
+                logging.StreamHandler()
+            ]
+        )
+        
+        self.logger = logging.getLogger("CustomNodeSync")
+    
+    def _git(self, args: List[str], cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        return subprocess.run(["git"] + args, cwd=cwd, env=env, capture_output=True, text=True)
+    
+    def _head(self, path: Path) -> Optional[str]:
+        result = self._git(["rev-parse", "HEAD"], cwd=path)
+        return result.stdout.strip() if result.returncode == 0 else None
+    
+    def _trust(self, paths: List[Path]):
+        """Add the node directories to git's safe.directory list once (serially, it is one global file)."""
+        result = self._git(["config", "--global", "--get-all", "safe.directory"])
+        trusted = set(result.stdout.split("\n")) if result.returncode == 0 else set()
+        for path in paths:
+            if str(path) not in trusted:
+                self._git(["config", "--global", "--add", "safe.directory", str(path)])
+    
+    def sync_repo(self, url: str) -> Dict:
+        """Clone ``url`` into custom_nodes, or stash local changes and fast-forward an existing checkout."""
+        name = repo_name(url)
+        target = self.nodes_dir / name
+        start = time.time()
+        result = {"name": name, "url": url}
+        if not target.exists():
+            proc = self._git(["clone", "--depth", "1", url, str(target)])
+            result["action"] = "cloned" if proc.returncode == 0 else "failed"
+        else:
+            before = self._head(target)
+            self._git(["stash", "push", "-m", "Auto-stash before update"], cwd=target)
+            proc = self._git(["pull", "--ff-only"], cwd=target)
+            if proc.returncode != 0:
+                result["action"] = "update failed"
+            else:
+                result["action"] = "unchanged" if self._head(target) == before else "updated"
+        if proc.returncode != 0:
+            output = (proc.stderr or proc.stdout).strip().splitlines()
+            result["error"] = output[-1] if output else f"git exited with {proc.returncode}"
+        result["seconds"] = round(time.time() - start, 2)
+        return result
+    
+    def sync_repos(self) -> List[Dict]:
+        """Fetch every configured repository concurrently."""
+        self.nodes_dir.mkdir(parents=True, exist_ok=True)
+        self._trust([self.nodes_dir / repo_name(url) for url in self.repos])
+        self.logger.info(f"Syncing {len(self.repos)} custom node repositories with {self.workers} workers")
+        start = time.time()
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            futures = {pool.submit(self.sync_repo, url): url for url in self.repos}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if "error" in result:
+                    self.logger.error(f"{result['name']}: {result['action']} - {result['error']}")
+                else:
+                    self.logger.info(f"{result['name']}: {result['action']} ({result['seconds']:.1f}s)")
+        self.logger.info(f"Repositories synced in {time.time() - start:.1f}s")
+        order = {url: i for i, url in enumerate(self.repos)}
+        return sorted(results, key=lambda r: order[r["url"]])
+    
+    def node_dirs(self) -> List[Path]:
+        """Configured nodes first (in order), then any other node checked out by hand."""
+        configured = [self.nodes_dir / repo_name(url) for url in self.repos]
+        others = sorted(p for p in self.nodes_dir.iterdir()
+                        if p.is_dir() and not p.name.startswith(".") and p.name != "__pycache__"
+                        and p not in configured) if self.nodes_dir.exists() else []
+        return [p for p in configured if p.is_dir()] + others
+    
+    def _read_lines(self, path: Path, seen: set) -> List[Tuple[str, Path]]:
+        """Logical lines of a requirement file with comments removed and ``-r`` includes expanded."""
+        if path.resolve() in seen:
+            return []
+        seen.add(path.resolve())
+        try:
+            text = path.read_text(encoding="utf-8-sig", errors="replace")
+        except OSError as e:
+            self.logger.warning(f"Could not read {path}: {e}")
+            return []
+        lines = []
+        for raw in text.replace("\\\n", "").splitlines():
+            line = raw.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            for flag in ("-r ", "--requirement ", "--requirement="):
+                if line.startswith(flag):
+                    lines.extend(self._read_lines(path.parent / line[len(flag):].strip(), seen))
+                    break
+            else:
+                lines.append((line, path))
+        return lines
+    
+    def _parse(self, line: str, owner: str, source: Path, reqs: RequirementSet) -> Optional[Requirement]:
+        if line.startswith("-"):
+            if line.split("=", 1)[0].split(None, 1)[0] not in PASSTHROUGH_OPTIONS:
+                self.logger.warning(f"{owner}: unsupported line in {source.name} skipped: {line}")
+            elif line not in reqs.options:
+                reqs.options.append(line)
+            return None
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            if "://" in line and line not in reqs.options:
+                # Bare archive/VCS URLs carry no name to merge on; pip gets them as written
+                reqs.options.append(line)
+            else:
+                self.logger.warning(f"{owner}: could not parse '{line}' in {source.name}; skipped")
+            return None
+        if req.marker is not None and not req.marker.evaluate():
+            return None
+        return req
+    
+    def load_constraints(self) -> RequirementSet:
+        """ComfyUI's own requirements plus NODE_CONSTRAINTS files, merged as constraints."""
+        constraints = RequirementSet()
+        sources = [("ComfyUI", self.comfyui_dir / "requirements.txt")]
+        sources += [(f"constraints {path.name}", path) for path in self.constraint_files]
+        for owner, path in sources:
+            if not path.exists():
+                continue
+            for line, source in self._read_lines(path, set()):
+                req = self._parse(line, owner, source, RequirementSet())
+                if req is not None and not req.url:
+                    constraints.add(req, owner, str(source))
+        for conflict in constraints.conflicts:
+            self.logger.warning(f"Constraint conflict: {conflict['node']} wants {conflict['package']}"
+                                f"{conflict['wanted']}, kept {conflict['kept'] or 'any'}")
+        return constraints
+    
+    def collect_requirements(self, constraints: RequirementSet) -> Tuple[RequirementSet, Dict[str, List[str]]]:
+        """Merge the requirements*.txt of every node; returns the set and each node's accepted lines."""
+        merged = RequirementSet(constraints)
+        per_node: Dict[str, List[str]] = {}
+        for node_dir in self.node_dirs():
+            files = sorted(node_dir.glob("requirements*.txt"))
+            if not files:
+                continue
+            accepted = []
+            seen = set()
+            for path in files:
+                for line, source in self._read_lines(path, seen):
+                    req = self._parse(line, node_dir.name, source, merged)
+                    if req is not None and merged.add(req, node_dir.name, str(source.relative_to(node_dir))):
+                        accepted.append(str(req))
+            per_node[node_dir.name] = accepted
+            self.logger.info(f"{node_dir.name}: {len(accepted)} requirement(s) from "
+                             f"{', '.join(p.name for p in files)}")
+        return merged, per_node
+    
+    def report_conflicts(self, merged: RequirementSet):
+        """Log every dropped requirement with the node that asked for it and who won."""
+        if not merged.conflicts:
+            self.logger.info("No requirement conflicts between custom nodes")
+            return
+        self.logger.warning(f"{len(merged.conflicts)} requirement conflict(s); the first compatible "
+                            "requirement was kept:")
+        for conflict in merged.conflicts:
+            self.logger.warning(f"  {conflict['node']} ({conflict['file']}): {conflict['package']}"
+                                f"{conflict['wanted'] or ' (any)'} conflicts with {conflict['kept'] or 'any'}"
+                                f" required by {', '.join(conflict['kept_by']) or 'nobody'}")
+    
+    def _pip_install(self, requirement_file: Path, constraint_file: Optional[Path]) -> bool:
+        cmd = [sys.executable, "-m", "pip", "install", "--no-user", "-r", str(requirement_file)]
+        if constraint_file:
+            cmd += ["-c", str(constraint_file)]
+        for link in self.find_links:
+            cmd += ["--find-links", link]
+        if self.no_index:
+            cmd.append("--no-index")
+        self.logger.info(f"Running: {' '.join(cmd)}")
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+        for line in proc.stdout:
+            line = line.rstrip()
+            if line:
+                self.logger.info(f"pip | {line}")
+        return proc.wait() == 0
+    
+    def install(self, merged: RequirementSet, constraints: RequirementSet,
+                per_node: Dict[str, List[str]]) -> List[str]:
+        """One pip install for all nodes; falls back to per-node installs. Returns the nodes that failed."""
+        requirement_file = self.log_dir / "custom_node_requirements.txt"
+        constraint_file = self.log_dir / "custom_node_constraints.txt"
+        requirement_file.write_text("\n".join(merged.lines()) + "\n", encoding="utf-8")
+        constraint_lines = constraints.lines(with_extras=False)
+        if constraint_lines:
+            constraint_file.write_text("\n".join(constraint_lines) + "\n", encoding="utf-8")
+        else:
+            constraint_file = None
+        if not merged.packages and not merged.direct:
+            self.logger.info("No custom node requirements to install")
+            return []
+        
+        start = time.time()
+        if self._pip_install(requirement_file, constraint_file):
+            self.logger.info(f"Installed {len(merged.packages) + len(merged.direct)} custom node requirement(s) "
+                             f"in {time.time() - start:.1f}s")
+            return []
+        
+        self.logger.warning("Combined install failed; installing each node's requirements separately")
+        failed = []
+        for node, lines in per_node.items():
+            if not lines:
+                continue
+            node_file = self.log_dir / f"custom_node_requirements_{node}.txt"
+            node_file.write_text("\n".join(merged.options + lines) + "\n", encoding="utf-8")
+            if not self._pip_install(node_file, constraint_file):
+                self.logger.warning(f"Failed to install requirements for {node} (continuing)")
+                failed.append(node)
+            node_file.unlink(missing_ok=True)
+        return failed
+    
+    def run(self, update: bool = True, install: bool = True, report_file: Optional[Path] = None) -> int:
+        """Sync and install; 0 = ok, 1 = a repository could not be cloned, 2 = requirements problems."""
+        report = {"comfyui_dir": str(self.comfyui_dir), "repos": [], "conflicts": [], "failed_nodes": []}
+        status = 0
+        if update:
+            report["repos"] = self.sync_repos()
+            if any(r["action"] == "failed" for r in report["repos"]):
+                status = 1
+        constraints = self.load_constraints()
+        merged, per_node = self.collect_requirements(constraints)
+        self.report_conflicts(merged)
+        report["conflicts"] = merged.conflicts
+        report["requirements"] = merged.lines()
+        if install:
+            report["failed_nodes"] = self.install(merged, constraints, per_node)
+        else:
+            for line in merged.lines():
+                print(line)
+        if status == 0 and (merged.conflicts or report["failed_nodes"]):
+            status = 2
+        if report_file:
+            with open(report_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Clone/update custom nodes and install their requirements in one pass")
+    parser.add_argument("--comfyui-dir", help="ComfyUI checkout (default: COMFYUI_DIR or %%USERPROFILE%%\\ComfyUI)")
+    parser.add_argument("--repo", action="append", metavar="URL",
+                        help="Custom node repository to clone/update; repeatable (default: CUSTOM_NODE_REPOS or the built-in list)")
+    parser.add_argument("--workers", type=int, help="Concurrent git operations (default: NODE_SYNC_WORKERS or 8)")
+    parser.add_argument("--find-links", action="append", metavar="PATH_OR_URL", help="Extra wheel location for pip; repeatable")
+    parser.add_argument("--no-index", action="store_true", help="Install only from --find-links locations")
+    parser.add_argument("--constraint", action="append", metavar="FILE",
+                        help="Extra constraints file checked together with ComfyUI's requirements.txt; repeatable")
+    parser.add_argument("--no-update", action="store_true", help="Skip git; only resolve and install requirements")
+    parser.add_argument("--dry-run", action="store_true", help="Print the merged requirements and conflicts without installing")
+    parser.add_argument("--report", metavar="FILE", help="Write a JSON report of the sync")
+    args = parser.parse_args()
+    
+    try:
+        sync = CustomNodeSync(comfyui_dir=Path(args.comfyui_dir) if args.comfyui_dir else None, repos=args.repo)
+        if args.workers:
+            sync.workers = args.workers
+        if args.find_links:
+            sync.find_links += args.find_links
+        if args.no_index:
+            sync.no_index = True
+        if args.constraint:
+            sync.constraint_files += [Path(p) for p in args.constraint]
+        sys.exit(sync.run(update=not args.no_update, install=not args.dry_run,
+                          report_file=Path(args.report) if args.report else None))
+    except KeyboardInterrupt:
+        print("\nCustom node sync interrupted by user")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
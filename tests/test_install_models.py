@@ -0,0 +1,249 @@
+"""Installer tests against the local fake Hub (benchmarks/fake_hub.py).
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import json
+import struct
+import shutil
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_hub import FakeHub, SyntheticFile
+
+# huggingface_hub reads its endpoint at import time
+HUB = FakeHub().start()
+os.environ["HF_ENDPOINT"] = HUB.url
+os.environ["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
+os.environ["TQDM_DISABLE"] = "1"
+os.environ["HF_HOME"] = tempfile.mkdtemp(prefix="hf_home_")
+
+import yaml
+from install_models import ModelInstaller, SegmentedDownloader
+
+MB = 1024 * 1024
+
+
+def safetensors_bytes(tensor_bytes: int = 4096) -> bytes:
+    """A minimal valid safetensors file with one uint8 tensor."""
+    header = json.dumps({'w': {'dtype': 'U8', 'shape': [tensor_bytes], 'data_offsets': [0, tensor_bytes]}})
+    header = header.encode().ljust((len(header) + 7) // 8 * 8, b' ')
+    return struct.pack('<Q', len(header)) + header + bytes(range(256)) * (tensor_bytes // 256)
+
+
+class HubTestCase(unittest.TestCase):
+    """Fresh model directory and config per test; the fake Hub is shared."""
+
+    ENV = ("USERPROFILE", "MODEL_BASE_PATH", "MODEL_CONFIG", "SEGMENTED_DOWNLOADS", "DEDUP_STORE")
+
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix="install_models_"))
+        self.model_dir = self.work_dir / "models"
+        self.config_file = self.work_dir / "model_config.yaml"
+        self.saved_env = {k: os.environ.get(k) for k in self.ENV}
+        os.environ["USERPROFILE"] = str(self.work_dir)
+        os.environ["MODEL_BASE_PATH"] = str(self.model_dir)
+        os.environ["MODEL_CONFIG"] = str(self.config_file)
+        HUB.accept_ranges = True
+        HUB.redirect_ttl = None
+        HUB.interrupt_after.clear()
+        HUB.requested_revisions.clear()
+        HUB.reset_counters()
+
+    def tearDown(self):
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        logging.getLogger().handlers.clear()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write_config(self, config):
+        with open(self.config_file, 'w') as f:
+            yaml.safe_dump(config, f)
+
+    def installer(self) -> ModelInstaller:
+        installer = ModelInstaller()
+        installer.logger.setLevel(logging.CRITICAL)
+        return installer
+
+
+class SegmentedDownloadTests(HubTestCase):
+
+    def downloader(self, **kwargs) -> SegmentedDownloader:
+        return SegmentedDownloader(connections=2, logger=logging.getLogger("test"), segment_size=MB, **kwargs)
+
+    def test_resume_after_interrupted_segment(self):
+        f = SyntheticFile("resume.bin", 4 * MB)
+        HUB.add_repo("test/resume", [f])
+        url = f"{HUB.url}/test/resume/resolve/main/{f.path}"
+        dest = self.work_dir / f.path
+        downloader = self.downloader()
+        downloader.RETRIES = 1
+        HUB.interrupt_after[f.path] = MB // 2
+
+        with self.assertRaises(Exception):
+            downloader.download(url, dest, f.size, f.sha256, connections=1)
+        part_path, manifest_path = SegmentedDownloader.part_paths(dest)
+        self.assertTrue(part_path.exists())
+        self.assertTrue(manifest_path.exists())
+        self.assertFalse(dest.exists())
+
+        self.assertEqual(downloader.download(url, dest, f.size, f.sha256, connections=1), f.sha256)
+        self.assertEqual(dest.stat().st_size, f.size)
+        self.assertFalse(part_path.exists())
+        self.assertFalse(manifest_path.exists())
+        # Bytes received before the cut are not fetched again (two 1-byte probes aside)
+        self.assertLessEqual(HUB.bytes_served, f.size + 2)
+
+    def test_expired_redirect_is_re_resolved(self):
+        f = SyntheticFile("presigned.bin", 6 * MB)
+        HUB.add_repo("test/presigned", [f])
+        HUB.redirect_ttl = 2
+        dest = self.work_dir / f.path
+        digest = self.downloader().download(f"{HUB.url}/test/presigned/resolve/main/{f.path}",
+                                            dest, f.size, f.sha256)
+        self.assertEqual(digest, f.sha256)
+        self.assertEqual([p.name for p in self.work_dir.iterdir()], [f.path])
+
+
+class PartialCleanupTests(HubTestCase):
+
+    def test_fallback_download_removes_partial(self):
+        f = SyntheticFile("fallback.safetensors", 2 * MB)
+        HUB.add_repo("test/fallback", [f])
+        self.write_config({})
+        installer = self.installer()
+        dest = installer._model_dest_dir("test/fallback", "loras") / f.path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        part_path, manifest_path = SegmentedDownloader.part_paths(dest)
+        with open(part_path, 'wb') as out:
+            out.truncate(f.size)
+        manifest_path.write_text(json.dumps({'size': f.size, 'etag': 'stale', 'segments': [[0, f.size, 0]]}))
+        # Range requests are ignored, so the segmented path fails and hf_hub_download takes over
+        HUB.accept_ranges = False
+
+        self.assertEqual(installer.download_file("test/fallback", f.path, "loras"), dest)
+        self.assertEqual(dest.stat().st_size, f.size)
+        self.assertFalse(part_path.exists())
+        self.assertFalse(manifest_path.exists())
+
+    def test_cleanup_drops_partial_of_completed_file(self):
+        f = SyntheticFile("done.bin", MB)
+        self.write_config({})
+        installer = self.installer()
+        dest = self.model_dir / "loras" / f.path
+        dest.write_bytes(b''.join(f.read(0, f.size)))
+        part_path, manifest_path = SegmentedDownloader.part_paths(dest)
+        part_path.write_bytes(b'\0' * f.size)
+        manifest_path.write_text(json.dumps({'size': f.size, 'etag': None, 'segments': [[0, f.size, 0]]}))
+        resumable = self.model_dir / "loras" / "pending.bin"
+        pending_part, pending_manifest = SegmentedDownloader.part_paths(resumable)
+        pending_part.write_bytes(b'\0' * 16)
+        pending_manifest.write_text(json.dumps({'size': 16, 'etag': None, 'segments': [[0, 16, 0]]}))
+
+        installer.cleanup_partial_downloads()
+        self.assertTrue(dest.exists())
+        self.assertFalse(part_path.exists())
+        self.assertFalse(manifest_path.exists())
+        # Nothing else completed this one, so it stays resumable
+        self.assertTrue(pending_part.exists())
+        self.assertTrue(pending_manifest.exists())
+
+
+class VerificationTests(HubTestCase):
+
+    def test_quick_verified_file_is_recorded_without_hash(self):
+        f = SyntheticFile("quick.safetensors", content=safetensors_bytes())
+        HUB.add_repo("test/quick", [f])
+        self.write_config({})
+        installer = self.installer()
+        dest = installer._model_dest_dir("test/quick", "loras") / f.path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(f.content)
+
+        self.assertEqual(installer.download_file("test/quick", f.path, "loras"), dest)
+        self.assertIsNone(installer.hash_cache.get(dest))
+        self.assertIsNotNone(installer.hash_cache.verified_age(dest))
+        # Unhashed content must not stand in for other paths
+        self.assertFalse(installer.blob_store.has_content(f.sha256))
+
+    def test_fallback_download_records_only_hashed_content(self):
+        f = SyntheticFile("listed.safetensors", content=safetensors_bytes())
+        # The listing claims content the server does not send
+        f.sha256 = "0" * 64
+        HUB.add_repo("test/mismatch", [f])
+        HUB.accept_ranges = False
+        self.write_config({})
+        installer = self.installer()
+
+        self.assertIsNone(installer.download_file("test/mismatch", f.path, "loras"))
+        self.assertFalse(installer.blob_store.has_content(f.sha256))
+        self.assertEqual(installer.hash_cache.paths_for(f.sha256), [])
+
+
+class LockedRevisionTests(HubTestCase):
+
+    REV1, REV2 = "1" * 40, "2" * 40
+
+    def publish(self, repo_id: str, path: str):
+        old = SyntheticFile(path, content=safetensors_bytes(4096))
+        new = SyntheticFile(path, content=safetensors_bytes(8192))
+        HUB.add_repo(repo_id, [old], revision=self.REV1)
+        return old, new
+
+    def test_locked_install_uses_pinned_revision(self):
+        # Otherwise the deleted file comes back from the blob store
+        os.environ["DEDUP_STORE"] = "0"
+        old, new = self.publish("test/locked", "pinned.safetensors")
+        self.write_config({'loras': {'pinned': {'repo_url': "https://huggingface.co/test/locked",
+                                                'include_files': [old.path]}}})
+        installer = self.installer()
+        installer.process_model_config()
+        dest = installer._model_dest_dir("test/locked", "loras") / old.path
+        self.assertEqual(dest.read_bytes(), old.content)
+        self.assertTrue(installer.lock_file.exists())
+
+        HUB.add_repo("test/locked", [new], revision=self.REV2)
+        dest.unlink()
+        HUB.requested_revisions.clear()
+        # Force the hf_hub_download fallback
+        HUB.accept_ranges = False
+        installer = self.installer()
+        self.assertTrue(installer.use_lockfile())
+        self.assertEqual(installer.download_file("test/locked", old.path, "loras"), dest)
+        self.assertEqual(dest.read_bytes(), old.content)
+        self.assertEqual(set(HUB.requested_revisions), {self.REV1})
+
+    def test_locked_snapshot_uses_pinned_revision(self):
+        old, new = self.publish("test/locked-snapshot", "unet/model.safetensors")
+        self.write_config({})
+        installer = self.installer()
+        installer.metadata.pins["test/locked-snapshot"] = self.REV1
+        installer.locked = True
+        HUB.add_repo("test/locked-snapshot", [new], revision=self.REV2)
+
+        self.assertTrue(installer._download_snapshot("test/locked-snapshot", "checkpoints"))
+        dest = installer._model_dest_dir("test/locked-snapshot", "checkpoints") / old.path
+        self.assertEqual(dest.read_bytes(), old.content)
+        self.assertEqual(set(HUB.requested_revisions), {self.REV1})
+
+    def test_locked_install_rejects_unpinned_repo(self):
+        f = SyntheticFile("unpinned.safetensors", content=safetensors_bytes())
+        HUB.add_repo("test/unpinned", [f])
+        self.write_config({})
+        installer = self.installer()
+        installer.locked = True
+
+        self.assertIsNone(installer.download_file("test/unpinned", f.path, "loras"))
+        self.assertFalse(any(installer.model_dir.rglob(f.path)))
+        self.assertEqual(HUB.requested_revisions, [])